@@ -0,0 +1,146 @@
+# admission.py — bounded concurrency and load shedding for the analysis routes
+# A request to a gated endpoint takes one of ADMISSION_MAX_INFLIGHT slots. When all
+# are busy it may wait in a short queue (ADMISSION_QUEUE places, ADMISSION_MAX_WAIT
+# seconds from arrival); otherwise it is answered at once with 503 + Retry-After.
+# Shedding early keeps tail latency bounded when clinic intake opens and traffic spikes:
+# a quick "try again in 2s" beats a 30s wait that ends in a gateway timeout anyway.
+# Everything else (pages, /taxonomy.json, /metrics, /healthz) is never gated, so it
+# keeps being served while analysis is saturated.
+
+from __future__ import annotations
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Optional
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics  # type: ignore
+
+# Flask endpoint names that go through the gate. The live SSE stream is left out on
+# purpose: it idles for minutes and would pin a slot without doing any analysis.
+DEFAULT_ENDPOINTS = "analyze,analyze_json,analyze_batch,analyze_live_start,analyze_live_edit,report_submit"
+
+# Set by the ASGI bridge: time.monotonic() when the request was received, so time spent
+# waiting for a pool thread counts against the queue deadline.
+ARRIVAL_KEY = "emp.arrival"
+
+WAIT_SECONDS = metrics.REGISTRY.histogram(
+    "emp_admission_wait_seconds", "Time admitted requests spent queued for a slot.")
+SHED = metrics.REGISTRY.counter(
+    "emp_admission_shed_total", "Requests answered 503 by admission control.", labels=("endpoint", "reason"))
+
+
+class Saturated(Exception):
+    """No slot became free in time; `reason` is "queue_full" or "timeout"."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server is busy ({reason.replace('_', ' ')}); retry in {retry_after}s.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One admitted request; release() is idempotent and may run on any thread."""
+    __slots__ = ("_gate", "_started", "_released")
+
+    def __init__(self, gate: "AdmissionGate"):
+        self._gate = gate
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._gate._release(time.monotonic() - self._started)
+
+
+class AdmissionGate:
+    """
+    Counting semaphore with a bounded FIFO-ish wait queue and a per-request deadline.
+    Retry-After is an estimate of how long the current backlog takes to drain, from an
+    exponential moving average of how long admitted requests hold their slot.
+    """
+
+    def __init__(self, max_inflight: int, max_queue: int = 16, max_wait: float = 2.0,
+                 retry_after_max: int = 30):
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max(0.0, max_wait)
+        self.retry_after_max = max(1, retry_after_max)
+        self._cond = threading.Condition(threading.Lock())
+        self._inflight = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._shed = 0
+        self._hold_ewma = 0.05  # seconds a slot is held; seeded at a typical request
+
+    def acquire(self, arrived: Optional[float] = None) -> Ticket:
+        """Take a slot (waiting up to max_wait from `arrived`) or raise Saturated."""
+        now = time.monotonic()
+        deadline = (arrived if arrived is not None else now) + self.max_wait
+        with self._cond:
+            if self._inflight < self.max_inflight and not self._waiting:
+                return self._admit(0.0)
+            if self._waiting >= self.max_queue or now >= deadline:
+                raise self._shed_locked("queue_full" if self._waiting >= self.max_queue else "timeout")
+            self._waiting += 1
+            try:
+                while self._inflight >= self.max_inflight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._shed_locked("timeout")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            return self._admit(time.monotonic() - now)
+
+    def _admit(self, waited: float) -> Ticket:
+        self._inflight += 1
+        self._admitted += 1
+        if waited:
+            WAIT_SECONDS.observe(waited)
+        return Ticket(self)
+
+    def _shed_locked(self, reason: str) -> Saturated:
+        self._shed += 1
+        backlog = self._inflight + self._waiting + 1
+        eta = self._hold_ewma * backlog / self.max_inflight
+        return Saturated(reason, min(self.retry_after_max, max(1, math.ceil(eta))))
+
+    def _release(self, held: float) -> None:
+        with self._cond:
+            self._inflight -= 1
+            self._hold_ewma += 0.1 * (held - self._hold_ewma)
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"inflight": self._inflight, "waiting": self._waiting, "admitted": self._admitted,
+                    "shed": self._shed, "max_inflight": self.max_inflight, "max_queue": self.max_queue,
+                    "max_wait": self.max_wait, "hold_seconds_ewma": round(self._hold_ewma, 6)}
+
+    def gauge_lines(self):
+        s = self.stats()
+        return metrics.gauge_lines(
+            "emp_admission", "Admission control: slots in use, queued requests and the configured limits.",
+            {"inflight": s["inflight"], "waiting": s["waiting"],
+             "max_inflight": s["max_inflight"], "max_queue": s["max_queue"]}, "state")
+
+
+def gate_from_env() -> Optional[AdmissionGate]:
+    """The gate configured by ADMISSION_* variables, or None when ADMISSION_MAX_INFLIGHT=0."""
+    limit = int(os.getenv("ADMISSION_MAX_INFLIGHT", "4"))
+    if limit <= 0:
+        return None
+    return AdmissionGate(limit,
+                         max_queue=int(os.getenv("ADMISSION_QUEUE", "16")),
+                         max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "2")),
+                         retry_after_max=int(os.getenv("ADMISSION_RETRY_AFTER_MAX", "30")))
+
+
+def endpoints_from_env() -> FrozenSet[str]:
+    raw = os.getenv("ADMISSION_ENDPOINTS", DEFAULT_ENDPOINTS)
+    return frozenset(e.strip() for e in raw.split(",") if e.strip())
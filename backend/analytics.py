@@ -0,0 +1,401 @@
+# analytics.py — prevalence and co-occurrence statistics over a tagged corpus (NumPy)
+#
+#   python -m backend.tag_corpus posts.jsonl -o tags.jsonl
+#   python -m backend.analytics tags.jsonl --out-dir stats/
+#
+# Reads tag_corpus output (JSONL or --format columnar) in chunks, turns each chunk
+# into a documents x contexts x categories 0/1 array and accumulates counts,
+# co-occurrence matrices and category x trigger / life-impact counts with array
+# ops. Memory depends on the chunk size, not the corpus. The derived statistics
+# (prevalence, lift, 2x2 chi-square per category pair, category x context
+# chi-square) are computed once at the end and written as CSV tables plus
+# summary.json. In-process TagResult objects can be added with add_results().
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # optional dependency; see _require_numpy()
+    np = None
+
+try:
+    from .tagger_logic import CONTEXTS, METAPHOR_TYPES, TRIGGERS, LIFE_IMPACT
+    from .tag_corpus import COLUMNAR_FORMAT
+except ImportError:
+    from tagger_logic import CONTEXTS, METAPHOR_TYPES, TRIGGERS, LIFE_IMPACT  # type: ignore
+    from tag_corpus import COLUMNAR_FORMAT  # type: ignore
+
+ALL_CONTEXTS = "any"  # pseudo-context: the category appears in at least one context
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise SystemExit("backend.analytics needs NumPy: pip install numpy")
+
+
+# -----------------------
+# Accumulation
+# -----------------------
+
+
+class CorpusStats:
+    """
+    Running totals over documents. Dimensions are fixed at construction:
+    contexts (+ "any"), categories, triggers and life-impact clues.
+    """
+
+    def __init__(self, contexts: Sequence[str], categories: Sequence[str],
+                 triggers: Sequence[str], life_impact: Sequence[str]):
+        _require_numpy()
+        self.contexts = list(contexts) + [ALL_CONTEXTS]
+        self.categories = list(categories)
+        self.triggers = list(triggers)
+        self.life_impact = list(life_impact)
+        P, C = len(self.contexts), len(self.categories)
+        self.documents = 0
+        self.skipped = {"error": 0, "duplicate": 0, "unknown_label": 0}
+        self.category_counts = np.zeros((P, C), dtype=np.int64)      # docs with category in context
+        self.cooccurrence = np.zeros((P, C, C), dtype=np.int64)      # docs with both, per context
+        self.trigger_counts = np.zeros(len(self.triggers), dtype=np.int64)
+        self.life_impact_counts = np.zeros(len(self.life_impact), dtype=np.int64)
+        self.category_trigger = np.zeros((C, len(self.triggers)), dtype=np.int64)
+        self.category_life_impact = np.zeros((C, len(self.life_impact)), dtype=np.int64)
+
+    @classmethod
+    def from_taxonomy(cls) -> "CorpusStats":
+        return cls(CONTEXTS, list(METAPHOR_TYPES), TRIGGERS, LIFE_IMPACT)
+
+    def add_chunk(self, hits, triggers, life_impact) -> None:
+        """
+        hits: (N, contexts, categories) 0/1 array (contexts without "any");
+        triggers: (N, len(triggers)); life_impact: (N, len(life_impact)).
+        """
+        n = hits.shape[0]
+        if not n:
+            return
+        hits = hits.astype(np.int32, copy=False)
+        anyctx = hits.max(axis=1)
+        full = np.concatenate([hits, anyctx[:, None, :]], axis=1)          # (N, P, C)
+        self.documents += n
+        self.category_counts += full.sum(axis=0)
+        self.cooccurrence += np.einsum("npi,npj->pij", full, full)
+        trig = triggers.astype(np.int32, copy=False)
+        life = life_impact.astype(np.int32, copy=False)
+        self.trigger_counts += trig.sum(axis=0)
+        self.life_impact_counts += life.sum(axis=0)
+        self.category_trigger += anyctx.T @ trig
+        self.category_life_impact += anyctx.T @ life
+
+    def add_csr(self, rows: int, hit_offsets, hit_context, hit_category,
+                trigger_offsets, trigger_codes, life_offsets, life_codes, keep=None) -> None:
+        """Add one CSR-style group (the tag_corpus columnar layout); `keep` masks rows to count."""
+        P, C = len(self.contexts) - 1, len(self.categories)
+        hits = np.zeros((rows, P, C), dtype=np.uint8)
+        _scatter(hits, np.asarray(hit_offsets), (np.asarray(hit_context), np.asarray(hit_category)), (P, C), self)
+        trig = np.zeros((rows, len(self.triggers)), dtype=np.uint8)
+        _scatter(trig, np.asarray(trigger_offsets), (np.asarray(trigger_codes),), (len(self.triggers),), self)
+        life = np.zeros((rows, len(self.life_impact)), dtype=np.uint8)
+        _scatter(life, np.asarray(life_offsets), (np.asarray(life_codes),), (len(self.life_impact),), self)
+        if keep is not None:
+            keep = np.asarray(keep, dtype=bool)
+            hits, trig, life = hits[keep], trig[keep], life[keep]
+        self.add_chunk(hits, trig, life)
+
+    def add_results(self, results: Iterable[Any], chunk_rows: int = 100_000) -> None:
+        """Add tagger_logic.TagResult objects (bitmask per context), chunk by chunk."""
+        P = len(self.contexts) - 1
+        trig_code = {t: i for i, t in enumerate(self.triggers)}
+        life_code = {v: i for i, v in enumerate(self.life_impact)}
+        buf: List[Any] = []
+
+        def flush():
+            if not buf:
+                return
+            snap = buf[0].snapshot
+            # bit i of a mask is snap.categories[i]; map it onto our category order.
+            order = [snap.categories.index(c) if c in snap.categories else -1 for c in self.categories]
+            masks = np.array([r.context_masks for r in buf], dtype=np.int64)          # (N, P)
+            bits = (masks[:, :, None] >> np.arange(len(snap.categories))) & 1        # (N, P, snapC)
+            hits = np.zeros((len(buf), P, len(self.categories)), dtype=np.uint8)
+            for j, i in enumerate(order):
+                if i >= 0:
+                    hits[:, :, j] = bits[:, :, i]
+            trig = np.zeros((len(buf), len(self.triggers)), dtype=np.uint8)
+            life = np.zeros((len(buf), len(self.life_impact)), dtype=np.uint8)
+            for n, r in enumerate(buf):
+                for t in r.triggers:
+                    if t in trig_code:
+                        trig[n, trig_code[t]] = 1
+                for v in r.life_impact:
+                    if v in life_code:
+                        life[n, life_code[v]] = 1
+            self.add_chunk(hits, trig, life)
+            buf.clear()
+
+        for r in results:
+            if buf and r.snapshot is not buf[0].snapshot:
+                flush()
+            buf.append(r)
+            if len(buf) >= chunk_rows:
+                flush()
+        flush()
+
+    # -----------------------
+    # Derived statistics
+    # -----------------------
+    def prevalence(self):
+        return self.category_counts / max(1, self.documents)
+
+    def lift(self):
+        """P(a,b) / (P(a) P(b)) per context; NaN where a category never occurs."""
+        n = float(self.documents)
+        counts = self.category_counts.astype(float)
+        denom = counts[:, :, None] * counts[:, None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denom > 0, self.cooccurrence * n / denom, np.nan)
+
+    def pair_chi_square(self):
+        """2x2 chi-square (1 dof) for every category pair per context, with p-values."""
+        n = float(self.documents)
+        a = self.category_counts.astype(float)[:, :, None]
+        b = self.category_counts.astype(float)[:, None, :]
+        n11 = self.cooccurrence.astype(float)
+        n10, n01 = a - n11, b - n11
+        n00 = n - a - b + n11
+        denom = a * b * (n - a) * (n - b)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            chi2 = np.where(denom > 0, n * (n11 * n00 - n10 * n01) ** 2 / denom, np.nan)
+        return chi2, _chi2_sf_1dof(chi2)
+
+    def context_association(self) -> Dict[str, Any]:
+        """Chi-square of independence on the contexts x categories count table (no "any")."""
+        table = self.category_counts[:-1].astype(float)
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        total = table.sum()
+        if total == 0 or min(table.shape) < 2:
+            return {"chi2": None, "dof": 0, "cramers_v": None}
+        expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / total
+        chi2 = float(((table - expected) ** 2 / expected).sum())
+        dof = (table.shape[0] - 1) * (table.shape[1] - 1)
+        cramers_v = math.sqrt(chi2 / (total * (min(table.shape) - 1)))
+        return {"chi2": chi2, "dof": dof, "cramers_v": cramers_v}
+
+    def context_residuals(self):
+        """(expected, standardised residual) per context x category cell; NaN for empty rows/cols."""
+        table = self.category_counts[:-1].astype(float)
+        total = table.sum()
+        expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / max(total, 1.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resid = np.where(expected > 0, (table - expected) / np.sqrt(expected), np.nan)
+        return expected, resid
+
+
+def _scatter(out, offsets, codes: Tuple[Any, ...], limits: Tuple[int, ...], stats: CorpusStats) -> None:
+    """Set out[row, *codes] = 1 for CSR entries; codes outside the dictionaries are skipped."""
+    if not len(codes[0]):
+        return
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    ok = np.ones(len(rows), dtype=bool)
+    for code, limit in zip(codes, limits):
+        ok &= (code >= 0) & (code < limit)
+    stats.skipped["unknown_label"] += int((~ok).sum())
+    out[(rows[ok],) + tuple(c[ok] for c in codes)] = 1
+
+
+def _chi2_sf_1dof(chi2):
+    # P(X > x) for chi-square with one degree of freedom = erfc(sqrt(x / 2)).
+    p = np.full(chi2.shape, np.nan)
+    ok = np.isfinite(chi2)
+    p[ok] = [math.erfc(math.sqrt(x / 2.0)) for x in chi2[ok]]
+    return p
+
+
+# -----------------------
+# Reading tag_corpus output
+# -----------------------
+
+
+def _read_lines(path: str) -> Iterator[str]:
+    if path == "-":
+        yield from sys.stdin
+        return
+    with open(path, encoding="utf-8") as fh:
+        yield from fh
+
+
+def accumulate_file(path: str, chunk_rows: int = 50_000, skip_duplicates: bool = False) -> CorpusStats:
+    lines = _read_lines(path)
+    first = next(lines, "")
+    head = json.loads(first) if first.strip() else {}
+    if head.get("format") == COLUMNAR_FORMAT:
+        return _accumulate_columnar(head, lines, skip_duplicates)
+    stats = CorpusStats.from_taxonomy()
+    _accumulate_jsonl(stats, ([first] if first.strip() else []), lines, chunk_rows, skip_duplicates)
+    return stats
+
+
+def _accumulate_columnar(head: Dict[str, Any], lines: Iterable[str], skip_duplicates: bool) -> CorpusStats:
+    d = head["dictionaries"]
+    stats = CorpusStats(d["context"], d["category"], d["trigger"], d["life_impact"])
+    for line in lines:
+        if not line.strip():
+            continue
+        g = json.loads(line)
+        for dim, values in (g.get("dictionary_additions") or {}).items():
+            print(f"[WARN] {dim} values not in the header are skipped: {', '.join(values)}", file=sys.stderr)
+        errors = np.array([e is not None for e in g["error"]], dtype=bool)
+        dups = np.array([x is not None for x in g["duplicate_of"]], dtype=bool)
+        keep = ~errors & ~(dups if skip_duplicates else np.zeros_like(dups))
+        stats.skipped["error"] += int(errors.sum())
+        if skip_duplicates:
+            stats.skipped["duplicate"] += int((dups & ~errors).sum())
+        stats.add_csr(g["rows"], g["hit_offsets"], g["context"], g["category"],
+                      g["trigger_offsets"], g["trigger"], g["life_impact_offsets"], g["life_impact"], keep)
+    return stats
+
+
+def _accumulate_jsonl(stats: CorpusStats, head: List[str], lines: Iterable[str], chunk_rows: int,
+                      skip_duplicates: bool) -> None:
+    codes = {
+        "context": {v: i for i, v in enumerate(stats.contexts[:-1])},
+        "category": {v: i for i, v in enumerate(stats.categories)},
+        "trigger": {v: i for i, v in enumerate(stats.triggers)},
+        "life_impact": {v: i for i, v in enumerate(stats.life_impact)},
+    }
+    group = _empty_group()
+
+    def code(dim: str, value: str) -> int:
+        return codes[dim].get(value, -1)
+
+    def flush():
+        if group["rows"]:
+            stats.add_csr(group["rows"], group["hit_offsets"], group["context"], group["category"],
+                          group["trigger_offsets"], group["trigger"],
+                          group["life_impact_offsets"], group["life_impact"])
+            group.clear()
+            group.update(_empty_group())
+
+    for line in _chain(head, lines):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if row.get("error"):
+            stats.skipped["error"] += 1
+            continue
+        if skip_duplicates and row.get("duplicate_of") is not None:
+            stats.skipped["duplicate"] += 1
+            continue
+        for ctx, cats in (row.get("matched_by_context") or {}).items():
+            for cat in cats:
+                group["context"].append(code("context", ctx))
+                group["category"].append(code("category", cat))
+        group["hit_offsets"].append(len(group["context"]))
+        for dim, field in (("trigger", "triggers_detected"), ("life_impact", "life_impact_detected")):
+            group[dim].extend(code(dim, v) for v in row.get(field, []))
+            group[dim + "_offsets"].append(len(group[dim]))
+        group["rows"] += 1
+        if group["rows"] >= chunk_rows:
+            flush()
+    flush()
+
+
+def _empty_group() -> Dict[str, Any]:
+    return {"rows": 0, "hit_offsets": [0], "context": [], "category": [],
+            "trigger_offsets": [0], "trigger": [], "life_impact_offsets": [0], "life_impact": []}
+
+
+def _chain(first: List[str], rest: Iterable[str]) -> Iterator[str]:
+    yield from first
+    yield from rest
+
+
+# -----------------------
+# Export
+# -----------------------
+
+
+def _num(x: Any) -> Any:
+    x = float(x)
+    return "" if math.isnan(x) else round(x, 6)
+
+
+def write_tables(stats: CorpusStats, out_dir: str) -> List[str]:
+    os.makedirs(out_dir, exist_ok=True)
+    n = stats.documents
+    written = []
+
+    def table(name: str, header: List[str], rows: Iterable[List[Any]]) -> None:
+        path = os.path.join(out_dir, name)
+        with open(path, "w", encoding="utf-8", newline="") as fh:
+            w = csv.writer(fh)
+            w.writerow(header)
+            w.writerows(rows)
+        written.append(path)
+
+    prev = stats.prevalence()
+    table("category_prevalence.csv", ["context", "category", "documents", "prevalence"],
+          ([ctx, cat, int(stats.category_counts[p, c]), _num(prev[p, c])]
+           for p, ctx in enumerate(stats.contexts) for c, cat in enumerate(stats.categories)))
+
+    lift = stats.lift()
+    chi2, pval = stats.pair_chi_square()
+    C = len(stats.categories)
+    table("cooccurrence.csv", ["context", "category_a", "category_b", "documents", "lift", "chi2", "p_value"],
+          ([ctx, stats.categories[i], stats.categories[j], int(stats.cooccurrence[p, i, j]),
+            _num(lift[p, i, j]), _num(chi2[p, i, j]), _num(pval[p, i, j])]
+           for p, ctx in enumerate(stats.contexts) for i in range(C) for j in range(i + 1, C)))
+
+    expected, resid = stats.context_residuals()
+    table("context_association.csv", ["context", "category", "documents", "expected", "std_residual"],
+          ([ctx, cat, int(stats.category_counts[p, c]), _num(expected[p, c]), _num(resid[p, c])]
+           for p, ctx in enumerate(stats.contexts[:-1]) for c, cat in enumerate(stats.categories)))
+
+    for name, labels, counts, joint in (
+            ("triggers.csv", stats.triggers, stats.trigger_counts, stats.category_trigger),
+            ("life_impact.csv", stats.life_impact, stats.life_impact_counts, stats.category_life_impact)):
+        table(name, ["label", "documents", "prevalence"],
+              ([label, int(counts[k]), _num(counts[k] / max(1, n))] for k, label in enumerate(labels)))
+        any_counts = stats.category_counts[-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lifts = np.where(any_counts[:, None] * counts[None, :] > 0,
+                             joint * float(n) / (any_counts[:, None] * counts[None, :]), np.nan)
+        table("category_x_" + name, ["category", "label", "documents", "lift"],
+              ([cat, label, int(joint[c, k]), _num(lifts[c, k])]
+               for c, cat in enumerate(stats.categories) for k, label in enumerate(labels)))
+
+    summary = {"documents": n, "skipped": stats.skipped, "contexts": stats.contexts,
+               "categories": stats.categories, "context_association": stats.context_association()}
+    path = os.path.join(out_dir, "summary.json")
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=2)
+    written.append(path)
+    return written
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m backend.analytics",
+                                 description="Prevalence/co-occurrence tables from tag_corpus output.")
+    ap.add_argument("input", help="tag_corpus output (JSONL or columnar), or - for stdin")
+    ap.add_argument("--out-dir", required=True, help="directory for the CSV tables and summary.json")
+    ap.add_argument("--chunk-rows", type=int, default=50_000, help="JSONL rows per vectorised chunk")
+    ap.add_argument("--skip-duplicates", action="store_true", help="count texts seen earlier only once")
+    args = ap.parse_args(argv)
+
+    _require_numpy()
+    stats = accumulate_file(args.input, args.chunk_rows, args.skip_duplicates)
+    for path in write_tables(stats, args.out_dir):
+        print(path)
+    assoc = stats.context_association()
+    chi2 = f"{assoc['chi2']:.1f} (dof {assoc['dof']}, Cramér's V {assoc['cramers_v']:.3f})" if assoc["chi2"] else "n/a"
+    print(f"{stats.documents} documents; category x context chi-square {chi2}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
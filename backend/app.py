@@ -1,17 +1,38 @@
 from flask import redirect, url_for
-from .taxonomy import taxonomy
 from .tagger_logic import (
     tag_pain_description,
     generate_patient_summary,
     generate_doctor_summary,
-    generate_entailment_summary
+    generate_entailment_summary,
+    get_snapshot,
+    CONTEXTS,
+    on_taxonomy_reload
 )
+from .result_cache import ResultCache
+from .live import EditConflict, LiveSessionStore
+from .prerender import Prerendered, PrerenderCache, version_of
+from . import metrics
+from . import wire
+from . import taxonomy_reload
+from . import admission
+from . import reports
+from . import history
+from . import rollups
+from . import locales
 
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
 from flask_cors import CORS
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeout
+import atexit
+import hmac
+import json
 import os
 import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
 
 # --- Curated triggers for the UI ---
 TRIGGERS_UI = [
@@ -55,7 +76,30 @@ NORMALIZE_PATTERNS = [
 ]
 
 
+# All passes fused into one regex, tried in list order at each position. Sequential
+# re.sub passes could also rewrite an earlier pass's output; the only such case is a
+# urination label becoming "going to the toilet" right before "- bowel emptying",
+# which the leading alternative reproduces.
+_TRIGGER_CASCADE = (r"(?:going to the toilet\s*[–-]\s*urination|\burination\b|\bpee\b|\bwee\b)"
+                    r"\s*[–-]\s*bowel emptying")
+_TRIGGER_RE = re.compile(
+    "|".join([f"(?P<t0>{_TRIGGER_CASCADE})"] +
+             [f"(?P<t{i}>{pat})" for i, (pat, _) in enumerate(NORMALIZE_PATTERNS, 1)]),
+    re.IGNORECASE)
+# outer group number -> canonical phrase (m.lastindex is the outer group that matched)
+_TRIGGER_CANON = {_TRIGGER_RE.groupindex[f"t{i}"]: canon for i, canon in
+                  enumerate([CANON["toilet"]] + [canon for _, canon in NORMALIZE_PATTERNS])}
+
+
 def normalize_triggers(text: str) -> str:
+    if not text:
+        return text
+    out = text.replace("–", "-").replace("—", "-")
+    return _TRIGGER_RE.sub(lambda m: _TRIGGER_CANON[m.lastindex], out)
+
+
+def _normalize_triggers_reference(text: str) -> str:
+    # One re.sub per NORMALIZE_PATTERNS entry; what normalize_triggers must reproduce.
     if not text:
         return text
     out = text.replace("–", "-").replace("—", "-")
@@ -64,6 +108,142 @@ def normalize_triggers(text: str) -> str:
     return out
 
 
+# --- Result cache (identical description + name + duration -> same payload) ---
+RESULT_CACHE = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_ENTRIES", "2048")),
+    max_bytes=int(os.getenv("RESULT_CACHE_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "3600")),
+)
+on_taxonomy_reload(RESULT_CACHE.clear)
+
+
+# --- Locale packs (backend/locales/<code>.json; the default locale is built in) ---
+LOCALES = locales.registry_from_env()
+metrics.REGISTRY.collector(LOCALES.gauge_lines)
+
+
+def analyze_description(description: str, name: str = "", duration: str = "",
+                        pack: "locales.LocalePack" = None) -> dict:
+    """
+    normalize_triggers -> tag_pain_description -> summaries; the /analyze.json payload.
+    Served from RESULT_CACHE when possible, so the returned dict must not be mutated.
+    `pack`: a locale pack from LOCALES.resolve(); None for the default locale.
+    """
+    normalize = normalize_triggers if pack is None else pack.normalize_triggers
+    with metrics.stage("normalize_triggers"):
+        description = normalize((description or "").strip())
+    metrics.note(input_chars=len(description))
+    name, duration = name or "", duration or ""
+    key = (description, name, duration) if pack is None else (description, name, duration, pack.code)
+    return RESULT_CACHE.get_or_compute(
+        key, lambda: _build_payload(description, name, duration, pack=pack))
+
+
+def _build_payload(description: str, name: str, duration: str, sentence_cache: dict = None,
+                   pack: "locales.LocalePack" = None) -> dict:
+    snapshot = pack.snapshot if pack is not None else None
+    results = tag_pain_description(
+        description,
+        name=name or None,
+        duration=duration or None,
+        sentence_cache=sentence_cache,
+        snapshot=snapshot,
+        observer=metrics.observe_stage,
+    )
+
+    results["input"] = description
+    with metrics.stage("patient_summary"):
+        plain = generate_patient_summary(results, snapshot)
+    with metrics.stage("doctor_summary"):
+        doctor = generate_doctor_summary(results)
+    with metrics.stage("entailment_summary"):
+        entail = generate_entailment_summary(results.get("entailments", {}))
+
+    return {
+        "ok": True,
+        "patient": plain,
+        "doctor": doctor,
+        "entailments": entail,
+        "results": results,
+    }
+
+
+# --- Analysis history (optional: HISTORY_DB=<sqlite path>) ---
+HISTORY = history.store_from_env()
+if HISTORY is not None:
+    atexit.register(HISTORY.close)  # write what's still queued on a clean shutdown
+    if os.getenv("HISTORY_ROLLUPS", "1").lower() not in ("0", "false", "no", "off"):
+        # Cycle/context rollups, updated in the same transaction as each stored entry.
+        _conn = history.connect(HISTORY.path)
+        rollups.ensure_schema(_conn)
+        _stale = rollups.patients_needing_rebuild(_conn)
+        _conn.close()
+        if _stale:
+            print(f"[WARN] history rollups are behind for {len(_stale)} patient(s); "
+                  "run `python -m backend.rollups rebuild`.", file=sys.stderr)
+        HISTORY.add_write_hook(rollups.apply_entry)
+HISTORY_TOKEN = os.getenv("HISTORY_TOKEN", "")
+HISTORY_MAX_LIMIT = 500
+
+
+def _record_history(payload: dict, patient, name: str, duration: str) -> None:
+    # Queued for the writer thread; never blocks the request.
+    if HISTORY is not None and payload.get("ok"):
+        HISTORY.record(payload, patient.strip() if isinstance(patient, str) else "", name, duration)
+
+
+# --- Batch analysis (/analyze/batch) ---
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+BATCH_EXECUTOR = os.getenv("BATCH_EXECUTOR", "thread")  # "thread" or "process"
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_TIME_BUDGET = float(os.getenv("BATCH_TIME_BUDGET", "30"))  # seconds per batch
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def _get_batch_pool():
+    global _batch_pool
+    if _batch_pool is None:
+        with _batch_pool_lock:
+            if _batch_pool is None:
+                cls = ProcessPoolExecutor if BATCH_EXECUTOR == "process" else ThreadPoolExecutor
+                _batch_pool = cls(max_workers=max(1, BATCH_WORKERS))
+    return _batch_pool
+
+
+def _analyze_record(record, locale: str = "") -> dict:
+    # Module-level so it can also run on a process pool. `locale`: the request's default.
+    if not isinstance(record, dict):
+        raise ValueError("Each item must be an object with a 'description'.")
+    fields = {}
+    for key in ("description", "name", "duration", "locale"):
+        val = record.get(key)
+        if val is not None and not isinstance(val, str):
+            raise ValueError(f"'{key}' must be a string.")
+        fields[key] = (val or "").strip()
+    pack = LOCALES.resolve(fields["locale"] or locale)
+    return analyze_description(fields["description"], fields["name"], fields["duration"], pack)
+
+
+def _parse_batch_body(raw: bytes, content_type: str) -> list:
+    text = raw.decode("utf-8")
+    stripped = text.lstrip()
+    if "ndjson" in content_type or "jsonlines" in content_type or (stripped and not stripped.startswith("[")):
+        items = []
+        for lineno, line in enumerate(text.splitlines(), 1):
+            if line.strip():
+                try:
+                    items.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f"Invalid JSON on line {lineno}: {e}") from e
+        return items
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of records.")
+    return items
+
+
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "your_default_secret")
 
@@ -75,16 +255,237 @@ CORS(app, resources={r"/*": {"origins": [
 ]}})
 
 
+# --- Metrics: per-stage histograms, /metrics, Server-Timing, slow-request log ---
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))  # 0 = no slow-request log
+
+
+def _json_payload(payload: dict) -> Response:
+    with metrics.stage("serialize"):
+        return jsonify(payload)
+
+
+def _wire_options(data: dict):
+    """(fields, encoding, format) from query args or the JSON body; raises wire.ShapeError."""
+    def opt(key):
+        val = request.args.get(key)
+        if val is None and isinstance(data, dict):
+            val = data.get(key)
+        return val if isinstance(val, str) else ""
+    wanted = wire.requested_fields(opt("view"), opt("fields"))
+    encoding = opt("encoding") or "names"
+    if encoding not in wire.ENCODINGS:
+        raise wire.ShapeError(f"Unknown encoding '{encoding}'. Use one of: {', '.join(wire.ENCODINGS)}.")
+    fmt = wire.negotiate_format(opt("format"), request.headers.get("Accept", ""))
+    if fmt not in wire.available_formats():
+        raise wire.UnsupportedFormat(f"Format '{fmt}' is not available on this server; use JSON.")
+    return wanted, encoding, fmt
+
+
+def _wire_body(payload: dict, wanted, encoding: str, pack: "locales.LocalePack" = None) -> dict:
+    body = wire.shape(payload, wanted)
+    if encoding == "ids":
+        snap = get_snapshot() if pack is None else pack.snapshot
+        body = wire.to_ids(body, snap.categories, CONTEXTS, version_of(snap.source_hash))
+    return body
+
+
+def _wire_response(payload: dict, wanted, encoding: str, fmt: str, pack: "locales.LocalePack" = None) -> Response:
+    with metrics.stage("serialize"):
+        data, mimetype = wire.encode(_wire_body(payload, wanted, encoding, pack), fmt)
+    resp = Response(data, mimetype=mimetype)
+    resp.vary.add("Accept")
+    return _localized(resp, pack)
+
+
+def _request_locale(data=None) -> str:
+    """?locale=, else a "locale" body/form field, else Accept-Language; "" = default."""
+    code = request.args.get("locale")
+    if code is None and data is not None and hasattr(data, "get"):
+        code = data.get("locale")
+    if isinstance(code, str) and code.strip():
+        return code.strip()
+    return LOCALES.negotiate(request.headers.get("Accept-Language", ""))
+
+
+def _request_pack(data=None) -> "locales.LocalePack":
+    """The locale pack for this request (None = default); raises UnknownLocale/LocalePackError."""
+    return LOCALES.resolve(_request_locale(data))
+
+
+def _locale_error(e: ValueError):
+    status = 400 if isinstance(e, locales.UnknownLocale) else 500
+    if status == 500:
+        print(f"[WARN] locale pack failed to load: {e}", file=sys.stderr)
+    return jsonify({"ok": False, "error": str(e), "locales": LOCALES.available()}), status
+
+
+def _localized(resp: Response, pack: "locales.LocalePack" = None) -> Response:
+    resp.headers["Content-Language"] = LOCALES.default if pack is None else pack.code
+    resp.vary.add("Accept-Language")
+    return resp
+
+
+@app.before_request
+def _metrics_begin():
+    metrics.begin_request()
+
+
+@app.after_request
+def _metrics_end(response):
+    total, stages, notes = metrics.end_request()
+    endpoint = request.endpoint or "not_found"
+    metrics.REQUEST_SECONDS.observe(total, endpoint)
+    metrics.REQUESTS.inc(endpoint, str(response.status_code))
+    if response.status_code >= 500:
+        metrics.ERRORS.inc(endpoint)
+    if stages:
+        response.headers["Server-Timing"] = metrics.server_timing(total, stages)
+    if SLOW_REQUEST_MS and total * 1000 >= SLOW_REQUEST_MS:
+        # Timings and sizes only: request text is patient data and is never logged.
+        entry = {"endpoint": endpoint, "status": response.status_code, "ms": round(total * 1000, 3),
+                 "stages_ms": {k: round(v * 1000, 3) for k, v in stages.items()}, **notes}
+        print(f"[SLOW] {json.dumps(entry)}", file=sys.stderr)
+    return response
+
+
+def _cache_metrics():
+    stats = RESULT_CACHE.stats()
+    events = {k: stats[k] for k in ("hits", "misses", "coalesced", "evictions", "expirations", "invalidations")}
+    lines = ["# HELP emp_result_cache_events_total Result cache events.",
+             "# TYPE emp_result_cache_events_total counter"]
+    lines.extend(f'emp_result_cache_events_total{{event="{k}"}} {v}' for k, v in sorted(events.items()))
+    lines += metrics.gauge_lines("emp_result_cache_size", "Result cache occupancy.",
+                                 {"entries": stats["entries"], "bytes": stats["bytes"], "inflight": stats["inflight"]},
+                                 "kind")
+    lines += metrics.gauge_lines("emp_live_sessions", "Open live-analysis sessions.",
+                                 {"open": len(LIVE_SESSIONS)}, "state")
+    lines += metrics.gauge_lines("emp_taxonomy_version", "Installed taxonomy snapshot version.",
+                                 {"current": get_snapshot().version}, "snapshot")
+    return lines
+
+
+metrics.REGISTRY.collector(_cache_metrics)
+if HISTORY is not None:
+    metrics.REGISTRY.collector(lambda: history.gauge_lines(HISTORY))
+
+
+# --- Admission control: bounded concurrency + fast 503s on the analysis routes ---
+ADMISSION = admission.gate_from_env()
+ADMISSION_ENDPOINTS = admission.endpoints_from_env()
+
+
+@app.before_request
+def _admission_begin():
+    if ADMISSION is None or request.endpoint not in ADMISSION_ENDPOINTS:
+        return None
+    try:
+        g.admission = ADMISSION.acquire(request.environ.get(admission.ARRIVAL_KEY))
+    except admission.Saturated as e:
+        admission.SHED.inc(request.endpoint, e.reason)
+        resp = jsonify({"ok": False, "error": str(e), "retry_after": e.retry_after})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp
+    return None
+
+
+@app.after_request
+def _admission_handoff(response):
+    # A streamed body (batch NDJSON) is produced after this point: hold the slot until
+    # the server closes it. Anything else is done, so free the slot now rather than
+    # trusting every caller (test clients, proxies) to close the response.
+    ticket = g.pop("admission", None)
+    if ticket is not None:
+        if response.is_streamed:
+            response.call_on_close(ticket.release)
+        else:
+            ticket.release()
+    return response
+
+
+@app.teardown_request
+def _admission_end(exc):
+    # Only reached with a ticket if after_request never ran.
+    ticket = g.pop("admission", None)
+    if ticket is not None:
+        ticket.release()
+
+
+if ADMISSION is not None:
+    metrics.REGISTRY.collector(ADMISSION.gauge_lines)
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness/readiness: never gated, does no analysis."""
+    body = {"ok": True, "taxonomy_version": get_snapshot().version,
+            "locales": {**LOCALES.stats(), "available": LOCALES.available()}}
+    if ADMISSION is not None:
+        body["admission"] = ADMISSION.stats()
+    return jsonify(body)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+# --- Pages: rendered once per taxonomy version, served with ETag/gzip/304 ---
+PAGES = PrerenderCache()
+SAMPLES_PER_CATEGORY = 5
+
+
+def _serve_prerendered(page: Prerendered, cache_control: str = None) -> Response:
+    coding, body, etag = page.choose(request.headers.get("Accept-Encoding", ""))
+    headers = {"ETag": etag, "Cache-Control": cache_control or page.cache_control, "Vary": "Accept-Encoding"}
+    if page.matches(request.headers.get("If-None-Match", "")):
+        return Response(status=304, headers=headers)
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(body, content_type=page.content_type, headers=headers)
+
+
+def _page(name: str, version: str, render, content_type: str = "text/html; charset=utf-8",
+          cache_control: str = "no-cache") -> Prerendered:
+    if app.debug:
+        PAGES.clear()  # pick up template edits while developing
+    return PAGES.get(name, version, lambda: Prerendered(render().encode("utf-8"), content_type, cache_control))
+
+
 @app.route("/", methods=["GET"])
 def index():
-    # Render the inline HTML, passing taxonomy to front-end JS for category/expressions
-    return render_template("index.html", taxonomy=taxonomy)
+    # The page only embeds the versioned /taxonomy.json URL; the front-end fetches categories/expressions from it.
+    version = version_of(get_snapshot().source_hash)
+    page = _page("index", version, lambda: render_template(
+        "index.html", taxonomy_url=url_for("taxonomy_json", v=version)))
+    return _serve_prerendered(page)
+
+
+@app.route("/taxonomy.json", methods=["GET"])
+def taxonomy_json():
+    # ?locale=<code> serves a locale pack's taxonomy (only an explicit locale: the page URL is cached).
+    try:
+        pack = LOCALES.resolve(request.args.get("locale"))
+    except (locales.UnknownLocale, locales.LocalePackError) as e:
+        return _locale_error(e)
+    snap = get_snapshot() if pack is None else pack.snapshot
+    version = version_of(snap.source_hash)
+    # "categories"/"contexts" are the id dictionaries for encoding=ids responses.
+    page = _page("taxonomy.json" if pack is None else f"taxonomy.json/{pack.code}", version, lambda: app.json.dumps(
+        {"version": version, "locale": snap.locale, "categories": list(snap.categories),
+         "contexts": list(CONTEXTS), "taxonomy": snap.taxonomy}), content_type="application/json")
+    # ?v=<current version> never changes, so it can be cached for good.
+    if request.args.get("v") == version:
+        return _serve_prerendered(page, "public, max-age=31536000, immutable")
+    return _serve_prerendered(page)
 
 
 @app.route("/evidence", methods=["GET"])
 def evidence_page():
     # renders backend/templates/evidence.html
-    return render_template("evidence.html")
+    page = _page("evidence", "static", lambda: render_template("evidence.html"),
+                 cache_control="public, max-age=3600")
+    return _serve_prerendered(page)
 
 
 # optional alias so /evidence.html also works
@@ -95,6 +496,26 @@ def evidence_html_alias():
     return redirect(url_for("evidence_page"))
 
 
+@app.route("/samples", methods=["GET"])
+def samples_page():
+    snap = get_snapshot()
+
+    def render():
+        sample_categories = {
+            cat: list(spec.get("expressions", []))[:SAMPLES_PER_CATEGORY]
+            for cat, spec in snap.metaphor_types.items() if spec.get("expressions")
+        }
+        return render_template("samples.html", sample_categories=sample_categories)
+
+    page = _page("samples", version_of(snap.source_hash), render)
+    return _serve_prerendered(page)
+
+
+@app.route("/samples.html", methods=["GET"])
+def samples_html_alias():
+    return redirect(url_for("samples_page"))
+
+
 @app.route("/analyze", methods=["POST"])
 def analyze():
     # Accept either constructed text or fallback from individual fields
@@ -123,34 +544,19 @@ def analyze():
             bits.append(f"Quality of life: {qol}.")
         description = " ".join(bits).strip()
 
-    # Normalise trigger labels so the tagger recognises them
-    description = normalize_triggers(description)
-
     if description:
         try:
-            results = tag_pain_description(
-                description,
-                name=name or None,
-                duration=duration or None
-            )
-
-            results["input"] = description
-            plain = generate_patient_summary(results)
-            doctor = generate_doctor_summary(results)
-            entail = generate_entailment_summary(
-                results.get("entailments", {}))
-
-            payload = {
-                "ok": True,
-                "patient": plain,
-                "doctor": doctor,
-                "entailments": entail,
-                "results": results,
-            }
+            pack = _request_pack(request.form)
+        except (locales.UnknownLocale, locales.LocalePackError) as e:
+            return _locale_error(e)
+        try:
+            # Trigger labels are normalised inside so the tagger recognises them.
             # Always return JSON (front-end fetch expects it)
-            return jsonify(payload)
+            payload = analyze_description(description, name, duration, pack)
+            _record_history(payload, request.form.get("patient_id", ""), name, duration)
+            return _localized(_json_payload(payload), pack)
         except Exception as e:
-            return jsonify({"ok": False, "error": str(e), "input": description}), 500
+            return jsonify({"ok": False, "error": str(e), "input": normalize_triggers(description)}), 500
 
     return jsonify({"ok": False, "error": "No description provided."}), 400
 
@@ -159,33 +565,464 @@ def analyze():
 
 @app.route("/analyze.json", methods=["POST"])
 def analyze_json():
+    """
+    Optional (query or body): view=minimal|patient|clinician|full or fields=a,b,...;
+    encoding=ids for bitmask categories; format=msgpack or Accept: application/msgpack;
+    locale=<code> (else Accept-Language) to tag with a locale pack.
+    """
     data = request.get_json(silent=True) or {}
-    description = normalize_triggers((data.get("description") or "").strip())
+    description = (data.get("description") or "").strip()
     name = (data.get("name") or "").strip()
     duration = (data.get("duration") or "").strip()
-
     try:
-        results = tag_pain_description(
-            description,
-            name=name or None,
-            duration=duration or None
-        )
-
-        results["input"] = description
-        plain = generate_patient_summary(results)
-        doctor = generate_doctor_summary(results)
-        entail = generate_entailment_summary(results.get("entailments", {}))
+        wanted, encoding, fmt = _wire_options(data)
+    except wire.UnsupportedFormat as e:
+        return jsonify({"ok": False, "error": str(e)}), 406
+    except wire.ShapeError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    try:
+        pack = _request_pack(data)
+    except (locales.UnknownLocale, locales.LocalePackError) as e:
+        return _locale_error(e)
 
-        payload = {
-            "ok": True,
-            "patient": plain,
-            "doctor": doctor,
-            "entailments": entail,
-            "results": results,
-        }
-        return jsonify(payload)
+    try:
+        payload = analyze_description(description, name, duration, pack)
+        _record_history(payload, data.get("patient_id"), name, duration)
+        return _wire_response(payload, wanted, encoding, fmt, pack)
     except Exception as e:
-        return jsonify({"ok": False, "error": str(e), "input": description}), 500
+        return jsonify({"ok": False, "error": str(e), "input": normalize_triggers(description)}), 500
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(RESULT_CACHE.stats())
+
+
+def _history_denied():
+    """
+    None if the request may read patient history (Authorization: Bearer $HISTORY_TOKEN),
+    else the error response. Without a token the routes don't exist (404, like /admin):
+    remote_addr can't tell a local client from a reverse proxy on the same host.
+    """
+    if not HISTORY_TOKEN:
+        return jsonify({"ok": False, "error": "Not found."}), 404
+    supplied = request.headers.get("Authorization", "")
+    if hmac.compare_digest(supplied.encode(), f"Bearer {HISTORY_TOKEN}".encode()):
+        return None
+    return jsonify({"ok": False, "error": "Not allowed."}), 403
+
+
+def _parse_time(value: str):
+    """Unix seconds, or an ISO date/datetime (UTC unless it carries an offset); None if empty."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    stamp = datetime.fromisoformat(value)
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+@app.route("/history", methods=["GET"])
+def history_view():
+    """
+    Stored analyses, newest first. Query: patient, since, until (unix seconds or ISO
+    dates; until is exclusive), context, category, limit (max 500), before (an entry id,
+    from "next_before", to page back).
+    """
+    if HISTORY is None:
+        return jsonify({"ok": False, "error": "History is disabled on this server (set HISTORY_DB)."}), 404
+    denied = _history_denied()
+    if denied is not None:
+        return denied
+    args = request.args
+    try:
+        since, until = _parse_time(args.get("since", "")), _parse_time(args.get("until", ""))
+        limit = min(HISTORY_MAX_LIMIT, max(1, int(args.get("limit", "50"))))
+        before = int(args["before"]) if args.get("before") else None
+    except ValueError as e:
+        return jsonify({"ok": False, "error": f"Bad query parameter: {e}"}), 400
+    with metrics.stage("history_query"):
+        entries = HISTORY.query(patient=args.get("patient"), since=since, until=until,
+                                context=args.get("context") or None, category=args.get("category") or None,
+                                limit=limit, before_id=before)
+    body = {"ok": True, "entries": entries}
+    if len(entries) == limit:
+        body["next_before"] = entries[-1]["id"]
+    return _json_payload(body)
+
+
+@app.route("/history/timeline", methods=["GET"])
+def history_timeline():
+    """
+    One entry per menstrual cycle for ?patient=, oldest first, from the precomputed
+    rollups. Optional: context, category, since, until (as for /history).
+    """
+    if HISTORY is None or rollups.apply_entry not in HISTORY.hooks:
+        return jsonify({"ok": False, "error": "History rollups are disabled on this server."}), 404
+    denied = _history_denied()
+    if denied is not None:
+        return denied
+    args = request.args
+    if not args.get("patient"):
+        return jsonify({"ok": False, "error": "Missing 'patient'."}), 400
+    try:
+        since, until = _parse_time(args.get("since", "")), _parse_time(args.get("until", ""))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": f"Bad query parameter: {e}"}), 400
+    with metrics.stage("history_timeline"):
+        cycles = rollups.timeline(HISTORY.reader(), args["patient"], args.get("context") or None,
+                                  args.get("category") or None, since, until)
+    return _json_payload({"ok": True, "patient": args["patient"], "cycles": cycles})
+
+
+@app.route("/analyze/batch", methods=["POST"])
+def analyze_batch():
+    """
+    Analyse many {description, name, duration} records in one request.
+    Body: JSON array or NDJSON. Response: NDJSON, one line per record in input order,
+    each carrying its "index" and either the /analyze.json payload or an error.
+    ?view=/fields=/encoding= shape each record as for /analyze.json. A record's "locale"
+    overrides the request's (?locale= or Accept-Language).
+    """
+    try:
+        wanted = wire.requested_fields(request.args.get("view", ""), request.args.get("fields", ""))
+        encoding = request.args.get("encoding") or "names"
+        if encoding not in wire.ENCODINGS:
+            raise wire.ShapeError(f"Unknown encoding '{encoding}'. Use one of: {', '.join(wire.ENCODINGS)}.")
+    except wire.ShapeError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    try:
+        items = _parse_batch_body(request.get_data(), request.content_type or "")
+    except ValueError as e:
+        return jsonify({"ok": False, "error": f"Could not parse batch: {e}"}), 400
+    if not items:
+        return jsonify({"ok": False, "error": "No records provided."}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"ok": False, "error": f"Batch too large: {len(items)} records (max {BATCH_MAX_ITEMS})."}), 413
+
+    locale = _request_locale()
+    deadline = time.monotonic() + BATCH_TIME_BUDGET
+    pool = _get_batch_pool()
+    futures = [pool.submit(_analyze_record, item, locale) for item in items]
+
+    def generate():
+        expired = False
+        for index, fut in enumerate(futures):
+            if not expired:
+                try:
+                    payload = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+                    code = payload["results"].get("locale")
+                    pack = None if code == LOCALES.default else LOCALES.resolve(code)
+                    row = {"index": index, **_wire_body(payload, wanted, encoding, pack)}
+                except FutureTimeout:
+                    expired = True
+                    for rest in futures[index:]:
+                        rest.cancel()
+                except Exception as e:
+                    metrics.ERRORS.inc("analyze_batch")
+                    row = {"index": index, "ok": False, "error": str(e)}
+            if expired:
+                row = {"index": index, "ok": False, "error": "Batch time budget exceeded."}
+            yield wire.dumps_json(row) + b"\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+# --- Live re-analysis (/analyze/live): as-you-type previews ---
+LIVE_MAX_CHARS = int(os.getenv("LIVE_MAX_CHARS", "20000"))
+LIVE_SENTENCE_CACHE = int(os.getenv("LIVE_SENTENCE_CACHE", "512"))  # per session
+LIVE_STREAM_SECONDS = float(os.getenv("LIVE_STREAM_SECONDS", "300"))  # EventSource reconnects after
+LIVE_SESSIONS = LiveSessionStore(
+    max_sessions=int(os.getenv("LIVE_MAX_SESSIONS", "1000")),
+    ttl=float(os.getenv("LIVE_SESSION_TTL", "1800")),
+)
+
+
+def _live_update(session, edit: dict):
+    """Apply one edit to a session and re-analyse it; only changed sentences are re-tagged."""
+    with session.lock:
+        try:
+            text = session.apply(edit, LIVE_MAX_CHARS)
+        except EditConflict as e:
+            return jsonify({"ok": False, "error": str(e), "session": session.sid,
+                            "revision": session.revision}), 409
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+
+        cache = session.sentence_cache
+        known = len(cache)
+        try:
+            pack = LOCALES.resolve(session.locale)
+        except (locales.UnknownLocale, locales.LocalePackError) as e:
+            return _locale_error(e)
+        normalize = normalize_triggers if pack is None else pack.normalize_triggers
+        payload = _build_payload(normalize(text.strip()), session.name, session.duration, cache, pack)
+        retagged = len(cache) - known
+        session.prune_sentence_cache(LIVE_SENTENCE_CACHE)
+        payload.update({"session": session.sid, "revision": session.revision + 1, "retagged": retagged})
+        session.publish(text, payload)
+    return _localized(jsonify(payload), pack)
+
+
+@app.route("/analyze/live", methods=["POST"])
+def analyze_live_start():
+    """
+    Start a live session. Optional JSON body: the first revision ({"text", "name", "duration"})
+    and/or "locale" (else Accept-Language), fixed for the session. Then POST edits to
+    /analyze/live/<session> and/or listen on /analyze/live/<session>/events.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        pack = _request_pack(data)
+    except (locales.UnknownLocale, locales.LocalePackError) as e:
+        return _locale_error(e)
+    session = LIVE_SESSIONS.create()
+    session.locale = "" if pack is None else pack.code
+    if "text" not in data:
+        return jsonify({"ok": True, "session": session.sid, "revision": 0})
+    return _live_update(session, data)
+
+
+@app.route("/analyze/live/<sid>", methods=["POST"])
+def analyze_live_edit(sid):
+    """
+    Body: {"text": full revision} or {"base_revision", "start", "end", "insert"} (a splice of
+    the current text); "name"/"duration" may accompany either. A 409 means the delta was
+    based on a stale revision: resend the full text.
+    """
+    session = LIVE_SESSIONS.get(sid)
+    if session is None:
+        return jsonify({"ok": False, "error": "Unknown or expired live session."}), 404
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"ok": False, "error": "Body must be a JSON object."}), 400
+    return _live_update(session, data)
+
+
+@app.route("/analyze/live/<sid>/events", methods=["GET"])
+def analyze_live_events(sid):
+    """Server-Sent Events: one "analysis" event per new revision (latest only if edits pile up)."""
+    session = LIVE_SESSIONS.get(sid)
+    if session is None:
+        return jsonify({"ok": False, "error": "Unknown or expired live session."}), 404
+    dumps = app.json.dumps
+
+    def generate():
+        yield "retry: 2000\n\n"
+        sent = 0
+        stop_at = time.monotonic() + LIVE_STREAM_SECONDS
+        while time.monotonic() < stop_at:
+            with session.changed:
+                if session.revision == sent:
+                    session.changed.wait(timeout=15)
+                revision, payload = session.revision, session.last_payload
+            if revision != sent and payload is not None:
+                sent = revision
+                yield f"id: {revision}\nevent: analysis\ndata: {dumps(payload)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# --- PDF reports (/reports): rendered on a process pool, cached on disk ---
+REPORT_TITLES = {"patient": "Pain description report", "clinician": "Clinician summary"}
+_reports = None
+_reports_lock = threading.Lock()
+
+
+def _get_reports() -> reports.ReportQueue:
+    global _reports
+    if _reports is None:
+        with _reports_lock:
+            if _reports is None:
+                _reports = reports.queue_from_env()
+    return _reports
+
+
+def _report_html(kind: str, payload: dict, name: str, duration: str) -> str:
+    results = payload["results"]
+    modifiers = (results.get("extras") or {}).get("modifiers_by_context") or {}
+    rows = []
+    for ctx, cats in (results.get("matched_by_context") or {}).items():
+        mods = []
+        for cat, kinds in (modifiers.get(ctx) or {}).items():
+            terms = [t for found in kinds.values() for t in found]
+            if terms:
+                mods.append(f"{cat.replace('_', ' ')}: {', '.join(terms)}")
+        rows.append((ctx.replace("_", " "), [c.replace("_", " ") for c in cats], mods))
+    extras = results.get("extras") or {}
+    return render_template(
+        "report.html", kind=kind, title=REPORT_TITLES[kind], name=name, duration=duration,
+        description=results.get("input", ""), taxonomy_version=results.get("taxonomy_version"),
+        patient_html=reports.summary_html(payload["patient"]),
+        doctor_html=reports.summary_html(payload["doctor"]),
+        by_context=rows, triggers=extras.get("triggers_detected") or [],
+        life_impact=extras.get("life_impact_detected") or [])
+
+
+def _report_urls(job_id: str) -> dict:
+    return {"status_url": url_for("report_status", job_id=job_id),
+            "events_url": url_for("report_events", job_id=job_id),
+            "download_url": url_for("report_download", job_id=job_id)}
+
+
+def _report_status(job: reports.ReportJob, urls: dict = None) -> dict:
+    state = job.to_dict()
+    body = {"ok": state["status"] != "failed", **state, **(urls or _report_urls(job.id))}
+    if state["status"] != "done":
+        del body["download_url"]
+    return body
+
+
+def _report_metrics():
+    if _reports is None:
+        return []
+    stats = _reports.stats()
+    return metrics.gauge_lines("emp_reports", "PDF report queue and disk cache.",
+                               {"pending": stats["pending"], "cached_files": stats["cache"]["files"],
+                                "cached_bytes": stats["cache"]["bytes"]}, "kind")
+
+
+metrics.REGISTRY.collector(_report_metrics)
+
+
+def _unknown_report():
+    return jsonify({"ok": False, "error": "Unknown or expired report job."}), 404
+
+
+@app.route("/reports", methods=["POST"])
+def report_submit():
+    """
+    Body: {"description", "name", "duration", "kind": "patient"|"clinician", "locale"}. Returns the
+    job (202, or 200 when the same report is already on disk); then poll status_url,
+    listen on events_url, and fetch download_url once "status" is "done".
+    """
+    if not reports.available():
+        return jsonify({"ok": False, "error": "PDF export needs the weasyprint package on this server."}), 501
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind") or "patient"
+    if kind not in reports.REPORT_KINDS:
+        return jsonify({"ok": False, "error": f"Unknown kind '{kind}'. Use one of: {', '.join(reports.REPORT_KINDS)}."}), 400
+    fields = {}
+    for key in ("description", "name", "duration"):
+        val = data.get(key)
+        if val is not None and not isinstance(val, str):
+            return jsonify({"ok": False, "error": f"'{key}' must be a string."}), 400
+        fields[key] = (val or "").strip()
+    if not fields["description"]:
+        return jsonify({"ok": False, "error": "No description provided."}), 400
+    try:
+        pack = _request_pack(data)
+    except (locales.UnknownLocale, locales.LocalePackError) as e:
+        return _locale_error(e)
+
+    payload = analyze_description(fields["description"], fields["name"], fields["duration"], pack)
+    with metrics.stage("report_html"):
+        html = _report_html(kind, payload, fields["name"], fields["duration"])
+    try:
+        job = _get_reports().submit(html, kind)
+    except reports.QueueFull as e:
+        resp = jsonify({"ok": False, "error": str(e)})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "5"
+        return resp
+    return jsonify(_report_status(job)), 200 if job.status == "done" else 202
+
+
+@app.route("/reports/<job_id>", methods=["GET"])
+def report_status(job_id):
+    job = _get_reports().get(job_id)
+    if job is None:
+        return _unknown_report()
+    return jsonify(_report_status(job))
+
+
+@app.route("/reports/<job_id>/events", methods=["GET"])
+def report_events(job_id):
+    """Server-Sent Events: a "status" event on every change, ending with done or failed."""
+    queue = _get_reports()
+    job = queue.get(job_id)
+    if job is None:
+        return _unknown_report()
+    dumps = app.json.dumps
+    urls = _report_urls(job.id)  # url_for needs this request's context; the stream outlives it
+
+    def generate():
+        last = None
+        stop_at = time.monotonic() + LIVE_STREAM_SECONDS
+        while time.monotonic() < stop_at:
+            body = _report_status(job, urls)
+            if body != last:
+                last = body
+                yield f"event: status\ndata: {dumps(body)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if body["status"] in ("done", "failed"):
+                return
+            queue.wait(job, timeout=15)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/reports/<job_id>/pdf", methods=["GET"])
+def report_download(job_id):
+    queue = _get_reports()
+    job = queue.get(job_id)
+    if job is None:
+        return _unknown_report()
+    if job.status != "done":
+        return jsonify(_report_status(job)), 409
+    path = queue.cache.get(job.id)
+    if path is None:  # evicted since it finished
+        return _unknown_report()
+    return send_file(path, mimetype="application/pdf", as_attachment=True,
+                     download_name=f"explain-my-pain-{job.kind or 'report'}.pdf", max_age=0)
+
+
+# --- Admin: live taxonomy reload (disabled unless ADMIN_TOKEN is set) ---
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def _is_admin() -> bool:
+    supplied = request.headers.get("Authorization", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied.encode(), f"Bearer {ADMIN_TOKEN}".encode())
+
+
+@app.route("/admin/taxonomy", methods=["GET"])
+def admin_taxonomy_status():
+    if not _is_admin():
+        return jsonify({"ok": False, "error": "Not found."}), 404
+    return jsonify({"ok": True, **taxonomy_reload.status()})
+
+
+@app.route("/admin/taxonomy/reload", methods=["POST"])
+def admin_taxonomy_reload():
+    """
+    Recompile in the background (from a posted taxonomy, or taxonomy.py) and swap atomically;
+    once compiled it is published to the other worker processes (see taxonomy_reload).
+    """
+    if not _is_admin():
+        return jsonify({"ok": False, "error": "Not found."}), 404
+    new_taxonomy = None
+    if request.get_data():
+        new_taxonomy = request.get_json(silent=True)
+        if not isinstance(new_taxonomy, dict) or not isinstance(new_taxonomy.get("metaphor_types"), dict):
+            return jsonify({"ok": False, "error": "Body must be a taxonomy object with 'metaphor_types'."}), 400
+    if not taxonomy_reload.reload_in_background(new_taxonomy, share=True):
+        return jsonify({"ok": False, "error": "A reload is already in progress.", **taxonomy_reload.status()}), 409
+    return jsonify({"ok": True, "reloading": True, **taxonomy_reload.status()}), 202
+
+
+if ADMIN_TOKEN:
+    taxonomy_reload.load_published()  # posted to another worker, or before a restart
+taxonomy_reload.start_watcher_from_env()
 
 
 if __name__ == "__main__":
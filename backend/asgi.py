@@ -0,0 +1,256 @@
+# asgi.py — async entry point serving the same Flask app
+#   uvicorn backend.asgi:app --workers 2
+# The event loop owns the sockets: it reads request bodies and writes responses, so
+# slow clients and idle keep-alive connections cost no thread. Only the Flask call
+# itself (tagging is CPU-bound) and each step of a streamed response run on bounded
+# thread pools. Routes and JSON are exactly those of backend.app.
+# Analysis routes (the endpoints admission gates, plus history and PDF downloads) and
+# everything else use separate pools, so pages, /metrics and /healthz never queue
+# behind a backlog of analyses or report submits. Streamed bodies
+# (batch NDJSON, SSE) are pulled on a third pool, and event streams run there from
+# the start: they block in their generator between events, holding a stream thread,
+# never an analysis or priority one.
+
+import asyncio
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from werkzeug.exceptions import HTTPException
+
+try:
+    from .admission import ARRIVAL_KEY
+    from .app import ADMISSION_ENDPOINTS, app as flask_app
+except ImportError:
+    from admission import ARRIVAL_KEY
+    from app import ADMISSION_ENDPOINTS, app as flask_app
+
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "8"))  # concurrent Flask calls per process
+ASGI_MAX_BODY = int(os.getenv("ASGI_MAX_BODY", str(4 * 1024 * 1024)))
+ASGI_PRIORITY_THREADS = int(os.getenv("ASGI_PRIORITY_THREADS", "2"))  # pages, /metrics, /healthz
+ASGI_STREAM_THREADS = int(os.getenv("ASGI_STREAM_THREADS", "32"))  # open streamed responses
+# Run on the analysis pool: every gated endpoint, plus ungated ones that hit the
+# history store or the PDF cache.
+ANALYSIS_ENDPOINTS = ADMISSION_ENDPOINTS | frozenset({"history_view", "history_timeline", "report_download"})
+EVENTS_SUFFIX = "/events"  # SSE routes: /analyze/live/<sid>/events, /reports/<id>/events
+
+
+class WSGIBridge:
+    """Minimal ASGI -> WSGI adapter (HTTP + lifespan)."""
+
+    def __init__(self, wsgi_app, threads: int = ASGI_THREADS, max_body: int = ASGI_MAX_BODY,
+                 priority_threads: int = ASGI_PRIORITY_THREADS, stream_threads: int = ASGI_STREAM_THREADS,
+                 analysis_endpoints: frozenset = ANALYSIS_ENDPOINTS):
+        self.wsgi_app = wsgi_app
+        self.analysis_endpoints = analysis_endpoints
+        # Same routing table as Flask, so the pool follows the endpoint, not a path prefix.
+        url_map = getattr(wsgi_app, "url_map", None)
+        self._urls = url_map.bind("localhost") if url_map is not None else None
+        self.threads = threads
+        self.priority_threads = priority_threads
+        self.stream_threads = max(1, stream_threads)
+        self.max_body = max_body
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._priority_executor: Optional[ThreadPoolExecutor] = None
+        self._stream_executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="asgi-wsgi")
+        return self._executor
+
+    @property
+    def priority_executor(self) -> ThreadPoolExecutor:
+        if self.priority_threads <= 0:
+            return self.executor
+        if self._priority_executor is None:
+            self._priority_executor = ThreadPoolExecutor(max_workers=self.priority_threads,
+                                                         thread_name_prefix="asgi-wsgi-priority")
+        return self._priority_executor
+
+    @property
+    def stream_executor(self) -> ThreadPoolExecutor:
+        if self._stream_executor is None:
+            self._stream_executor = ThreadPoolExecutor(max_workers=self.stream_threads,
+                                                       thread_name_prefix="asgi-wsgi-stream")
+        return self._stream_executor
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for pool in (self._executor, self._priority_executor, self._stream_executor):
+                    if pool is not None:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._priority_executor = self._stream_executor = None
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _pool_for(self, method: str, path: str) -> ThreadPoolExecutor:
+        if path.endswith(EVENTS_SUFFIX):
+            return self.stream_executor
+        if self._urls is not None:
+            try:
+                endpoint, _ = self._urls.match(path, method=method)
+            except HTTPException:  # 404/405/redirect: answered without analysis
+                return self.priority_executor
+            if endpoint in self.analysis_endpoints:
+                return self.executor
+        return self.priority_executor
+
+    # -----------------------
+    # HTTP
+    # -----------------------
+    async def _http(self, scope, receive, send) -> None:
+        arrived = time.monotonic()
+        chunks: List[bytes] = []
+        size = 0
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body:
+                await _plain_response(send, 413, b"Request body too large.")
+                return
+            chunks.append(chunk)
+            more = message.get("more_body", False)
+
+        environ = _build_environ(scope, b"".join(chunks))
+        environ[ARRIVAL_KEY] = arrived  # admission deadlines include time queued for a thread
+        pool = self._pool_for(scope["method"], environ["PATH_INFO"].encode("latin-1").decode("utf-8"))
+        loop = asyncio.get_running_loop()
+        status, headers, first, rest = await loop.run_in_executor(pool, _start, self.wsgi_app, environ)
+
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if rest is None:
+            await send({"type": "http.response.body", "body": first})
+            return
+
+        # Streamed response (batch NDJSON, live SSE): pull each chunk on the stream pool
+        # and stop as soon as the client goes away.
+        pool = self.stream_executor
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send({"type": "http.response.body", "body": first, "more_body": True})
+            while not disconnected.is_set():
+                chunk = await loop.run_in_executor(pool, _next_chunk, rest)
+                if chunk is None:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            watcher.cancel()
+            await loop.run_in_executor(pool, _close, rest)
+
+
+def _build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _start(wsgi_app, environ) -> Tuple[int, List[Tuple[bytes, bytes]], bytes, Any]:
+    """
+    Run the WSGI app up to its first body chunk (on a pool thread).
+    Returns (status, headers, first chunk, iterator or None when the body is complete).
+    """
+    response: Dict[str, Any] = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: None  # write() is not used by Flask
+
+    result = wsgi_app(environ, start_response)
+    iterator = iter(result)
+    first = next(iterator, b"")
+    length = next((v for k, v in response["headers"] if k == b"content-length"), None)
+    if length is not None and int(length) == len(first):
+        _close(result)
+        return response["status"], response["headers"], first, None
+    return response["status"], response["headers"], first, _Stream(result, iterator)
+
+
+class _Stream:
+    __slots__ = ("result", "iterator")
+
+    def __init__(self, result, iterator):
+        self.result = result
+        self.iterator = iterator
+
+
+def _next_chunk(stream: _Stream) -> Optional[bytes]:
+    return next(stream.iterator, None)
+
+
+def _close(stream_or_result) -> None:
+    result = stream_or_result.result if isinstance(stream_or_result, _Stream) else stream_or_result
+    close = getattr(result, "close", None)
+    if close is not None:
+        close()
+
+
+async def _plain_response(send, status: int, body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+app = WSGIBridge(flask_app)
@@ -0,0 +1,339 @@
+# bench.py — benchmarks for the tagging and summary hot paths
+#
+#   python -m backend.bench run --out bench.json           # full run (~1 min)
+#   python -m backend.bench run --quick --out bench.json   # smaller corpora, fewer repeats
+#   python -m backend.bench compare base.json new.json --threshold 0.10
+#
+# The corpora are generated from taxonomy.py with a fixed seed: short form-built
+# descriptions (what the page submits), long free-text narratives, and adversarial
+# inputs (huge unpunctuated sentences, near-miss tokens, symbols, every context at
+# once). Each benchmark reports microseconds per input, best and median over the
+# repeats. Memo caches are cleared before every repeat unless --warm is given, so
+# the numbers reflect distinct inputs rather than repeats.
+# `compare` exits 1 when any benchmark got slower than the threshold allows.
+
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+try:
+    from . import tagger_logic
+    from . import app as app_module
+    from .taxonomy import taxonomy
+except ImportError:
+    import tagger_logic  # type: ignore
+    import app as app_module  # type: ignore
+    from taxonomy import taxonomy  # type: ignore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCH_FORMAT = "emp-bench"
+BENCH_VERSION = 1
+
+
+# -----------------------
+# Corpus generation
+# -----------------------
+CONTEXT_LEADS = [
+    "During my period", "When I'm on my period", "Around ovulation", "Mid cycle",
+    "During sex", "After intercourse", "When going to the toilet", "During bowel movements",
+    "Most days", "The rest of the month", "Between periods",
+]
+FILLER = [
+    "I don't really know how to explain it", "it has been like this for years",
+    "my GP said it was normal", "some days are better than others", "it comes in waves",
+    "I try to keep going", "nothing seems to help much", "I have to lie down",
+]
+
+
+def _expressions() -> List[str]:
+    return [e for spec in taxonomy.get("metaphor_types", {}).values() for e in spec.get("expressions", [])]
+
+
+def short_corpus(n: int, rng: random.Random) -> List[str]:
+    """Descriptions as the index page builds them from the selects and pills."""
+    exprs = _expressions()
+    overall = ["I feel isolated", "I am exhausted", "it dominates my life"]
+    qol = ["Affects my productivity", "Affects me socially", "Affects my mental health"]
+    out = []
+    for _ in range(n):
+        parts = []
+        for trigger in rng.sample(app_module.TRIGGERS_UI, rng.randint(1, 3)):
+            picks = rng.sample(exprs, rng.randint(1, 3))
+            parts.append(f"During {trigger}: {', '.join(picks)}.")
+        if rng.random() < 0.5:
+            parts.append(f"Overall: {rng.choice(overall)}.")
+        if rng.random() < 0.5:
+            parts.append(f"Quality of life: {rng.choice(qol)}.")
+        out.append(" ".join(parts))
+    return out
+
+
+def long_corpus(n: int, rng: random.Random) -> List[str]:
+    """Free-text narratives of a few paragraphs mixing contexts, metaphors and clues."""
+    exprs = _expressions()
+    modifiers = taxonomy.get("graduation_modifiers", [])
+    clues = taxonomy.get("life_impact_clues", [])
+    out = []
+    for _ in range(n):
+        paragraphs = []
+        for _ in range(rng.randint(3, 8)):
+            sentences = []
+            for _ in range(rng.randint(3, 7)):
+                r = rng.random()
+                if r < 0.45:
+                    sentences.append(f"{rng.choice(CONTEXT_LEADS)} it is {rng.choice(modifiers)} "
+                                     f"and feels like {rng.choice(exprs)}.")
+                elif r < 0.7:
+                    sentences.append(f"It's like {rng.choice(exprs)}, {rng.choice(FILLER)}.")
+                elif r < 0.85:
+                    sentences.append(f"Honestly it {rng.choice(clues)}.")
+                else:
+                    sentences.append(f"{rng.choice(FILLER).capitalize()}!")
+            paragraphs.append(" ".join(sentences))
+        out.append("\n\n".join(paragraphs))
+    return out
+
+
+def adversarial_corpus(rng: random.Random) -> List[str]:
+    """Inputs chosen to stress the regexes, the sentence splitter and the caches."""
+    exprs = _expressions()
+    words = [w for e in exprs for w in e.split()]
+    near_miss = [w[:-1] for w in words if len(w) > 3] + [w + w for w in words[:50]]
+    leads = " ".join(CONTEXT_LEADS)
+    return [
+        " ".join(rng.choice(words) for _ in range(4000)),                  # one huge sentence
+        " ".join(rng.choice(near_miss) for _ in range(4000)),              # almost-matches only
+        leads + " " + " ".join(rng.sample(exprs, min(40, len(exprs)))),    # every context at once
+        ". ".join(rng.choice(exprs) for _ in range(2000)) + ".",           # thousands of tiny sentences
+        "\n".join(f"{rng.choice(CONTEXT_LEADS)}\n{rng.choice(exprs)}" for _ in range(500)),
+        "!?" * 5000 + " knife " + "—–-" * 3000,                            # punctuation floods
+        "🔥💥 " * 2000 + "burning",                                         # non-ASCII path
+        "on-fire-on-fire-" * 1000 + "stabbing",                            # hyphen chains
+        " " * 20000 + "crushing weight",                                   # whitespace
+        "a" * 30000,                                                       # one giant token
+        "",
+    ]
+
+
+def build_corpora(quick: bool, seed: int) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    return {
+        "short": short_corpus(100 if quick else 400, rng),
+        "long": long_corpus(10 if quick else 40, rng),
+        "adversarial": adversarial_corpus(rng),
+    }
+
+
+# -----------------------
+# Benchmarks
+# -----------------------
+
+
+def _clear_caches() -> None:
+    for obj in list(vars(tagger_logic).values()):
+        if callable(getattr(obj, "cache_clear", None)):
+            obj.cache_clear()
+    tagger_logic.get_snapshot().clear_memos()
+    app_module.RESULT_CACHE.clear()
+
+
+def _benchmarks() -> Dict[str, Dict[str, Any]]:
+    """name -> {"prepare": texts -> inputs, "run": input -> None}."""
+    client = app_module.app.test_client()
+    norm = tagger_logic._normalize
+    tag = tagger_logic.tag_pain_description
+
+    def tagged(texts):
+        return [tag(app_module.normalize_triggers(t)) for t in texts]
+
+    def post(description):
+        resp = client.post("/analyze.json", json={"description": description})
+        if resp.status_code != 200:
+            raise RuntimeError(f"/analyze.json returned {resp.status_code}")
+
+    return {
+        "normalize_triggers": {"prepare": list, "run": app_module.normalize_triggers},
+        "_normalize": {"prepare": list, "run": norm},
+        "_find_spans": {"prepare": list, "run": tagger_logic._find_spans},
+        "_match_metaphors_in": {"prepare": lambda ts: [norm(t) for t in ts], "run": tagger_logic._match_metaphors_in},
+        "tag_pain_description": {"prepare": list, "run": tag},
+        "generate_patient_summary": {"prepare": tagged, "run": tagger_logic.generate_patient_summary},
+        "generate_doctor_summary": {"prepare": tagged, "run": tagger_logic.generate_doctor_summary},
+        "generate_entailment_summary": {
+            "prepare": lambda ts: [r["entailments"] for r in tagged(ts)],
+            "run": tagger_logic.generate_entailment_summary,
+        },
+        "flask_analyze_json": {"prepare": list, "run": post},
+    }
+
+
+def _time_inputs(run: Callable[[Any], Any], inputs: List[Any], repeats: int, warm: bool) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeats):
+        if not warm:
+            _clear_caches()
+        t0 = time.perf_counter()
+        for x in inputs:
+            run(x)
+        samples.append((time.perf_counter() - t0) / max(1, len(inputs)) * 1e6)
+    return {"us_min": round(min(samples), 2), "us_median": round(statistics.median(samples), 2)}
+
+
+_IMPORT_SNIPPET = """
+import hashlib, importlib, json, re, threading, time, typing
+t0 = time.perf_counter()
+importlib.import_module({module!r})
+print((time.perf_counter() - t0) * 1e6)
+"""
+
+
+def _time_cold_import(module: str, runs: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+                             cwd=os.path.dirname(HERE), capture_output=True, text=True, check=True).stdout
+        samples.append(float(out.strip().splitlines()[-1]))
+    return {"us_min": round(min(samples), 2), "us_median": round(statistics.median(samples), 2)}
+
+
+def _time_compile(runs: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(runs):
+        tax = copy.deepcopy(taxonomy)
+        t0 = time.perf_counter()
+        tagger_logic._compile_from_taxonomy(tax).warm()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return {"us_min": round(min(samples), 2), "us_median": round(statistics.median(samples), 2)}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(quick: bool = False, seed: int = 13, repeats: int = None, warm: bool = False,
+                   only: List[str] = None) -> Dict[str, Any]:
+    repeats = repeats or (3 if quick else 7)
+    corpora = build_corpora(quick, seed)
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, bench in _benchmarks().items():
+        if only and name not in only:
+            continue
+        for corpus_name, texts in corpora.items():
+            inputs = bench["prepare"](texts)
+            stats = _time_inputs(bench["run"], inputs, repeats, warm)
+            results[f"{name}[{corpus_name}]"] = {"inputs": len(inputs), **stats}
+            print(f"  {name}[{corpus_name}]".ljust(44) + f"{stats['us_min']:>12.1f} us", file=sys.stderr)
+    if not only or "cold_import" in only:
+        runs = 3 if quick else 7
+        for module in ("backend.tagger_logic", "backend.app"):
+            results[f"cold_import[{module}]"] = {"inputs": 1, **_time_cold_import(module, runs)}
+    if not only or "compile" in only:
+        results["taxonomy_compile[warm]"] = {"inputs": 1, **_time_compile(3 if quick else 7)}
+    return {
+        "format": BENCH_FORMAT,
+        "version": BENCH_VERSION,
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": _git_commit(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "seed": seed,
+            "quick": quick,
+            "repeats": repeats,
+            "warm": warm,
+            "matcher_backend": tagger_logic._MATCHER_BACKEND,
+        },
+        "results": results,
+    }
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float, metric: str = "us_min") -> List[Dict[str, Any]]:
+    rows = []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        b, n = base["results"].get(name), new["results"].get(name)
+        if b is None or n is None:
+            rows.append({"name": name, "base": b and b[metric], "new": n and n[metric], "ratio": None,
+                         "status": "only in new" if b is None else "only in base"})
+            continue
+        ratio = n[metric] / b[metric] if b[metric] else float("inf") if n[metric] else 1.0
+        status = "REGRESSION" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else "ok"
+        rows.append({"name": name, "base": b[metric], "new": n[metric], "ratio": round(ratio, 3), "status": status})
+    return rows
+
+
+# -----------------------
+# Commands
+# -----------------------
+
+
+def cmd_run(args):
+    result = run_benchmarks(quick=args.quick, seed=args.seed, repeats=args.repeats, warm=args.warm,
+                            only=args.only)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+        print(f"Wrote {args.out} ({len(result['results'])} benchmarks).", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+def cmd_compare(args):
+    with open(args.base, encoding="utf-8") as fh:
+        base = json.load(fh)
+    with open(args.new, encoding="utf-8") as fh:
+        new = json.load(fh)
+    for doc, path in ((base, args.base), (new, args.new)):
+        if doc.get("format") != BENCH_FORMAT:
+            print(f"[WARN] {path} is not a {BENCH_FORMAT} file", file=sys.stderr)
+            return 2
+    rows = compare(base, new, args.threshold, args.metric)
+    print(f"{'benchmark':<52}{'base us':>12}{'new us':>12}{'ratio':>8}  status")
+    for r in rows:
+        fmt = lambda v: f"{v:>12.1f}" if isinstance(v, (int, float)) else f"{'-':>12}"
+        ratio = f"{r['ratio']:>8.2f}" if r["ratio"] is not None else f"{'-':>8}"
+        print(f"{r['name']:<52}{fmt(r['base'])}{fmt(r['new'])}{ratio}  {r['status']}")
+    regressions = [r for r in rows if r["status"] == "REGRESSION"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m backend.bench")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the benchmarks and write JSON results")
+    r.add_argument("--out", help="results file (default: stdout)")
+    r.add_argument("--quick", action="store_true", help="smaller corpora and fewer repeats")
+    r.add_argument("--seed", type=int, default=13)
+    r.add_argument("--repeats", type=int)
+    r.add_argument("--warm", action="store_true", help="keep memo caches between repeats")
+    r.add_argument("--only", nargs="+", metavar="NAME",
+                   help="benchmark names to run (e.g. tag_pain_description cold_import compile)")
+    r.set_defaults(func=cmd_run)
+    c = sub.add_parser("compare", help="compare two result files; exit 1 on regressions")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown ratio (default 0.10)")
+    c.add_argument("--metric", choices=("us_min", "us_median"), default="us_min")
+    c.set_defaults(func=cmd_compare)
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# compare_serving.py — side-by-side throughput of the WSGI and ASGI deployments
+#   python -m backend.compare_serving --workers 2 --concurrency 32 --duration 10 --slow-clients 8
+# Starts `gunicorn backend.app:app` (sync workers, as in the Procfile) and
+# `uvicorn backend.asgi:app` on free local ports, drives both with the same
+# POST /analyze.json load over keep-alive connections, and prints a table.
+# --slow-clients adds connections that trickle their request body, the case
+# where a sync worker sits blocked on one socket.
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+try:
+    from .taxonomy import taxonomy as TAXONOMY
+except ImportError:
+    from taxonomy import taxonomy as TAXONOMY
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTEXT_LEADS = ["During my period", "After sex", "When going to the toilet", "Walking",
+                 "At night", "Before my period", "Most days"]
+
+
+def _descriptions(n: int, seed: int = 7) -> List[str]:
+    """Varied taxonomy-based descriptions, so most requests miss the result cache."""
+    rng = random.Random(seed)
+    expressions = [e for spec in TAXONOMY.get("metaphor_types", {}).values()
+                   for e in spec.get("expressions", [])] or ["it hurts"]
+    out = []
+    for _ in range(n):
+        sentences = [f"{rng.choice(CONTEXT_LEADS)} it feels like {rng.choice(expressions)}."
+                     for _ in range(rng.randint(1, 4))]
+        out.append(" ".join(sentences))
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(mode: str, port: int, workers: int, threads: int) -> subprocess.Popen:
+    if mode == "wsgi":
+        cmd = [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}",
+               "--log-level", "warning", "backend.app:app"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "backend.asgi:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    env = dict(os.environ, ASGI_THREADS=str(threads))
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/evidence")
+            conn.getresponse().read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start (is {cmd[2]} installed?)")
+
+
+def _slow_client(port: int, stop: threading.Event, body: bytes) -> None:
+    # Send headers, then one byte of body every 100 ms; repeat until stopped.
+    while not stop.is_set():
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=30) as s:
+                s.sendall(b"POST /analyze.json HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\n"
+                          + f"Content-Length: {len(body)}\r\n\r\n".encode())
+                for i in range(len(body)):
+                    if stop.is_set():
+                        return
+                    s.sendall(body[i:i + 1])
+                    time.sleep(0.1)
+                s.recv(65536)
+        except OSError:
+            time.sleep(0.1)
+
+
+def _load(port: int, concurrency: int, duration: float, bodies: List[bytes]) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine: List[float] = []
+        bad = 0
+        while time.monotonic() < stop_at:
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", "/analyze.json", body=rng.choice(bodies),
+                             headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    bad += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                bad += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            mine.append(time.perf_counter() - t0)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += bad
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def compare(workers: int, threads: int, concurrency: int, duration: float, slow_clients: int) -> Dict[str, Any]:
+    bodies = [json.dumps({"description": d}).encode() for d in _descriptions(2000)]
+    results: Dict[str, Any] = {}
+    for mode in ("wsgi", "asgi"):
+        port = _free_port()
+        proc = _start_server(mode, port, workers, threads)
+        stop = threading.Event()
+        slow = [threading.Thread(target=_slow_client, args=(port, stop, bodies[0]), daemon=True)
+                for _ in range(slow_clients)]
+        try:
+            for t in slow:
+                t.start()
+            _load(port, min(4, concurrency), min(2.0, duration), bodies)  # warm-up
+            results[mode] = _load(port, concurrency, duration, bodies)
+        finally:
+            stop.set()
+            proc.terminate()
+            proc.wait(timeout=10)
+    return results
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Compare WSGI (gunicorn) and ASGI (uvicorn) throughput.")
+    ap.add_argument("--workers", type=int, default=2, help="Server processes for both modes.")
+    ap.add_argument("--threads", type=int, default=8, help="ASGI_THREADS for the ASGI mode.")
+    ap.add_argument("--concurrency", type=int, default=32, help="Concurrent keep-alive clients.")
+    ap.add_argument("--duration", type=float, default=10.0, help="Seconds of measured load per mode.")
+    ap.add_argument("--slow-clients", type=int, default=0, help="Extra clients trickling request bodies.")
+    ap.add_argument("--json", dest="json_out", help="Also write the results to this file.")
+    args = ap.parse_args(argv)
+
+    results = compare(args.workers, args.threads, args.concurrency, args.duration, args.slow_clients)
+    print(f"{'mode':<6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<6}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as fh:
+            json.dump({"args": vars(args), "results": results}, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
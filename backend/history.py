@@ -0,0 +1,313 @@
+# history.py — optional SQLite history of analyses (enabled by HISTORY_DB=<path>)
+# /analyze and /analyze.json hand each result to record(), which only appends to an
+# in-memory queue. A background thread drains the queue in batches, one transaction
+# per batch, so storage never adds latency to a request; when the queue is full the
+# entry is dropped and counted rather than making the request wait.
+# The database runs in WAL mode, so history reads never block the writer (or other
+# gunicorn workers writing to the same file). Per-entry (context, category) rows carry
+# the patient and timestamp, so filtered history queries are single index range scans.
+
+from __future__ import annotations
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from . import metrics, wire
+except ImportError:
+    import metrics  # type: ignore
+    import wire  # type: ignore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    patient TEXT NOT NULL,
+    created REAL NOT NULL,
+    taxonomy_version INTEGER,
+    name TEXT NOT NULL DEFAULT '',
+    duration TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL,
+    results TEXT NOT NULL,
+    patient_summary TEXT NOT NULL DEFAULT '',
+    doctor_summary TEXT NOT NULL DEFAULT '',
+    entailment_summary TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS entries_patient_created ON entries (patient, created);
+CREATE INDEX IF NOT EXISTS entries_created ON entries (created);
+-- One row per (context, category) an entry was tagged with, plus wildcard rows
+-- (context, '') and ('', category), so every filter is an equality prefix followed by
+-- (created, entry_id): newest-first pages come straight off the index, no sort or dedup.
+CREATE TABLE IF NOT EXISTS entry_tags (
+    entry_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+    patient TEXT NOT NULL,
+    created REAL NOT NULL,
+    context TEXT NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (entry_id, context, category)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entry_tags_patient ON entry_tags (patient, context, category, created, entry_id);
+CREATE INDEX IF NOT EXISTS entry_tags_all ON entry_tags (context, category, created, entry_id);
+"""
+
+# Columns returned by queries; `results` is decoded back into the tag_pain_description dict.
+ENTRY_COLUMNS = ("id", "patient", "created", "taxonomy_version", "name", "duration", "description",
+                 "results", "patient_summary", "doctor_summary", "entailment_summary")
+
+WRITTEN = metrics.REGISTRY.counter(
+    "emp_history_entries_total", "History entries by outcome (written, dropped, failed).", labels=("outcome",))
+FLUSH_SECONDS = metrics.REGISTRY.histogram(
+    "emp_history_flush_seconds", "Time to write one batch of history entries.")
+
+
+def connect(path: str, timeout: float = 5.0) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # durable across app crashes; WAL fsyncs at checkpoints
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class HistoryStore:
+    """
+    record() queues an entry; a writer thread flushes up to `batch_size` entries per
+    transaction, at least every `flush_interval` seconds. query() reads on a
+    per-thread connection.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.5,
+                 max_queue: int = 10000):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._hooks: List[Callable[..., None]] = []
+        conn = connect(path)
+        with conn:
+            conn.executescript(SCHEMA)
+        conn.close()
+
+    # -----------------------
+    # Writes
+    # -----------------------
+    def record(self, payload: Dict[str, Any], patient: str = "", name: str = "", duration: str = "",
+               created: Optional[float] = None) -> bool:
+        """
+        Queue an /analyze.json payload for storage; returns False if it was dropped.
+        The payload is serialised on the writer thread, so it must not be mutated later
+        (RESULT_CACHE payloads never are).
+        """
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((patient or "", name or "", duration or "", payload,
+                                    time.time() if created is None else created))
+            return True
+        except queue.Full:
+            WRITTEN.inc("dropped")
+            return False
+
+    def _ensure_writer(self) -> None:
+        # Threads don't survive fork(): a preloaded gunicorn worker starts its own.
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid != os.getpid() or self._thread is None:
+                self._pid = os.getpid()
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._thread = threading.Thread(target=self._writer, name="history-writer", daemon=True)
+                self._thread.start()
+
+    @property
+    def hooks(self) -> Tuple[Callable[..., None], ...]:
+        return tuple(self._hooks)
+
+    def add_write_hook(self, fn: Callable[..., None]) -> None:
+        """
+        Call fn(conn, entry_id, patient, created, results) for each entry, inside the
+        writer's transaction, so derived tables commit (or roll back) with the entries.
+        """
+        self._hooks.append(fn)
+
+    def _writer(self) -> None:
+        conn = connect(self.path, timeout=30.0)  # outlasts a rollup rebuild holding the write lock
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            flush_at = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            entries = [e for e in batch if e is not None]
+            if entries:
+                self._write(conn, entries)
+            for _ in batch:
+                q.task_done()
+            if len(entries) < len(batch):  # a None sentinel: close()
+                conn.close()
+                return
+
+    def _write(self, conn: sqlite3.Connection, entries: List[Tuple]) -> None:
+        t0 = time.perf_counter()
+        try:
+            with conn:
+                for patient, name, duration, payload, created in entries:
+                    results = payload.get("results") or {}
+                    cur = conn.execute(
+                        "INSERT INTO entries (patient, created, taxonomy_version, name, duration, description,"
+                        " results, patient_summary, doctor_summary, entailment_summary)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (patient, created, results.get("taxonomy_version"), name, duration,
+                         results.get("input", ""), wire.dumps_json(results).decode("utf-8"),
+                         payload.get("patient") or "", payload.get("doctor") or "",
+                         payload.get("entailments") or ""))
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO entry_tags (entry_id, patient, created, context, category)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        [(cur.lastrowid, patient, created, ctx, cat)
+                         for ctx, cat in _tag_pairs(results.get("matched_by_context") or {})])
+                    for hook in self._hooks:
+                        hook(conn, cur.lastrowid, patient, created, results)
+            WRITTEN.inc("written", amount=len(entries))
+        except Exception as e:  # sqlite errors, or a payload that won't serialise: never kill the writer
+            WRITTEN.inc("failed", amount=len(entries))
+            print(f"[WARN] history: could not write {len(entries)} entries: {e}", file=sys.stderr)
+        FLUSH_SECONDS.observe(time.perf_counter() - t0)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is written (for tests, shutdown and CLIs)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # -----------------------
+    # Reads
+    # -----------------------
+    def reader(self) -> sqlite3.Connection:
+        """This thread's read connection (rows as sqlite3.Row)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = connect(self.path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def query(self, patient: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              context: Optional[str] = None, category: Optional[str] = None,
+              limit: int = 100, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Entries newest first. `since`/`until` are unix seconds (until is exclusive);
+        `context`/`category` keep entries tagged with them; `before_id` pages backwards.
+        """
+        columns = ", ".join("e." + c for c in ENTRY_COLUMNS)
+        if context or category:
+            where, args = _entry_filters(patient, since, until, before_id, "t.", "entry_id")
+            where[:0] = ["t.context = ?", "t.category = ?"]
+            args[:0] = [context or "", category or ""]
+            sql = (f"SELECT {columns} FROM entry_tags t JOIN entries e ON e.id = t.entry_id"
+                   f" WHERE {' AND '.join(where)} ORDER BY t.created DESC, t.entry_id DESC LIMIT ?")
+        else:
+            where, args = _entry_filters(patient, since, until, before_id, "e.")
+            sql = (f"SELECT {columns} FROM entries e{' WHERE ' + ' AND '.join(where) if where else ''}"
+                   f" ORDER BY e.created DESC, e.id DESC LIMIT ?")
+        rows = self.reader().execute(sql, args + [max(1, limit)]).fetchall()
+        return [_row_dict(row) for row in rows]
+
+    def iter_entries(self, patient: Optional[str] = None, since: Optional[float] = None,
+                     chunk: int = 500) -> Iterator[Dict[str, Any]]:
+        """Every entry oldest first, read in chunks (a full scan without loading it all)."""
+        conn = connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            last = (float("-inf"), -1)
+            while True:
+                where, args = _entry_filters(patient, since, None, None, "")
+                where.append("(created > ? OR (created = ? AND id > ?))")
+                args += [last[0], last[0], last[1]]
+                rows = conn.execute(f"SELECT {', '.join(ENTRY_COLUMNS)} FROM entries WHERE {' AND '.join(where)}"
+                                    f" ORDER BY created, id LIMIT ?", args + [chunk]).fetchall()
+                for row in rows:
+                    yield _row_dict(row)
+                if len(rows) < chunk:
+                    return
+                last = (rows[-1]["created"], rows[-1]["id"])
+        finally:
+            conn.close()
+
+    def patients(self) -> List[Dict[str, Any]]:
+        rows = self.reader().execute(
+            "SELECT patient, COUNT(*) AS entries, MIN(created) AS first, MAX(created) AS last"
+            " FROM entries GROUP BY patient ORDER BY last DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "pending": self.pending(), "max_queue": self.max_queue,
+                "batch_size": self.batch_size, "flush_interval": self.flush_interval}
+
+
+def _tag_pairs(matched_by_context: Dict[str, Sequence[str]]) -> List[Tuple[str, str]]:
+    """(context, category) pairs plus the (context, '') / ('', category) wildcard rows."""
+    pairs = set()
+    for ctx, cats in matched_by_context.items():
+        for cat in cats:
+            pairs.update(((ctx, cat), (ctx, ""), ("", cat)))
+    return sorted(pairs)
+
+
+def _entry_filters(patient: Optional[str], since: Optional[float], until: Optional[float],
+                   before_id: Optional[int], prefix: str, id_column: str = "id") -> Tuple[List[str], List[Any]]:
+    where: List[str] = []
+    args: List[Any] = []
+    for clause, val in ((f"{prefix}patient = ?", patient), (f"{prefix}created >= ?", since),
+                        (f"{prefix}created < ?", until), (f"{prefix}{id_column} < ?", before_id)):
+        if val is not None:
+            where.append(clause)
+            args.append(val)
+    return where, args
+
+
+def _row_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    out = dict(zip(ENTRY_COLUMNS, row))
+    out["results"] = json.loads(out["results"])
+    return out
+
+
+def store_from_env() -> Optional[HistoryStore]:
+    """The store at HISTORY_DB, or None when history is disabled (the default)."""
+    path = os.getenv("HISTORY_DB", "")
+    if not path:
+        return None
+    return HistoryStore(path,
+                        batch_size=int(os.getenv("HISTORY_BATCH", "256")),
+                        flush_interval=float(os.getenv("HISTORY_FLUSH_MS", "500")) / 1000,
+                        max_queue=int(os.getenv("HISTORY_QUEUE", "10000")))
+
+
+def gauge_lines(store: HistoryStore) -> List[str]:
+    return metrics.gauge_lines("emp_history_queue", "History entries waiting for the writer thread.",
+                               {"pending": store.pending(), "max": store.max_queue}, "state")
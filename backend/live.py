@@ -0,0 +1,134 @@
+# live.py — session state for incremental "as-you-type" re-analysis
+# Each session keeps the current text plus per-sentence tagging results, so a new
+# revision only re-tags the sentences that changed (see tag_pain_description's
+# sentence_cache). app.py exposes it as /analyze/live (+ Server-Sent Events).
+
+from __future__ import annotations
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class EditConflict(ValueError):
+    """The delta was made against a revision the server no longer has; resend the full text."""
+
+
+class SentenceCache(OrderedDict):
+    """
+    A session's sentence cache in least-recently-used order. tag_pain_result looks
+    sentences up with get(), so every sentence of the latest revision is moved to the
+    end and pruning drops sentences that were edited away, not the oldest unchanged ones.
+    """
+
+    def get(self, key, default=None):
+        if key in self:
+            self.move_to_end(key)
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+
+
+class LiveSession:
+    __slots__ = ("sid", "text", "revision", "name", "duration", "locale", "sentence_cache",
+                 "last_payload", "touched", "lock", "changed")
+
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.text = ""
+        self.revision = 0
+        self.name = ""
+        self.duration = ""
+        self.locale = ""  # locale pack code, fixed when the session starts; "" = default
+        # sentence -> (taxonomy version, contexts, (category bitmask, modifiers, corrections));
+        # filled by tag_pain_result
+        self.sentence_cache: "SentenceCache" = SentenceCache()
+        self.last_payload: Optional[Dict[str, Any]] = None
+        self.touched = time.monotonic()
+        self.lock = threading.Lock()  # one revision analysed at a time per session
+        self.changed = threading.Condition()  # notified whenever last_payload changes
+
+    def apply(self, edit: Dict[str, Any], max_chars: int) -> str:
+        """
+        Apply a full revision ({"text": ...}) or a delta
+        ({"base_revision": n, "start": i, "end": j, "insert": "..."}) and return the new text.
+        """
+        if "text" in edit:
+            text = edit["text"]
+            if not isinstance(text, str):
+                raise ValueError("'text' must be a string.")
+        elif "insert" in edit or "start" in edit:
+            if edit.get("base_revision") != self.revision:
+                raise EditConflict(f"Delta is based on revision {edit.get('base_revision')}, "
+                                   f"current is {self.revision}.")
+            try:
+                start, end = int(edit.get("start", 0)), int(edit.get("end", edit.get("start", 0)))
+            except (TypeError, ValueError):
+                raise ValueError("'start'/'end' must be integers.")
+            insert = edit.get("insert", "")
+            if not isinstance(insert, str) or not 0 <= start <= end <= len(self.text):
+                raise ValueError("Delta out of range.")
+            text = self.text[:start] + insert + self.text[end:]
+        else:
+            raise ValueError("Send either 'text' or a delta (start, end, insert, base_revision).")
+        if len(text) > max_chars:
+            raise ValueError(f"Text too long for live mode (max {max_chars} characters).")
+        for key in ("name", "duration"):
+            if isinstance(edit.get(key), str):
+                setattr(self, key, edit[key].strip())
+        return text
+
+    def publish(self, text: str, payload: Dict[str, Any]) -> None:
+        with self.changed:
+            self.text = text
+            self.revision += 1
+            self.last_payload = payload
+            self.changed.notify_all()
+
+    def prune_sentence_cache(self, keep: int) -> None:
+        # Keep the cache proportional to the current text; least recently used go first.
+        while len(self.sentence_cache) > keep:
+            self.sentence_cache.popitem(last=False)
+
+
+class LiveSessionStore:
+    """Bounded, expiring map of session id -> LiveSession (oldest dropped first)."""
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 1800.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, LiveSession]" = OrderedDict()
+
+    def create(self) -> LiveSession:
+        session = LiveSession(secrets.token_urlsafe(16))
+        with self._lock:
+            self._expire()
+            self._sessions[session.sid] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, sid: str) -> Optional[LiveSession]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(sid)
+            if session is not None:
+                session.touched = time.monotonic()
+                self._sessions.move_to_end(sid)
+            return session
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            sid, oldest = next(iter(self._sessions.items()))
+            if oldest.touched >= cutoff:
+                break
+            del self._sessions[sid]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
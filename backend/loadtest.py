@@ -0,0 +1,713 @@
+# loadtest.py — open-loop load generator with latency histograms and JSON reports
+#
+#   python -m backend.loadtest run --serve wsgi --workers 2 --rate 40 --duration 30 --out load.json
+#   python -m backend.loadtest run --url http://127.0.0.1:8000 --replay traffic.jsonl --timing recorded
+#   python -m backend.loadtest synth -n 5000 --rate 40 -o traffic.jsonl
+#   python -m backend.loadtest compare base.json new.json --threshold 0.10 --metric p99
+#
+# Requests are sent on a schedule fixed in advance (Poisson or evenly spaced arrivals at
+# --rate, or the "t" offsets of a replayed log), whether or not earlier responses have
+# come back. Latency is measured from each request's scheduled time, so when the server
+# falls behind, the queueing shows up in the percentiles instead of silently lowering
+# the offered rate (the "coordinated omission" of closed-loop tools). `service_ms` is
+# the time on the wire alone.
+#
+# Traffic is either synthetic — what index.html posts to /analyze (TRIGGERS_UI x taxonomy
+# expressions, Overall/QoL pills), JSON bodies for /analyze.json and page loads of / — or
+# a JSONL log with one request per line:
+#   {"t": 0.25, "method": "POST", "path": "/analyze", "form": {"description": "...", "qolOpt": [...]}}
+#   {"t": 0.31, "method": "POST", "path": "/analyze.json", "json": {"description": "..."}}
+#   {"t": 0.40, "path": "/"}
+#   {"description": "..."}                  # bare record: POST /analyze.json
+# `synth` writes synthetic traffic in this format, for replays that are identical across runs.
+#
+# 503s from admission control are counted as shed and never retried (Retry-After is
+# recorded), so shedding shows up as a rate rather than as extra load. Latency
+# percentiles cover successful (< 400) responses only.
+
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+try:
+    from .taxonomy import taxonomy as TAXONOMY
+except ImportError:
+    from taxonomy import taxonomy as TAXONOMY  # type: ignore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LOADTEST_FORMAT = "emp-loadtest"
+LOADTEST_VERSION = 1
+PERCENTILES = (("p50", 0.50), ("p90", 0.90), ("p95", 0.95), ("p99", 0.99), ("p99.9", 0.999))
+DEFAULT_MIX = "/=1,/analyze=2,/analyze.json=2"
+
+
+# -----------------------
+# Latency histogram
+# -----------------------
+class LatencyHistogram:
+    """
+    HdrHistogram-style log-linear buckets over integer microseconds: values below
+    2**PRECISION_BITS get a bucket each, larger ones keep their top PRECISION_BITS bits,
+    so any percentile is within 0.4% of the true value at a fixed, small memory cost.
+    Histograms merge by adding counts, and serialise as [[bucket low, count], ...].
+    """
+
+    PRECISION_BITS = 8
+
+    __slots__ = ("counts", "total", "sum_us", "min_us", "max_us")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = 0
+        self.max_us = 0
+
+    @classmethod
+    def _low(cls, us: int) -> int:
+        shift = max(0, us.bit_length() - cls.PRECISION_BITS)
+        return (us >> shift) << shift
+
+    @classmethod
+    def _mid(cls, low: int) -> int:
+        shift = max(0, low.bit_length() - cls.PRECISION_BITS)
+        return low + ((1 << shift) - 1) // 2
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        us = max(1, int(seconds * 1e6))
+        low = self._low(us)
+        self.counts[low] = self.counts.get(low, 0) + count
+        self.min_us = us if not self.total else min(self.min_us, us)
+        self.max_us = max(self.max_us, us)
+        self.total += count
+        self.sum_us += us * count
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        for low, n in other.counts.items():
+            self.counts[low] = self.counts.get(low, 0) + n
+        if other.total:
+            self.min_us = other.min_us if not self.total else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+        self.total += other.total
+        self.sum_us += other.sum_us
+        return self
+
+    def value_at(self, q: float) -> int:
+        """Microseconds at quantile q (0..1); the exact max for q == 1."""
+        if not self.total:
+            return 0
+        if q >= 1:
+            return self.max_us
+        rank = max(1, math.ceil(q * self.total))
+        seen = 0
+        for low in sorted(self.counts):
+            seen += self.counts[low]
+            if seen >= rank:
+                return min(self._mid(low), self.max_us)
+        return self.max_us
+
+    def summary_ms(self) -> Dict[str, float]:
+        out = {name: round(self.value_at(q) / 1000, 3) for name, q in PERCENTILES}
+        out["max"] = round(self.max_us / 1000, 3)
+        out["mean"] = round(self.sum_us / self.total / 1000, 3) if self.total else 0.0
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"unit": "us", "precision_bits": self.PRECISION_BITS, "count": self.total,
+                "sum": self.sum_us, "min": self.min_us, "max": self.max_us,
+                "buckets": [[low, self.counts[low]] for low in sorted(self.counts)]}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "LatencyHistogram":
+        h = cls()
+        for low, n in d.get("buckets", []):
+            h.counts[cls._low(int(low))] = h.counts.get(cls._low(int(low)), 0) + int(n)
+        h.total = int(d.get("count", sum(h.counts.values())))
+        h.sum_us, h.min_us, h.max_us = int(d.get("sum", 0)), int(d.get("min", 0)), int(d.get("max", 0))
+        return h
+
+
+class EndpointStats:
+    """Outcome counts and latency histograms for one endpoint (or the whole run)."""
+
+    __slots__ = ("sent", "status", "errors", "unsent", "latency", "service", "retry_after_max")
+
+    def __init__(self):
+        self.sent = 0
+        self.status: Counter = Counter()
+        self.errors = 0        # connection errors and timeouts
+        self.unsent = 0        # still queued when the drain deadline passed
+        self.latency = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.retry_after_max = 0
+
+    def merge(self, other: "EndpointStats") -> "EndpointStats":
+        self.sent += other.sent
+        self.status.update(other.status)
+        self.errors += other.errors
+        self.unsent += other.unsent
+        self.latency.merge(other.latency)
+        self.service.merge(other.service)
+        self.retry_after_max = max(self.retry_after_max, other.retry_after_max)
+        return self
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        completed = sum(self.status.values())
+        ok = sum(n for code, n in self.status.items() if code < 400)
+        shed = self.status.get(503, 0)
+        failed = self.sent - ok
+        return {
+            "sent": self.sent,
+            "completed": completed,
+            "ok": ok,
+            "shed": shed,
+            "errors": self.errors,
+            "unsent": self.unsent,
+            "status": {str(code): n for code, n in sorted(self.status.items())},
+            "error_rate": round(failed / self.sent, 4) if self.sent else 0.0,
+            "shed_rate": round(shed / self.sent, 4) if self.sent else 0.0,
+            "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+            "ok_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+            "retry_after_max_s": self.retry_after_max,
+            "latency_ms": self.latency.summary_ms(),
+            "service_ms": self.service.summary_ms(),
+            "latency_histogram": self.latency.to_dict(),
+        }
+
+
+# -----------------------
+# Traffic
+# -----------------------
+# The index page's Overall / Quality-of-life pills (templates/index.html).
+OVERALL_PILLS = [
+    "I feel isolated", "I feel drained and exhausted", "I feel like I am losing myself",
+    "I feel overwhelmed", "I feel anxious or worried", "My mood is low / I feel down",
+]
+QOL_PILLS = [
+    "Dominates my life", "Affects me socially", "Affects my productivity",
+    "Prevents me from carrying out basic chores", "Affects my mental health", "Affects my happiness",
+]
+NAMES = ["", "", "Sam", "Alex", "Jo", "Priya", "Maria"]
+DURATIONS = ["", "", "6 months", "2 years", "since my teens", "over 10 years"]
+
+
+def _to_sentence(items: List[str]) -> str:
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """"/=1,/analyze=2" -> [("/", 1.0), ("/analyze", 2.0)]."""
+    mix = []
+    for part in (spec or "").split(","):
+        path, _, weight = part.strip().rpartition("=")
+        if not path or path not in ("/", "/analyze", "/analyze.json"):
+            raise ValueError(f"Unknown --mix entry '{part}' (paths: /, /analyze, /analyze.json).")
+        mix.append((path, float(weight)))
+    if not mix or sum(w for _, w in mix) <= 0:
+        raise ValueError("--mix needs at least one positive weight.")
+    return mix
+
+
+def synthetic_records(rng: random.Random, mix: List[Tuple[str, float]]) -> Iterator[Dict[str, Any]]:
+    """Endless requests shaped like the index page's: form posts, JSON posts and page loads."""
+    try:
+        from .app import TRIGGERS_UI
+    except ImportError:
+        from app import TRIGGERS_UI  # type: ignore
+    by_category = [(cat, spec.get("expressions", [])) for cat, spec in TAXONOMY.get("metaphor_types", {}).items()
+                   if spec.get("expressions")]
+    return _synthetic(rng, mix, TRIGGERS_UI, by_category)
+
+
+def _synthetic(rng, mix, triggers_ui, by_category):
+    paths, weights = zip(*mix)
+    while True:
+        path = rng.choices(paths, weights)[0]
+        if path == "/":
+            yield {"method": "GET", "path": "/"}
+            continue
+        # Selections grouped by trigger, then the pills, as buildConstructedText() does.
+        parts = []
+        for trigger in rng.sample(triggers_ui, rng.randint(1, 3)):
+            exps = []
+            for _ in range(rng.randint(1, 3)):
+                _, expressions = rng.choice(by_category)
+                exp = rng.choice(expressions)
+                if exp not in exps:
+                    exps.append(exp)
+            parts.append(f"During {trigger}: {_to_sentence(exps)}.")
+        overall = rng.sample(OVERALL_PILLS, rng.choice((0, 0, 1, 2)))
+        qol = rng.sample(QOL_PILLS, rng.choice((0, 0, 1, 2)))
+        if overall:
+            parts.append(f"Overall: {_to_sentence(overall)}.")
+        if qol:
+            parts.append(f"Quality of life: {_to_sentence(qol)}.")
+        fields = {"name": rng.choice(NAMES), "duration": rng.choice(DURATIONS), "description": " ".join(parts)}
+        if path == "/analyze.json":
+            yield {"method": "POST", "path": path, "json": fields}
+        else:
+            yield {"method": "POST", "path": path, "form": {
+                **fields, "trigger": "", "category": "", "expression": "",
+                "overall": ", ".join(overall), "qol": ", ".join(qol), "qolOpt": qol, "overallOpt": overall}}
+
+
+def read_log(path: str) -> List[Dict[str, Any]]:
+    records = []
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as fh:
+        for lineno, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: invalid JSON: {e}") from e
+            if not isinstance(rec, dict):
+                raise ValueError(f"{path}:{lineno}: expected a JSON object")
+            records.append(rec)
+    if not records:
+        raise ValueError(f"{path}: no requests")
+    return records
+
+
+def prepare(record: Dict[str, Any]) -> Tuple[str, str, Optional[bytes], Dict[str, str]]:
+    """A log record -> (method, path, body, headers)."""
+    if "path" not in record:
+        record = {"method": "POST", "path": "/analyze.json", "json": record}
+    path = record["path"]
+    headers = dict(record.get("headers") or {})
+    body = None
+    if "json" in record:
+        body = json.dumps(record["json"]).encode("utf-8")
+        headers.setdefault("Content-Type", "application/json")
+    elif "form" in record:
+        body = urlencode(record["form"], doseq=True).encode("utf-8")
+        headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+    method = (record.get("method") or ("POST" if body is not None else "GET")).upper()
+    return method, path, body, headers
+
+
+def arrivals(rng: random.Random, rate: float, poisson: bool = True) -> Iterator[float]:
+    """Offsets in seconds of an open-loop arrival process at `rate` requests per second."""
+    t = 0.0
+    while True:
+        yield t
+        t += rng.expovariate(rate) if poisson else 1.0 / rate
+
+
+def schedule(records: Iterable[Dict[str, Any]], offsets: Optional[Iterable[float]], duration: float,
+             speed: float = 1.0) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """(offset, record) pairs until `duration`; offsets=None replays the records' own "t"."""
+    if offsets is not None:
+        for t, rec in zip(offsets, records):
+            if t >= duration:
+                return
+            yield t, rec
+        return
+    first = None
+    for rec in records:
+        t = float(rec.get("t", 0.0))
+        first = t if first is None else first
+        t = (t - first) / speed
+        if t >= duration:
+            return
+        yield t, rec
+
+
+# -----------------------
+# Runner
+# -----------------------
+def _endpoint(method: str, path: str) -> str:
+    return f"{method} {path.split('?', 1)[0]}"
+
+
+def run_load(url: str, plan: Iterable[Tuple[float, Dict[str, Any]]], connections: int = 64,
+             timeout: float = 30.0, drain: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Send each planned request at its offset from now over a pool of keep-alive
+    connections; returns per-endpoint stats, the overall stats and a per-second timeline.
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    prefix = parts.path.rstrip("/")
+    pending: "queue.Queue" = queue.Queue()
+    lock = threading.Lock()
+    stats: Dict[str, EndpointStats] = {}
+    timeline: Dict[int, List[int]] = {}   # second -> [ok, shed, failed]
+    t0 = time.perf_counter()
+
+    def worker():
+        conn = None
+        mine: Dict[str, EndpointStats] = {}
+        seconds: Dict[int, List[int]] = {}
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            due, endpoint, (method, path, body, headers) = item
+            s = mine.get(endpoint) or mine.setdefault(endpoint, EndpointStats())
+            start = time.perf_counter()
+            status = 0
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+                conn.request(method, prefix + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+                if status == 503:
+                    try:
+                        s.retry_after_max = max(s.retry_after_max, int(resp.getheader("Retry-After") or 0))
+                    except ValueError:
+                        pass
+                if resp.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                if conn is not None:
+                    conn.close()
+                conn = None
+            done = time.perf_counter()
+            row = seconds.setdefault(int(done - t0), [0, 0, 0])
+            if status:
+                s.status[status] += 1
+            else:
+                s.errors += 1
+            if 0 < status < 400:
+                s.latency.record(done - due)
+                s.service.record(done - start)
+                row[0] += 1
+            else:
+                row[1 if status == 503 else 2] += 1
+        if conn is not None:
+            conn.close()
+        with lock:
+            for endpoint, s in mine.items():
+                stats.setdefault(endpoint, EndpointStats()).merge(s)
+            for sec, row in seconds.items():
+                acc = timeline.setdefault(sec, [0, 0, 0])
+                for i, n in enumerate(row):
+                    acc[i] += n
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, connections))]
+    for t in threads:
+        t.start()
+
+    sent: Counter = Counter()
+    max_lag = 0.0
+    last = 0.0
+    for offset, record in plan:
+        due = t0 + offset
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        else:
+            max_lag = max(max_lag, -wait)
+        req = prepare(record)
+        endpoint = _endpoint(req[0], req[1])
+        sent[endpoint] += 1
+        pending.put((due, endpoint, req))
+        last = offset
+
+    # Let the backlog drain, then give up on whatever is still queued.
+    deadline = time.perf_counter() + (timeout if drain is None else drain)
+    while not pending.empty() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    unsent: Counter = Counter()
+    while True:
+        try:
+            item = pending.get_nowait()
+        except queue.Empty:
+            break
+        unsent[item[1]] += 1
+    for _ in threads:
+        pending.put(None)
+    for t in threads:
+        t.join(timeout + 1)
+    elapsed = time.perf_counter() - t0
+
+    with lock:
+        for endpoint, n in sent.items():
+            s = stats.setdefault(endpoint, EndpointStats())
+            s.sent = n
+            s.unsent = unsent[endpoint]
+        overall = EndpointStats()
+        for s in stats.values():
+            overall.merge(s)
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "scheduled_s": round(last, 3),
+            "offered_rps": round(sum(sent.values()) / last, 2) if last else 0.0,
+            "max_send_lag_ms": round(max_lag * 1000, 3),
+            "overall": overall.report(elapsed),
+            "endpoints": {ep: stats[ep].report(elapsed) for ep in sorted(stats)},
+            "timeline": [[sec, *timeline[sec]] for sec in sorted(timeline)],
+        }
+
+
+# -----------------------
+# Local servers
+# -----------------------
+class _FlaskServer:
+    """The app on werkzeug's threaded dev server, in this process (shares the GIL with the load)."""
+
+    def __init__(self, port: int):
+        from werkzeug.serving import make_server
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log per request
+        try:
+            from .app import app
+        except ImportError:
+            from app import app  # type: ignore
+        self._server = make_server("127.0.0.1", port, app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def terminate(self):
+        self._server.shutdown()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+
+def start_server(mode: str, workers: int):
+    """(url, handle) for a freshly started local server; handle has terminate() and wait()."""
+    try:
+        from .compare_serving import _free_port, _start_server
+    except ImportError:
+        from compare_serving import _free_port, _start_server  # type: ignore
+    port = _free_port()
+    if mode == "flask":
+        return f"http://127.0.0.1:{port}", _FlaskServer(port)
+    return f"http://127.0.0.1:{port}", _start_server(mode, port, workers, int(os.getenv("ASGI_THREADS", "8")))
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+# -----------------------
+# Commands
+# -----------------------
+def _records(args, rng: random.Random) -> Iterable[Dict[str, Any]]:
+    if not args.replay:
+        return synthetic_records(rng, parse_mix(args.mix))
+    log = read_log(args.replay)
+    if args.timing == "recorded":
+        return log
+    return itertools.cycle(log) if args.loop else log
+
+
+def _plan(args, rng: random.Random, duration: float):
+    records = _records(args, rng)
+    if args.replay and args.timing == "recorded":
+        return schedule(records, None, duration, args.speed)
+    return schedule(records, arrivals(rng, args.rate, args.arrival == "poisson"), duration)
+
+
+def cmd_run(args):
+    if not args.url and not args.serve:
+        print("[WARN] give --url of a running server or --serve wsgi|asgi|flask", file=sys.stderr)
+        return 2
+    if args.rate <= 0:
+        print("[WARN] --rate must be positive", file=sys.stderr)
+        return 2
+    rng = random.Random(args.seed)
+    try:
+        _records(args, random.Random(args.seed))  # fail on a bad --mix / log before starting anything
+    except (OSError, ValueError) as e:
+        print(f"[WARN] {e}", file=sys.stderr)
+        return 2
+    url, server = args.url, None
+    if args.serve:
+        try:
+            url, server = start_server(args.serve, args.workers)
+        except (ImportError, RuntimeError) as e:
+            print(f"[WARN] {e}", file=sys.stderr)
+            return 2
+    try:
+        if args.warmup > 0:
+            run_load(url, _plan(args, random.Random(args.seed + 1), args.warmup), args.connections,
+                     args.timeout)
+        result = run_load(url, _plan(args, rng, args.duration), args.connections, args.timeout)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = {
+        "format": LOADTEST_FORMAT,
+        "version": LOADTEST_VERSION,
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": _git_commit(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "target": args.url or f"{args.serve} x{args.workers}",
+            "source": args.replay or f"synthetic {args.mix}",
+            "timing": args.timing if args.replay else args.arrival,
+            "rate": args.rate,
+            "duration": args.duration,
+            "connections": args.connections,
+            "seed": args.seed,
+        },
+        **result,
+    }
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+            fh.write("\n")
+        print(f"Wrote {args.out}.", file=sys.stderr)
+    return 0
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"offered {report['offered_rps']} req/s over {report['scheduled_s']} s, "
+          f"max send lag {report['max_send_lag_ms']} ms")
+    print(f"{'endpoint':<22}{'sent':>7}{'ok/s':>9}{'err%':>7}{'shed%':>7}"
+          f"{'p50':>9}{'p95':>9}{'p99':>9}{'p99.9':>9}{'max':>9}  (ms)")
+    rows = list(report["endpoints"].items()) + [("all", report["overall"])]
+    for name, r in rows:
+        lat = r["latency_ms"]
+        print(f"{name:<22}{r['sent']:>7}{r['ok_rps']:>9}{r['error_rate'] * 100:>7.1f}{r['shed_rate'] * 100:>7.1f}"
+              f"{lat['p50']:>9}{lat['p95']:>9}{lat['p99']:>9}{lat['p99.9']:>9}{lat['max']:>9}")
+
+
+def cmd_synth(args):
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(f"[WARN] {e}", file=sys.stderr)
+        return 2
+    rng = random.Random(args.seed)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        offsets = arrivals(rng, args.rate, args.arrival == "poisson")
+        for _, t, rec in zip(range(args.n), offsets, synthetic_records(rng, mix)):
+            out.write(json.dumps({"t": round(t, 4), **rec}, ensure_ascii=False) + "\n")
+    finally:
+        if args.out:
+            out.close()
+    if args.out:
+        print(f"Wrote {args.out} ({args.n} requests).", file=sys.stderr)
+    return 0
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float, metric: str = "p99",
+            error_margin: float = 0.01) -> List[Dict[str, Any]]:
+    """Per endpoint: latency ratio, ok throughput ratio and error-rate change."""
+    rows = []
+    names = sorted(set(base["endpoints"]) | set(new["endpoints"])) + ["all"]
+    for name in names:
+        b = base["overall"] if name == "all" else base["endpoints"].get(name)
+        n = new["overall"] if name == "all" else new["endpoints"].get(name)
+        if b is None or n is None:
+            rows.append({"name": name, "status": "only in new" if b is None else "only in base"})
+            continue
+        bl, nl = b["latency_ms"][metric], n["latency_ms"][metric]
+        lat_ratio = nl / bl if bl else float("inf") if nl else 1.0
+        rps_ratio = n["ok_rps"] / b["ok_rps"] if b["ok_rps"] else 1.0
+        err_delta = n["error_rate"] - b["error_rate"]
+        worse = [what for what, bad in (("latency", lat_ratio > 1 + threshold),
+                                        ("throughput", rps_ratio < 1 - threshold),
+                                        ("errors", err_delta > error_margin)) if bad]
+        status = "REGRESSION (" + ", ".join(worse) + ")" if worse else \
+            "faster" if lat_ratio < 1 - threshold else "ok"
+        rows.append({"name": name, "base": bl, "new": nl, "ratio": round(lat_ratio, 3),
+                     "rps_ratio": round(rps_ratio, 3), "error_delta": round(err_delta, 4), "status": status})
+    return rows
+
+
+def cmd_compare(args):
+    with open(args.base, encoding="utf-8") as fh:
+        base = json.load(fh)
+    with open(args.new, encoding="utf-8") as fh:
+        new = json.load(fh)
+    for doc, path in ((base, args.base), (new, args.new)):
+        if doc.get("format") != LOADTEST_FORMAT:
+            print(f"[WARN] {path} is not a {LOADTEST_FORMAT} file", file=sys.stderr)
+            return 2
+    offered = lambda doc: tuple(doc["meta"].get(k) for k in ("source", "timing", "rate", "duration"))
+    if offered(base) != offered(new):
+        print("[WARN] the reports offered different load (source, timing, rate or duration); "
+              "throughput and error ratios compare unlike runs", file=sys.stderr)
+    rows = compare(base, new, args.threshold, args.metric, args.error_margin)
+    print(f"{'endpoint':<22}{'base ' + args.metric:>12}{'new ' + args.metric:>12}{'ratio':>8}"
+          f"{'ok/s':>8}{'err Δ':>8}  status")
+    for r in rows:
+        if "ratio" not in r:
+            print(f"{r['name']:<22}{'-':>12}{'-':>12}{'-':>8}{'-':>8}{'-':>8}  {r['status']}")
+            continue
+        print(f"{r['name']:<22}{r['base']:>12.2f}{r['new']:>12.2f}{r['ratio']:>8.2f}"
+              f"{r['rps_ratio']:>8.2f}{r['error_delta']:>+8.3f}  {r['status']}")
+    regressions = [r for r in rows if r["status"].startswith("REGRESSION")]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m backend.loadtest")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="drive a server at a fixed arrival rate and report latencies")
+    target = r.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL of a running server (e.g. http://127.0.0.1:8000)")
+    target.add_argument("--serve", choices=("wsgi", "asgi", "flask"),
+                        help="start gunicorn, uvicorn or the threaded Flask server on a free port")
+    r.add_argument("--workers", type=int, default=2, help="server processes for --serve wsgi|asgi")
+    r.add_argument("--replay", metavar="LOG", help="JSONL request log ('-' for stdin); default: synthetic")
+    r.add_argument("--timing", choices=("rate", "recorded"), default="rate",
+                   help="replay at --rate, or at the log's own \"t\" offsets scaled by --speed")
+    r.add_argument("--speed", type=float, default=1.0, help="time compression for --timing recorded")
+    r.add_argument("--loop", action="store_true", help="cycle the log until --duration ends")
+    r.add_argument("--mix", default=DEFAULT_MIX, help=f"synthetic path weights (default {DEFAULT_MIX})")
+    r.add_argument("--rate", type=float, default=20.0, help="requests per second (default 20)")
+    r.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson")
+    r.add_argument("--duration", type=float, default=30.0, help="seconds of measured load")
+    r.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+    r.add_argument("--connections", type=int, default=64, help="max requests in flight")
+    r.add_argument("--timeout", type=float, default=30.0, help="per-request timeout, also the drain time")
+    r.add_argument("--seed", type=int, default=13)
+    r.add_argument("--out", help="JSON report file")
+    r.set_defaults(func=cmd_run)
+    s = sub.add_parser("synth", help="write synthetic traffic as a replayable JSONL log")
+    s.add_argument("-n", type=int, default=1000, help="number of requests")
+    s.add_argument("-o", "--out", help="log file (default: stdout)")
+    s.add_argument("--mix", default=DEFAULT_MIX)
+    s.add_argument("--rate", type=float, default=20.0, help="arrival rate for the \"t\" offsets")
+    s.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson")
+    s.add_argument("--seed", type=int, default=13)
+    s.set_defaults(func=cmd_synth)
+    c = sub.add_parser("compare", help="compare two reports; exit 1 on regressions")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10,
+                   help="allowed latency increase / throughput drop ratio (default 0.10)")
+    c.add_argument("--metric", choices=[name for name, _ in PERCENTILES] + ["max", "mean"], default="p99")
+    c.add_argument("--error-margin", type=float, default=0.01,
+                   help="allowed absolute error-rate increase (default 0.01)")
+    c.set_defaults(func=cmd_compare)
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# locales — per-language taxonomy packs, compiled on first use and kept in a bounded LRU
+#
+# A pack is backend/locales/<code>.json (LOCALE_DIR to look elsewhere), e.g. fr.json or
+# pt-br.json:
+#   "taxonomy":          same shape as taxonomy.py (metaphor_types, graduation_modifiers,
+#                        triggers, life_impact_clues), in the pack's language
+#   "context_patterns":  {context: [regex, ...]} for the contexts in tagger_logic.CONTEXTS
+#   "triggers":          [[regex, canonical phrase], ...] rewriting UI trigger labels into
+#                        phrases the context patterns recognise (app.NORMALIZE_PATTERNS)
+#   "rephrasings":       {category: patient-summary sentence} (CLINICAL_REPHRASINGS)
+# `python -m backend.locales template <code>` writes the English sources in this shape as
+# a starting point for translators; `python -m backend.locales check` validates packs.
+#
+# The default locale (DEFAULT_LOCALE, "en") is not a pack: it is the built-in taxonomy,
+# served by the current tagger_logic snapshot as before. Other packs are compiled the
+# first time a request asks for them and kept in an LRU of LOCALE_CACHE packs, so a
+# worker only holds the locales it actually serves. LOCALE_WARMUP lists packs to compile
+# during the gunicorn master's warmup (see warmup.py), before workers fork.
+
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from .. import metrics, tagger_logic
+except ImportError:
+    import metrics  # type: ignore
+    import tagger_logic  # type: ignore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# BCP 47-ish, lowercased: "fr", "pt-br", "zh-hant". Also keeps codes safe as file names.
+_CODE_RE = re.compile(r"^[a-z]{2,3}(?:-[a-z0-9]{2,8})*$")
+
+COMPILE_SECONDS = metrics.REGISTRY.histogram(
+    "emp_locale_compile_seconds", "Time to load and compile a locale pack.")
+EVICTED = metrics.REGISTRY.counter(
+    "emp_locale_evictions_total", "Locale packs dropped from the LRU.", labels=("locale",))
+
+
+class UnknownLocale(ValueError):
+    """No pack for the requested locale."""
+
+
+class LocalePackError(ValueError):
+    """A pack file exists but can't be used (bad JSON, unknown context, invalid regex...)."""
+
+
+def normalize_code(code: str) -> str:
+    """"pt_BR" -> "pt-br"; "" for anything that isn't a plausible language tag."""
+    code = (code or "").strip().lower().replace("_", "-")
+    return code if _CODE_RE.match(code) else ""
+
+
+class LocalePack:
+    """One compiled pack: its own taxonomy snapshot plus its trigger-label normaliser."""
+
+    __slots__ = ("code", "path", "snapshot", "_trigger_re", "_trigger_canon")
+
+    def __init__(self, code: str, data: Dict[str, Any], path: str = ""):
+        self.code = code
+        self.path = path
+        tax = data.get("taxonomy")
+        if not isinstance(tax, dict) or not isinstance(tax.get("metaphor_types"), dict):
+            raise LocalePackError(f"{code}: 'taxonomy' must be a dict with 'metaphor_types'.")
+        contexts = data.get("context_patterns")
+        if not isinstance(contexts, dict) or not all(
+                isinstance(p, list) and all(isinstance(x, str) for x in p) for p in contexts.values()):
+            raise LocalePackError(f"{code}: 'context_patterns' must map contexts to lists of regexes.")
+        rephrasings = data.get("rephrasings") or {}
+        if not isinstance(rephrasings, dict) or not all(isinstance(v, str) for v in rephrasings.values()):
+            raise LocalePackError(f"{code}: 'rephrasings' must map categories to sentences.")
+        triggers = data.get("triggers") or []
+        if not isinstance(triggers, list) or not all(
+                isinstance(t, list) and len(t) == 2 and all(isinstance(x, str) for x in t) for t in triggers):
+            raise LocalePackError(f"{code}: 'triggers' must be a list of [regex, canonical phrase] pairs.")
+        try:
+            self.snapshot = tagger_logic.TaxonomySnapshot(
+                tax, 1, locale=code, context_patterns=contexts, rephrasings=rephrasings)
+            # All passes fused into one regex, tried in list order (like app.normalize_triggers).
+            self._trigger_re = re.compile(
+                "|".join(f"(?P<t{i}>{pat})" for i, (pat, _) in enumerate(triggers)),
+                re.IGNORECASE) if triggers else None
+        except (re.error, ValueError) as e:
+            raise LocalePackError(f"{code}: {e}") from e
+        self._trigger_canon = {} if self._trigger_re is None else {
+            self._trigger_re.groupindex[f"t{i}"]: canon for i, (_, canon) in enumerate(triggers)}
+
+    def normalize_triggers(self, text: str) -> str:
+        if not text or self._trigger_re is None:
+            return text
+        out = text.replace("–", "-").replace("—", "-")
+        return self._trigger_re.sub(lambda m: self._trigger_canon[m.lastindex], out)
+
+    def warm(self) -> "LocalePack":
+        self.snapshot.warm()
+        return self
+
+
+def load_pack(code: str, path: str) -> LocalePack:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except OSError as e:
+        raise UnknownLocale(f"No locale pack for '{code}'.") from e
+    except ValueError as e:
+        raise LocalePackError(f"{code}: invalid JSON in {path}: {e}") from e
+    if not isinstance(data, dict):
+        raise LocalePackError(f"{code}: {path} must hold a JSON object.")
+    return LocalePack(code, data, path)
+
+
+class LocaleRegistry:
+    """
+    code -> compiled LocalePack, least recently used first out beyond `max_packs`.
+    Each pack is compiled (and warmed) once, outside the registry lock, so a slow
+    compile of one locale never stalls requests for the others.
+    """
+
+    def __init__(self, directory: str = HERE, default: str = "en", max_packs: int = 4):
+        self.directory = directory
+        self.default = normalize_code(default) or "en"
+        self.max_packs = max(1, max_packs)
+        self._packs: "OrderedDict[str, LocalePack]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._compiling: Dict[str, threading.Lock] = {}
+        self._hits = self._compiles = self._evictions = 0
+        self._listing: Tuple[float, List[str]] = (float("-inf"), [])
+
+    LISTING_TTL = 10.0  # seconds a directory listing is reused for Accept-Language negotiation
+
+    def available(self) -> List[str]:
+        """The default locale, then every pack file in the directory."""
+        listed_at, codes = self._listing
+        if time.monotonic() - listed_at < self.LISTING_TTL:
+            return codes
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        found = {normalize_code(n[:-5]) for n in names if n.endswith(".json")}
+        codes = [self.default] + sorted(c for c in found if c and c != self.default)
+        self._listing = (time.monotonic(), codes)
+        return codes
+
+    def negotiate(self, accept_language: str, available: Optional[Sequence[str]] = None) -> str:
+        """Best available locale for an Accept-Language header (exact tag, then its language)."""
+        ranked: List[Tuple[float, int, str]] = []
+        for i, part in enumerate((accept_language or "").split(",")):
+            tag, _, params = part.strip().partition(";")
+            q = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    q = float(params.strip()[2:])
+                except ValueError:
+                    continue
+            code = normalize_code(tag)
+            if code and q > 0:
+                ranked.append((-q, i, code))
+        if not ranked:
+            return self.default
+        have = set(available if available is not None else self.available())
+        for _, _, code in sorted(ranked):
+            for candidate in (code, code.split("-")[0]):
+                if candidate in have:
+                    return candidate
+        return self.default
+
+    def resolve(self, code: Optional[str]) -> Optional[LocalePack]:
+        """The pack for `code`, or None for the default locale; raises UnknownLocale."""
+        norm = normalize_code(code or "")
+        if code and not norm:
+            raise UnknownLocale(f"Invalid locale '{code}'.")
+        if not norm or norm == self.default:
+            return None
+        return self.get(norm)
+
+    def get(self, code: str) -> LocalePack:
+        with self._lock:
+            pack = self._packs.get(code)
+            if pack is not None:
+                self._packs.move_to_end(code)
+                self._hits += 1
+                return pack
+            compiling = self._compiling.setdefault(code, threading.Lock())
+        with compiling:  # one compile per code; others asking for it wait for the result
+            try:
+                with self._lock:
+                    pack = self._packs.get(code)
+                if pack is None:
+                    t0 = time.perf_counter()
+                    pack = load_pack(code, os.path.join(self.directory, f"{code}.json")).warm()
+                    COMPILE_SECONDS.observe(time.perf_counter() - t0)
+                with self._lock:
+                    if code not in self._packs:
+                        self._compiles += 1
+                    self._packs[code] = pack
+                    self._packs.move_to_end(code)
+                    while len(self._packs) > self.max_packs:
+                        evicted, _ = self._packs.popitem(last=False)
+                        self._evictions += 1
+                        EVICTED.inc(evicted)
+            finally:
+                with self._lock:
+                    self._compiling.pop(code, None)
+        return pack
+
+    def warm(self, codes: Sequence[str] = ()) -> Dict[str, str]:
+        """Compile `codes`, most popular first (it is touched last, so evicted last); {code: "ok" | error}."""
+        report = {}
+        for code in reversed(list(codes)[:self.max_packs]):
+            try:
+                self.resolve(code)
+                report[code] = "ok"
+            except (UnknownLocale, LocalePackError) as e:
+                report[code] = str(e)
+        return report
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._packs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"default": self.default, "loaded": list(self._packs), "max_packs": self.max_packs,
+                    "hits": self._hits, "compiles": self._compiles, "evictions": self._evictions}
+
+    def gauge_lines(self):
+        s = self.stats()
+        return metrics.gauge_lines("emp_locale_packs", "Compiled locale packs held by this process.",
+                                   {"loaded": len(s["loaded"]), "max_packs": s["max_packs"]}, "state")
+
+
+def warmup_codes() -> List[str]:
+    """LOCALE_WARMUP, most popular first (e.g. "es,fr")."""
+    return [c.strip() for c in os.getenv("LOCALE_WARMUP", "").split(",") if c.strip()]
+
+
+def registry_from_env() -> LocaleRegistry:
+    return LocaleRegistry(os.getenv("LOCALE_DIR") or HERE,
+                          default=os.getenv("DEFAULT_LOCALE", "en"),
+                          max_packs=int(os.getenv("LOCALE_CACHE", "4")))
@@ -0,0 +1,98 @@
+# locales/__main__.py — locale pack tools
+#
+#   python -m backend.locales list                   # available and default locales
+#   python -m backend.locales check [fr ...]         # validate + compile packs; exit 1 on errors
+#   python -m backend.locales template fr -o backend/locales/fr.json
+#                                                    # the English sources as a pack to translate
+#
+# A template is the built-in English taxonomy, context patterns, trigger normalisation and
+# rephrasings in pack layout. Every string in it still needs translating (regexes included)
+# before the pack is useful; nothing is translated automatically.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+try:
+    from . import LocalePackError, UnknownLocale, load_pack, normalize_code, registry_from_env
+    from .. import normalize_taxonomy, tagger_logic
+except ImportError:
+    from locales import LocalePackError, UnknownLocale, load_pack, normalize_code, registry_from_env  # type: ignore
+    import normalize_taxonomy  # type: ignore
+    import tagger_logic  # type: ignore
+
+
+def template() -> dict:
+    try:
+        from ..app import NORMALIZE_PATTERNS
+        from ..taxonomy import taxonomy
+    except ImportError:
+        from app import NORMALIZE_PATTERNS  # type: ignore
+        from taxonomy import taxonomy  # type: ignore
+    return {
+        "taxonomy": taxonomy,
+        "context_patterns": tagger_logic._CONTEXT_PATTERNS_RAW,
+        "triggers": [[pat, canon] for pat, canon in NORMALIZE_PATTERNS],
+        "rephrasings": tagger_logic.CLINICAL_REPHRASINGS,
+    }
+
+
+def check(registry, codes) -> int:
+    failed = 0
+    for code in map(normalize_code, codes):
+        t0 = time.perf_counter()
+        try:
+            pack = load_pack(code, os.path.join(registry.directory, f"{code}.json")).warm()
+        except (UnknownLocale, LocalePackError) as e:
+            print(f"{code}: ERROR {e}")
+            failed += 1
+            continue
+        errors, warnings = normalize_taxonomy.validate_taxonomy(pack.snapshot.taxonomy)
+        categories = set(pack.snapshot.categories)
+        rephrased = {k for k, _ in pack.snapshot.rephrasings or ()}
+        warnings += [f"rephrasings: unknown category {c!r}" for c in sorted(rephrased - categories)]
+        missing = sorted(categories - rephrased)
+        if missing:
+            warnings.append(f"rephrasings: none for {', '.join(missing)} (the English sentence is used)")
+        for msg in errors:
+            print(f"{code}: ERROR {msg}")
+        for msg in warnings:
+            print(f"{code}: warning {msg}")
+        failed += bool(errors)
+        print(f"{code}: {len(categories)} categories, compiled in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m backend.locales", description="Locale pack tools.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="available locales")
+    p_check = sub.add_parser("check", help="validate and compile packs")
+    p_check.add_argument("codes", nargs="*", help="default: every pack in LOCALE_DIR")
+    p_tpl = sub.add_parser("template", help="write the English sources as a pack to translate")
+    p_tpl.add_argument("code")
+    p_tpl.add_argument("-o", "--out", help="file to write (default: stdout)")
+    args = ap.parse_args(argv)
+
+    registry = registry_from_env()
+    if args.cmd == "list":
+        codes = registry.available()
+        print(f"default: {registry.default}")
+        print(f"packs:   {', '.join(codes[1:]) or '(none)'} in {registry.directory}")
+        return 0
+    if args.cmd == "check":
+        return check(registry, args.codes or registry.available()[1:])
+    text = json.dumps({"locale": args.code, **template()}, ensure_ascii=False, indent=2) + "\n"
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        print(f"Wrote {args.out}: translate every string before serving it.", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
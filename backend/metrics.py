@@ -0,0 +1,229 @@
+# metrics.py — low-overhead in-process metrics (Prometheus text format)
+# Histograms and counters are plain lists behind one lock each. Per-request stage
+# timings are also kept thread-locally so app.py can emit a Server-Timing header
+# and a slow-request log line. Only durations and sizes are recorded, never text.
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; tagging stages run in tens of microseconds, whole requests in milliseconds.
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+LabelKey = Tuple[str, ...]
+
+
+def _label_str(names: Sequence[str], values: LabelKey, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, List[float]] = {}  # per label set: bucket counts..., +Inf, sum
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for labels, series in sorted(items):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_fmt(bound)}"'
+                out.append(f"{self.name}_bucket{_label_str(self.labels, labels, le)} {_fmt(cumulative)}")
+            out.append(f"{self.name}_sum{_label_str(self.labels, labels)} {series[-1]!r}")
+            out.append(f"{self.name}_count{_label_str(self.labels, labels)} {_fmt(cumulative)}")
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        out.extend(f"{self.name}{_label_str(self.labels, k)} {_fmt(v)}" for k, v in items)
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], List[str]]) -> None:
+        """fn() returns extra exposition lines (e.g. gauges read from another object) at scrape time."""
+        self._collectors.append(fn)
+
+    def reset(self) -> None:
+        """Drop all recorded values (e.g. the warmup traffic a preloaded master generated)."""
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            lines.extend(fn())
+        return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name: str, help: str, values: Dict[str, float], label: str) -> List[str]:
+    out = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    out.extend(f'{name}{{{label}="{_escape(k)}"}} {_fmt(v)}' for k, v in sorted(values.items()))
+    return out
+
+
+# -----------------------
+# Process memory (Linux /proc)
+# -----------------------
+_SMAPS_FIELDS = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared_clean", "Shared_Dirty": "shared_dirty",
+                 "Private_Clean": "private_clean", "Private_Dirty": "private_dirty"}
+
+
+def process_memory(pid: str = "self") -> Dict[str, int]:
+    """
+    Bytes of rss, pss, shared (clean + dirty) and private (clean + dirty) for a process,
+    from /proc/<pid>/smaps_rollup; {} where that isn't available (non-Linux, old kernels).
+    Shared pages are the ones a forked worker still shares with the master.
+    """
+    out: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                if key in _SMAPS_FIELDS:
+                    out[_SMAPS_FIELDS[key]] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return {}
+    if out:
+        out["shared"] = out.pop("shared_clean", 0) + out.pop("shared_dirty", 0)
+        out["private"] = out.pop("private_clean", 0) + out.pop("private_dirty", 0)
+    return out
+
+
+def _memory_metrics() -> List[str]:
+    mem = process_memory()
+    if not mem:
+        return []
+    return gauge_lines("emp_process_memory_bytes",
+                       "Memory of this process; 'shared' pages are also mapped by others (e.g. a preloaded gunicorn master).", mem, "kind")
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "emp_stage_seconds", "Time spent in each analysis pipeline stage.", labels=("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "emp_request_seconds", "Request handling time (until the response starts).", labels=("endpoint",))
+REQUESTS = REGISTRY.counter(
+    "emp_requests_total", "Requests by endpoint and status code.", labels=("endpoint", "status"))
+ERRORS = REGISTRY.counter(
+    "emp_errors_total", "Failed analyses and 5xx responses by endpoint.", labels=("endpoint",))
+REGISTRY.collector(_memory_metrics)
+
+
+# -----------------------
+# Per-request stage timings
+# -----------------------
+_local = threading.local()
+
+
+def begin_request() -> None:
+    _local.started = time.perf_counter()
+    _local.stages = {}
+    _local.notes = {}
+
+
+def end_request() -> Tuple[float, Dict[str, float], Dict[str, float]]:
+    """(total seconds, stage -> seconds, notes) for the current thread's request; resets it."""
+    started = getattr(_local, "started", None)
+    total = time.perf_counter() - started if started is not None else 0.0
+    stages, notes = getattr(_local, "stages", None) or {}, getattr(_local, "notes", None) or {}
+    _local.started, _local.stages, _local.notes = None, None, None
+    return total, stages, notes
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, name)
+    stages: Optional[Dict[str, float]] = getattr(_local, "stages", None)
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t0)
+
+
+def note(**values: float) -> None:
+    """Attach numeric facts (e.g. input_chars) to the current request's slow log line."""
+    notes = getattr(_local, "notes", None)
+    if notes is not None:
+        notes.update(values)
+
+
+def server_timing(total: float, stages: Dict[str, float]) -> str:
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
@@ -1,16 +1,258 @@
-# Utility script (optional): normalises raw taxonomy lists; not used at runtime path
+# normalize_taxonomy.py — taxonomy build step
+#
+#   python -m backend.normalize_taxonomy build            # validate + write backend/lexicon.json
+#   python -m backend.normalize_taxonomy build --report   # ...and compare import times with/without it
+#   python -m backend.normalize_taxonomy check            # validate only; exit 1 on errors or a stale lexicon
+#   python -m backend.normalize_taxonomy normalize in.json out.json   # tidy a raw taxonomy JSON
+#   python normalize_taxonomy.py in.json out.json                      # same, original form
+#
+# The lexicon is every taxonomy expression expanded ahead of time into the token forms the
+# matcher engine looks up (inflections, irregular and Brit/Amer variants). tagger_logic loads
+# it lazily and only when its content hash matches the running taxonomy; otherwise it
+# compiles on the fly, so a missing or stale artifact is slower but never wrong.
+
+import argparse
 import json
+import os
+import subprocess
 import sys
 
+try:
+    from . import tagger_logic
+    from .taxonomy import taxonomy
+    from . import entailments
+except ImportError:
+    import tagger_logic  # type: ignore
+    from taxonomy import taxonomy  # type: ignore
+    import entailments  # type: ignore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLINICAL_MAP_PATH = os.path.join(HERE, "clinical_map.json")
+TAXONOMY_LIST_KEYS = ("graduation_modifiers", "triggers", "life_impact_clues")
+
+
+# -----------------------
+# Validation
+# -----------------------
+
+
+def _check_str_list(value, where, errors):
+    if not isinstance(value, list):
+        errors.append(f"{where}: expected a list, got {type(value).__name__}")
+        return []
+    bad = [v for v in value if not isinstance(v, str) or not v.strip()]
+    if bad:
+        errors.append(f"{where}: non-string or empty items {bad!r}")
+    return [v for v in value if isinstance(v, str)]
+
+
+def validate_taxonomy(tax):
+    errors, warnings = [], []
+    if not isinstance(tax, dict) or not isinstance(tax.get("metaphor_types"), dict):
+        return ["taxonomy: must be a dict with a 'metaphor_types' dict"], warnings
+    for mtype, data in tax["metaphor_types"].items():
+        where = f"taxonomy.metaphor_types.{mtype}"
+        if not isinstance(data, dict):
+            errors.append(f"{where}: expected a dict")
+            continue
+        if not isinstance(data.get("hint", ""), str):
+            errors.append(f"{where}.hint: expected a string")
+        exprs = _check_str_list(data.get("expressions"), f"{where}.expressions", errors)
+        if not exprs:
+            errors.append(f"{where}.expressions: no expressions")
+        seen = set()
+        for expr in exprs:
+            key = expr.strip().lower()
+            if key in seen:
+                warnings.append(f"{where}: duplicate expression {expr!r}")
+            seen.add(key)
+            if tagger_logic._expression_token_forms(expr) is None:
+                warnings.append(f"{where}: {expr!r} can't be expanded to word tokens; it stays a regex")
+    for key in TAXONOMY_LIST_KEYS:
+        if key in tax:
+            _check_str_list(tax[key], f"taxonomy.{key}", errors)
+        else:
+            warnings.append(f"taxonomy: missing '{key}'")
+    return errors, warnings
+
+
+def validate_entailments(categories):
+    errors, warnings = [], []
+    emap = getattr(entailments, "ENTAILMENTS_MAP", None)
+    if not isinstance(emap, dict):
+        return ["entailments.py: ENTAILMENTS_MAP must be a dict"], warnings
+    if not hasattr(entailments, "get_entailments"):
+        warnings.append("entailments.py: no get_entailments(); the tagger reports empty entailments")
+    for key, data in emap.items():
+        where = f"entailments.ENTAILMENTS_MAP.{key}"
+        if key not in categories:
+            warnings.append(f"{where}: not a taxonomy category")
+        if not isinstance(data, dict):
+            errors.append(f"{where}: expected a dict")
+            continue
+        _check_str_list(data.get("entailments"), f"{where}.entailments", errors)
+        if not isinstance(data.get("literature_source"), str):
+            errors.append(f"{where}.literature_source: expected a string")
+    return errors, warnings
+
+
+def validate_clinical_map(categories, path=CLINICAL_MAP_PATH):
+    errors, warnings = [], []
+    try:
+        with open(path, encoding="utf-8") as fh:
+            cmap = json.load(fh)
+    except (OSError, ValueError) as e:
+        return [f"{os.path.basename(path)}: {e}"], warnings
+    if not isinstance(cmap, dict):
+        return [f"{os.path.basename(path)}: expected an object"], warnings
+    for key, data in cmap.items():
+        where = f"clinical_map.{key}"
+        if key not in categories:
+            warnings.append(f"{where}: not a taxonomy category")
+        if not isinstance(data, dict):
+            errors.append(f"{where}: expected an object")
+            continue
+        for field in ("patient_friendly", "likely_mechanism"):
+            if not isinstance(data.get(field), str):
+                errors.append(f"{where}.{field}: expected a string")
+        _check_str_list(data.get("clinical_terms"), f"{where}.clinical_terms", errors)
+    return errors, warnings
+
+
+def validate_all(tax=taxonomy):
+    categories = set((tax.get("metaphor_types") or {}) if isinstance(tax, dict) else ())
+    errors, warnings = validate_taxonomy(tax)
+    for e, w in (validate_entailments(categories), validate_clinical_map(categories)):
+        errors += e
+        warnings += w
+    return errors, warnings
+
+
+def _print_findings(errors, warnings):
+    for w in warnings:
+        print(f"[WARN] {w}", file=sys.stderr)
+    for e in errors:
+        print(f"[ERROR] {e}", file=sys.stderr)
+
 
-def main():
-    data = json.load(open(sys.argv[1]))
-    # example: lowercase all expressions
+# -----------------------
+# Import-time report
+# -----------------------
+
+# Stdlib modules are imported first so only tagger_logic's own work is timed.
+_TIMING_SNIPPET = """
+import hashlib, importlib, json, re, threading, time, typing
+t0 = time.perf_counter()
+tl = importlib.import_module({module!r})
+t1 = time.perf_counter()
+tl.tag_pain_description("During my period it feels like stabbing and burning.")
+t2 = time.perf_counter()
+print((t1 - t0) * 1000, (t2 - t0) * 1000)
+"""
+
+
+def _time_import(use_lexicon, runs):
+    module = f"{__package__}.tagger_logic" if __package__ else "tagger_logic"
+    cwd = os.path.dirname(HERE) if __package__ else HERE
+    env = dict(os.environ, EMP_LEXICON="1" if use_lexicon else "0")
+    imports, firsts = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _TIMING_SNIPPET.format(module=module)],
+                             cwd=cwd, env=env, capture_output=True, text=True, check=True).stdout
+        imp, first = map(float, out.split())
+        imports.append(imp)
+        firsts.append(first)
+    return min(imports), min(firsts)
+
+
+def report(runs=15):
+    print(f"best of {runs} fresh interpreters (ms):        import   import+first tag")
+    for label, use in (("compile on the fly (EMP_LEXICON=0)", False), ("prebuilt lexicon", True)):
+        imp, first = _time_import(use, runs)
+        print(f"  {label:<36} {imp:8.1f}   {first:8.1f}")
+
+
+# -----------------------
+# Commands
+# -----------------------
+
+
+def cmd_build(args):
+    errors, warnings = validate_all()
+    _print_findings(errors, warnings)
+    if errors:
+        return 1
+    lexicon = tagger_logic.build_lexicon(taxonomy)
+    tmp = args.out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(lexicon, fh, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, args.out)
+    print(f"Wrote {args.out}: {len(lexicon['single'])} word forms, {len(lexicon['phrases'])} phrases, "
+          f"{len(lexicon['residual'])} regex-only expressions (hash {lexicon['source_hash'][:12]}).")
+    if args.report:
+        report()
+    return 0
+
+
+def ensure_lexicon(path=None):
+    """
+    Build the lexicon at `path` unless an up-to-date one is already there; for deploy hooks
+    (gunicorn.conf.py's when_ready). Returns True if the artifact is current afterwards,
+    or unused (EMP_LEXICON=0: nothing would ever load it, so don't rebuild it every start).
+    """
+    if not tagger_logic._USE_LEXICON:
+        return True
+    path = path or tagger_logic._LEXICON_PATH
+    if tagger_logic._load_lexicon(path, tagger_logic.taxonomy_hash(taxonomy)) is not None:
+        return True
+    try:
+        return cmd_build(argparse.Namespace(out=path, report=False)) == 0
+    except OSError as e:  # read-only checkout: keep compiling on the fly
+        print(f"[WARN] could not write {path}: {e}", file=sys.stderr)
+        return False
+
+
+def cmd_check(args):
+    errors, warnings = validate_all()
+    _print_findings(errors, warnings)
+    if tagger_logic._load_lexicon(args.out, tagger_logic.taxonomy_hash(taxonomy)) is None:
+        print(f"[WARN] {args.out} is missing or stale; run the build step.", file=sys.stderr)
+        return 1
+    return 1 if errors else 0
+
+
+def cmd_normalize(args):
+    # Tidy a raw taxonomy JSON: dedupe and sort each category's expressions.
+    with open(args.input, encoding="utf-8") as fh:
+        data = json.load(fh)
     for k, v in data.get("metaphor_types", {}).items():
         v["expressions"] = sorted(
             set([s.strip() for s in v.get("expressions", [])]), key=str.lower)
-    json.dump(data, open(sys.argv[2], "w"), indent=2, ensure_ascii=False)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2, ensure_ascii=False)
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m backend.normalize_taxonomy")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="validate sources and write the lexicon artifact")
+    b.add_argument("--out", default=tagger_logic._LEXICON_PATH)
+    b.add_argument("--report", action="store_true", help="print import times with and without the artifact")
+    b.set_defaults(func=cmd_build)
+    c = sub.add_parser("check", help="validate sources; fail if the lexicon is missing or stale")
+    c.add_argument("--out", default=tagger_logic._LEXICON_PATH)
+    c.set_defaults(func=cmd_check)
+    n = sub.add_parser("normalize", help="dedupe/sort expressions in a raw taxonomy JSON")
+    n.add_argument("input")
+    n.add_argument("output")
+    n.set_defaults(func=cmd_normalize)
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if len(argv) == 2 and argv[0] not in sub.choices and not argv[0].startswith("-"):
+        argv = ["normalize", *argv]  # the original `normalize_taxonomy.py in.json out.json`
+    args = ap.parse_args(argv)
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# prerender.py — pages and JSON rendered once per taxonomy version, then served as bytes
+# Each rendered body keeps gzip (and brotli, if installed) encodings and a strong
+# ETag derived from its content, so every worker hands out the same validators.
+
+import gzip
+import hashlib
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+class Prerendered:
+    __slots__ = ("content_type", "cache_control", "etag", "bodies")
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies: Dict[str, bytes] = {"identity": body, "gzip": gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=11)
+
+    def choose(self, accept_encoding: str) -> Tuple[str, bytes, str]:
+        """(content-encoding, body, etag) for the client's Accept-Encoding."""
+        accepted = _accepted_encodings(accept_encoding)
+        for coding in ("br", "gzip"):
+            if coding in self.bodies and coding in accepted:
+                return coding, self.bodies[coding], f'"{self.etag}-{coding}"'
+        return "identity", self.bodies["identity"], f'"{self.etag}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """If-None-Match hit for any encoding of this body (weak comparison, RFC 9110)."""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            tag = tag.strip('"')
+            if tag == self.etag or tag.split("-", 1)[0] == self.etag:
+                return True
+        return False
+
+
+def _accepted_encodings(header: str) -> set:
+    out = set()
+    for part in (header or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        out.add(coding.strip())
+    return out
+
+
+class PrerenderCache:
+    """name -> (version key, Prerendered); a new version key re-renders once and replaces the old body."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages: Dict[str, Tuple[str, Prerendered]] = {}
+
+    def get(self, name: str, version: str, render: Callable[[], Prerendered]) -> Prerendered:
+        entry = self._pages.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self._lock:
+            entry = self._pages.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, render())
+                self._pages[name] = entry
+            return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+
+def version_of(source_hash: Optional[str]) -> str:
+    """Short public form of a snapshot's source hash."""
+    return (source_hash or "")[:16]
@@ -0,0 +1,435 @@
+# reports.py — patient/clinician PDF reports, rendered off the request path
+#   POST /reports                 -> {"job": <id>, "status": "queued" | "done", ...}
+#   GET  /reports/<id>            -> poll status
+#   GET  /reports/<id>/events     -> Server-Sent Events until done/failed
+#   GET  /reports/<id>/pdf        -> the PDF once done
+# app.py renders the report HTML (templates/report.html, milliseconds) and submits it
+# here. WeasyPrint then lays it out on a bounded process pool; each render process
+# parses report.css and loads fonts once, in its initializer. The job id is a hash of
+# the HTML and CSS, and finished PDFs are kept on disk under that name: the same
+# report is never rendered twice, and any worker process can serve the download.
+# While a job is queued or rendering (or after it failed) its status sits next to it
+# as <id>.json, so a poll or event stream that reaches another gunicorn worker than
+# the one that accepted the submit still sees the job.
+# Reports hold patient text, so the cache directory and files are private (0700/0600).
+
+from __future__ import annotations
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from markupsafe import Markup, escape
+
+REPORT_KINDS = ("patient", "clinician")
+CSS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "report.css")
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+# A queued/rendering status file nobody has touched for this long belongs to a worker
+# that died mid-job; it is reported as failed so clients stop waiting.
+STALE_JOB_SECONDS = 600
+
+
+def available() -> bool:
+    """WeasyPrint is installed (its system libraries are only checked in the render processes)."""
+    return importlib.util.find_spec("weasyprint") is not None
+
+
+class QueueFull(Exception):
+    """Too many reports waiting to be rendered."""
+
+
+# -----------------------
+# Summary text -> HTML
+# -----------------------
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC_RE = re.compile(r"(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])")
+
+
+def summary_html(text: str) -> Markup:
+    """
+    The summaries' light Markdown (**bold**, *italic*, blank-line paragraphs) as safe
+    HTML. Everything else is escaped: descriptions are user input.
+    """
+    paragraphs = []
+    for block in re.split(r"\n\s*\n", (text or "").strip()):
+        if not block.strip():
+            continue
+        html = str(escape(block.strip()))
+        html = _ITALIC_RE.sub(r"<em>\1</em>", _BOLD_RE.sub(r"<strong>\1</strong>", html))
+        paragraphs.append("<p>" + html.replace("\n", "<br>\n") + "</p>")
+    return Markup("\n".join(paragraphs))
+
+
+def report_key(html: str, css: str) -> str:
+    h = hashlib.sha256()
+    h.update(css.encode("utf-8"))
+    h.update(b"\0")
+    h.update(html.encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+# -----------------------
+# Render processes
+# -----------------------
+_worker: Dict[str, Any] = {}  # per render process: weasyprint, font config, stylesheet
+
+
+def _init_worker(css_text: str) -> None:
+    # Errors are kept rather than raised: a failing initializer breaks the whole pool,
+    # while a stored error turns into one failed job per submission with a clear message.
+    try:
+        import weasyprint
+        from weasyprint.text.fonts import FontConfiguration
+        fonts = FontConfiguration()
+        css = weasyprint.CSS(string=css_text, font_config=fonts)
+        weasyprint.HTML(string="<p>warmup</p>").write_pdf(stylesheets=[css], font_config=fonts)
+        _worker.update(weasyprint=weasyprint, fonts=fonts, css=css)
+    except Exception as e:  # ImportError, or OSError when pango/cairo are missing
+        _worker["error"] = f"{type(e).__name__}: {e}"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _render_to(html: str, path: str, status: Optional[Dict[str, Any]] = None) -> int:
+    """Render `html` to a PDF at `path` (atomically); returns its size in bytes."""
+    if "error" in _worker:
+        raise RuntimeError(f"PDF rendering is unavailable: {_worker['error']}")
+    if status is not None:  # tell every web worker the job has left the queue
+        _write_atomic(status_path(path), json.dumps({**status, "status": "rendering"}).encode("utf-8"))
+    pdf = _worker["weasyprint"].HTML(string=html).write_pdf(
+        stylesheets=[_worker["css"]], font_config=_worker["fonts"])
+    _write_atomic(path, pdf)
+    return len(pdf)
+
+
+def status_path(pdf_path: str) -> str:
+    return pdf_path[:-len(".pdf")] + ".json"
+
+
+# -----------------------
+# Disk cache
+# -----------------------
+class PdfCache:
+    """
+    Finished PDFs as <directory>/<key>.pdf, evicted least-recently-used once they
+    exceed `max_bytes`. Other processes may share the directory: files they wrote are
+    picked up on first access, and each process only evicts by its own accounting.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._hits = self._misses = self._evictions = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".pdf"):
+                try:
+                    st = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._bytes += size
+        with self._lock:
+            self._evict_locked()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached PDF, or None; a hit makes it most recently used."""
+        path = self.path(key)
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            with self._lock:
+                self._bytes -= self._sizes.pop(key, 0)
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+            else:
+                self._sizes[key] = size
+                self._bytes += size
+        try:
+            os.utime(path)  # so a restart rebuilds the same LRU order
+        except OSError:
+            pass
+        return path
+
+    def add(self, key: str, size: int) -> None:
+        with self._lock:
+            self._bytes += size - self._sizes.pop(key, 0)
+            self._sizes[key] = size
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._bytes > self.max_bytes and len(self._sizes) > 1:
+            key, size = self._sizes.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+            try:
+                os.unlink(self.path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"files": len(self._sizes), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self._hits, "misses": self._misses, "evictions": self._evictions}
+
+
+# -----------------------
+# Job queue
+# -----------------------
+class ReportJob:
+    __slots__ = ("id", "kind", "status", "error", "created", "finished", "future")
+
+    def __init__(self, job_id: str, kind: str, status: str = "queued"):
+        self.id = job_id
+        self.kind = kind
+        self.status = status  # queued | rendering | done | failed
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = time.time() if status == "done" else None
+        self.future: Optional[Future] = None
+
+    def status_record(self) -> Dict[str, Any]:
+        return {"job": self.id, "kind": self.kind, "status": self.status, "error": self.error,
+                "created": self.created, "finished": self.finished}
+
+    @classmethod
+    def from_record(cls, rec: Dict[str, Any]) -> "ReportJob":
+        job = cls(rec["job"], rec.get("kind") or "", status=rec.get("status") or "queued")
+        job.error = rec.get("error")
+        job.created = float(rec.get("created") or job.created)
+        job.finished = rec.get("finished")
+        return job
+
+    def to_dict(self) -> Dict[str, Any]:
+        status = self.status
+        if status == "queued" and self.future is not None and self.future.running():
+            status = "rendering"
+        out = {"job": self.id, "kind": self.kind, "status": status}
+        if self.error:
+            out["error"] = self.error
+        if self.finished is not None:
+            out["seconds"] = round(max(0.0, self.finished - self.created), 3)
+        return out
+
+
+def _pool_context():
+    # Render processes are started from a threaded web worker: don't fork it directly.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ReportQueue:
+    """
+    Submits report HTML to the render pool, at most `max_pending` at a time, and tracks
+    jobs (the last `max_jobs`) so clients can poll or wait for them.
+    """
+
+    def __init__(self, cache: PdfCache, workers: int = 2, max_pending: int = 32, max_jobs: int = 1000):
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, ReportJob]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.changed = threading.Condition(self._lock)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._css: Optional[str] = None
+        self._prune_statuses()
+
+    def _prune_statuses(self) -> None:
+        # Status files of long-finished failures (and of jobs abandoned by dead workers).
+        cutoff = time.time() - 6 * STALE_JOB_SECONDS
+        for name in os.listdir(self.cache.directory):
+            path = os.path.join(self.cache.directory, name)
+            try:
+                if name.endswith(".json") and os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    @property
+    def css(self) -> str:
+        if self._css is None:
+            with open(CSS_FILE, encoding="utf-8") as fh:
+                self._css = fh.read()
+        return self._css
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context(),
+                                             initializer=_init_worker, initargs=(self.css,))
+        return self._pool
+
+    def submit(self, html: str, kind: str) -> ReportJob:
+        """Queue a render unless the same report is cached or already in progress; raises QueueFull."""
+        key = report_key(html, self.css)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status in ("queued", "rendering"):
+                return job
+            if self.cache.get(key):
+                return self._remember(job if job is not None and job.status == "done"
+                                      else ReportJob(key, kind, status="done"))
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} reports are already waiting to be rendered.")
+            job = ReportJob(key, kind)
+            self._write_status(job)
+            try:
+                future = self._get_pool().submit(_render_to, html, self.cache.path(key), job.status_record())
+            except BrokenProcessPool:
+                # A render process died (e.g. killed for memory); start a fresh pool once.
+                self._pool = None
+                future = self._get_pool().submit(_render_to, html, self.cache.path(key), job.status_record())
+            job = self._remember(job)
+            job.future = future
+            self._pending += 1
+        job.future.add_done_callback(lambda fut, job=job: self._finished(job, fut))
+        return job
+
+    def _remember(self, job: ReportJob) -> ReportJob:
+        self._jobs[job.id] = job
+        self._jobs.move_to_end(job.id)
+        while len(self._jobs) > self.max_jobs:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status in ("queued", "rendering"):
+                break
+            self._jobs.popitem(last=False)
+        return job
+
+    def _finished(self, job: ReportJob, fut: Future) -> None:
+        try:
+            size = fut.result()
+            error = None
+        except Exception as e:
+            size, error = 0, str(e) or type(e).__name__
+            print(f"[WARN] report {job.id} failed: {error}", file=sys.stderr)
+        finished = time.time()
+        # Update the shared directory first, so no other worker lags behind local waiters.
+        if error is None:
+            self.cache.add(job.id, size)
+            self._remove_status(job.id)  # the PDF itself now says "done"
+        else:
+            self._write_status(job, status="failed", error=error, finished=finished)
+        with self.changed:
+            self._pending -= 1
+            job.status = "failed" if error else "done"
+            job.error = error
+            job.finished = finished
+            self.changed.notify_all()
+
+    # Status files: <cache dir>/<id>.json while queued, rendering or failed.
+    def _write_status(self, job: ReportJob, **changes: Any) -> None:
+        record = {**job.status_record(), **changes}
+        try:
+            _write_atomic(status_path(self.cache.path(job.id)), json.dumps(record).encode("utf-8"))
+        except OSError as e:
+            print(f"[WARN] could not write report status {job.id}: {e}", file=sys.stderr)
+
+    def _remove_status(self, job_id: str) -> None:
+        try:
+            os.unlink(status_path(self.cache.path(job_id)))
+        except OSError:
+            pass
+
+    def _read_status(self, job_id: str) -> Optional[ReportJob]:
+        """A job some worker (maybe another process) recorded on disk, or None."""
+        path = status_path(self.cache.path(job_id))
+        try:
+            with open(path, encoding="utf-8") as fh:
+                job = ReportJob.from_record(json.load(fh))
+            touched = os.stat(path).st_mtime
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if job.status in ("queued", "rendering") and time.time() - touched > STALE_JOB_SECONDS:
+            job.status, job.error, job.finished = "failed", "The render was abandoned; submit it again.", touched
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        """
+        The job, or one rebuilt from the shared cache directory: finished if its PDF is
+        there, else from its status file (queued, rendering or failed in another worker).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and (job.status != "done" or self.cache.get(job_id)):
+            return job
+        if not _JOB_ID_RE.match(job_id or ""):
+            return None
+        if self.cache.get(job_id):
+            return ReportJob(job_id, "", status="done")
+        return self._read_status(job_id)
+
+    def wait(self, job: ReportJob, timeout: float) -> None:
+        """Block until `job` changes or `timeout` passes (jobs of other workers are polled on disk)."""
+        if job.future is None and job.status in ("queued", "rendering"):
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+                latest = ReportJob(job.id, job.kind, status="done") if self.cache.get(job.id) \
+                    else self._read_status(job.id)
+                if latest is not None and latest.status != job.status:
+                    job.status, job.error = latest.status, latest.error
+                    job.finished = latest.finished or time.time()
+                    return
+            return
+        with self.changed:
+            if job.status in ("queued", "rendering"):
+                self.changed.wait(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states: Dict[str, int] = {}
+            for job in self._jobs.values():
+                states[job.status] = states.get(job.status, 0) + 1
+            pending = self._pending
+        return {"pending": pending, "max_pending": self.max_pending, "workers": self.workers,
+                "jobs": states, "cache": self.cache.stats()}
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def queue_from_env() -> ReportQueue:
+    directory = os.getenv("REPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "emp-reports")
+    cache = PdfCache(directory, max_bytes=int(os.getenv("REPORT_CACHE_BYTES", str(256 * 1024 * 1024))))
+    return ReportQueue(cache,
+                       workers=int(os.getenv("REPORT_WORKERS", "2")),
+                       max_pending=int(os.getenv("REPORT_MAX_PENDING", "32")))
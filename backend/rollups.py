@@ -0,0 +1,280 @@
+# rollups.py — per-patient, per-cycle summaries maintained alongside the history DB
+#   python -m backend.rollups rebuild --db history.sqlite3 [--patient ID]
+#   python -m backend.rollups timeline --db history.sqlite3 --patient ID
+# Each stored entry bumps a fixed number of counters (one per (context, category) it
+# was tagged with, plus per-context totals and its modifier terms) inside the history
+# writer's transaction, so diary views read a few rows per cycle instead of
+# re-aggregating years of raw entries.
+# Cycles: a menstruation-context entry more than CYCLE_GAP_DAYS after the previous
+# one starts a new cycle; entries before a patient's first one are cycle 0. Contexts
+# (menstruation, ovulation, baseline, ...) are the phases within a cycle.
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .history import connect
+except ImportError:
+    from history import connect  # type: ignore
+
+ONSET_CONTEXT = "menstruation"
+CYCLE_GAP_DAYS = float(os.getenv("CYCLE_GAP_DAYS", "10"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_state (
+    patient TEXT PRIMARY KEY,
+    cycle INTEGER NOT NULL,
+    last_onset REAL,
+    last_created REAL NOT NULL,
+    last_entry_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_cycles (
+    patient TEXT NOT NULL,
+    cycle INTEGER NOT NULL,
+    started REAL NOT NULL,
+    last REAL NOT NULL,
+    entries INTEGER NOT NULL,
+    PRIMARY KEY (patient, cycle)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rollup_cycles_started ON rollup_cycles (patient, started);
+-- category '' holds the context's totals (entries with that context at all).
+CREATE TABLE IF NOT EXISTS rollup_counts (
+    patient TEXT NOT NULL,
+    cycle INTEGER NOT NULL,
+    context TEXT NOT NULL,
+    category TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    intensity INTEGER NOT NULL,
+    temporality INTEGER NOT NULL,
+    PRIMARY KEY (patient, cycle, context, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_terms (
+    patient TEXT NOT NULL,
+    cycle INTEGER NOT NULL,
+    context TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (patient, cycle, context, kind, term)
+) WITHOUT ROWID;
+"""
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    with conn:
+        conn.executescript(SCHEMA)
+
+
+# -----------------------
+# Incremental update
+# -----------------------
+def _assign_cycle(conn: sqlite3.Connection, patient: str, created: float, entry_id: int,
+                  is_onset: bool, gap: float) -> int:
+    state = conn.execute("SELECT cycle, last_onset, last_created FROM rollup_state WHERE patient = ?",
+                         (patient,)).fetchone()
+    cycle, last_onset, last_created = state if state is not None else (0, None, None)
+    if last_created is not None and created < last_created:
+        # Late arrival (e.g. another worker's batch): file it under the cycle it falls in.
+        row = conn.execute("SELECT cycle FROM rollup_cycles WHERE patient = ? AND started <= ?"
+                           " ORDER BY started DESC LIMIT 1", (patient, created)).fetchone()
+        conn.execute("UPDATE rollup_state SET last_entry_id = MAX(last_entry_id, ?) WHERE patient = ?",
+                     (entry_id, patient))
+        return row[0] if row is not None else 0
+    if is_onset:
+        if last_onset is None or created - last_onset > gap:
+            cycle += 1
+        last_onset = created
+    conn.execute("INSERT INTO rollup_state (patient, cycle, last_onset, last_created, last_entry_id)"
+                 " VALUES (?, ?, ?, ?, ?) ON CONFLICT (patient) DO UPDATE SET cycle = excluded.cycle,"
+                 " last_onset = excluded.last_onset, last_created = excluded.last_created,"
+                 " last_entry_id = MAX(last_entry_id, excluded.last_entry_id)",
+                 (patient, cycle, last_onset, created, entry_id))
+    return cycle
+
+
+def apply_entry(conn: sqlite3.Connection, entry_id: int, patient: str, created: float,
+                results: Dict[str, Any], gap_days: float = CYCLE_GAP_DAYS) -> int:
+    """Fold one history entry into the rollups (inside the caller's transaction); returns its cycle."""
+    matched = results.get("matched_by_context") or {}
+    modifiers = (results.get("extras") or {}).get("modifiers_by_context") or {}
+    return _apply(conn, entry_id, patient, created, matched, modifiers, gap_days * 86400)
+
+
+def _apply(conn: sqlite3.Connection, entry_id: int, patient: str, created: float,
+           matched: Dict[str, List[str]], modifiers: Dict[str, Dict[str, Dict[str, List[str]]]],
+           gap: float) -> int:
+    cycle = _assign_cycle(conn, patient, created, entry_id, ONSET_CONTEXT in matched, gap)
+    conn.execute("INSERT INTO rollup_cycles (patient, cycle, started, last, entries) VALUES (?, ?, ?, ?, 1)"
+                 " ON CONFLICT (patient, cycle) DO UPDATE SET entries = entries + 1,"
+                 " started = MIN(started, excluded.started), last = MAX(last, excluded.last)",
+                 (patient, cycle, created, created))
+    counts = []
+    terms: Dict[Tuple[str, str, str], int] = {}
+    for ctx, cats in matched.items():
+        ctx_mods = modifiers.get(ctx) or {}
+        total_int = total_temp = 0
+        for cat in cats:
+            kinds = ctx_mods.get(cat) or {}
+            n_int, n_temp = len(kinds.get("intensity") or ()), len(kinds.get("temporality") or ())
+            total_int += n_int
+            total_temp += n_temp
+            counts.append((patient, cycle, ctx, cat, n_int, n_temp))
+            for kind, found in kinds.items():
+                for term in found:
+                    terms[(ctx, kind, term)] = terms.get((ctx, kind, term), 0) + 1
+        counts.append((patient, cycle, ctx, "", total_int, total_temp))
+    conn.executemany("INSERT INTO rollup_counts (patient, cycle, context, category, entries, intensity, temporality)"
+                     " VALUES (?, ?, ?, ?, 1, ?, ?) ON CONFLICT (patient, cycle, context, category) DO UPDATE SET"
+                     " entries = entries + 1, intensity = intensity + excluded.intensity,"
+                     " temporality = temporality + excluded.temporality", counts)
+    conn.executemany("INSERT INTO rollup_terms (patient, cycle, context, kind, term, count) VALUES (?, ?, ?, ?, ?, ?)"
+                     " ON CONFLICT (patient, cycle, context, kind, term) DO UPDATE SET count = count + excluded.count",
+                     [(patient, cycle, ctx, kind, term, n) for (ctx, kind, term), n in terms.items()])
+    return cycle
+
+
+# -----------------------
+# Rebuild from raw history
+# -----------------------
+def rebuild(conn: sqlite3.Connection, patient: Optional[str] = None,
+            gap_days: float = CYCLE_GAP_DAYS, chunk: int = 1000) -> Dict[str, Any]:
+    """
+    Recompute the rollups (for one patient, or everyone) in a single pass over the
+    entries in time order, inside one write transaction: concurrent history writes
+    wait, so nothing is counted twice or missed. Only the two JSON fields the rollups
+    need are extracted, in SQLite.
+    """
+    t0 = time.perf_counter()
+    ensure_schema(conn)
+    where, args = ("WHERE patient = ?", (patient,)) if patient is not None else ("", ())
+    entries = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in ("rollup_state", "rollup_cycles", "rollup_counts", "rollup_terms"):
+            conn.execute(f"DELETE FROM {table} {where}", args)
+        cur = conn.execute(
+            "SELECT id, patient, created, json_extract(results, '$.matched_by_context'),"
+            f" json_extract(results, '$.extras.modifiers_by_context') FROM entries {where}"
+            " ORDER BY patient, created, id", args)
+        gap = gap_days * 86400
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                break
+            for entry_id, who, created, matched, modifiers in rows:
+                _apply(conn, entry_id, who, created, json.loads(matched) if matched else {},
+                       json.loads(modifiers) if modifiers else {}, gap)
+            entries += len(rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return {"entries": entries, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+# -----------------------
+# Timeline
+# -----------------------
+def timeline(conn: sqlite3.Connection, patient: str, context: Optional[str] = None,
+             category: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    One dict per cycle, oldest first: its span and entry count, and per context the
+    entries, category counts and intensity/temporality modifier totals and terms.
+    `since`/`until` select cycles that overlap the range; `context`/`category` narrow
+    what is reported for each cycle.
+    """
+    where, args = ["patient = ?"], [patient]
+    if since is not None:
+        where.append("last >= ?")
+        args.append(since)
+    if until is not None:
+        where.append("started < ?")
+        args.append(until)
+    cycles = conn.execute(f"SELECT cycle, started, last, entries FROM rollup_cycles WHERE {' AND '.join(where)}"
+                          " ORDER BY cycle", args).fetchall()
+    if not cycles:
+        return []
+    span = (patient, cycles[0][0], cycles[-1][0])
+    out = {c: {"cycle": c, "started": started, "last": last, "entries": n, "contexts": {}}
+           for c, started, last, n in cycles}
+
+    def ctx_slot(cycle: int, ctx: str) -> Dict[str, Any]:
+        return out[cycle]["contexts"].setdefault(
+            ctx, {"entries": 0, "intensity": 0, "temporality": 0, "categories": {}, "terms": {}})
+
+    count_where, count_args = _narrow("context", context, "category", category)
+    for cycle, ctx, cat, n, n_int, n_temp in conn.execute(
+            "SELECT cycle, context, category, entries, intensity, temporality FROM rollup_counts"
+            f" WHERE patient = ? AND cycle BETWEEN ? AND ?{count_where}", span + count_args):
+        if cycle not in out:
+            continue
+        slot = ctx_slot(cycle, ctx)
+        if cat:
+            slot["categories"][cat] = {"entries": n, "intensity": n_int, "temporality": n_temp}
+        else:
+            slot.update(entries=n, intensity=n_int, temporality=n_temp)
+    term_where, term_args = _narrow("context", context)
+    for cycle, ctx, kind, term, n in conn.execute(
+            "SELECT cycle, context, kind, term, count FROM rollup_terms"
+            f" WHERE patient = ? AND cycle BETWEEN ? AND ?{term_where}", span + term_args):
+        if cycle in out and ctx in out[cycle]["contexts"]:
+            out[cycle]["contexts"][ctx]["terms"].setdefault(kind, {})[term] = n
+    if category:
+        # Only contexts where the category occurred, with that category's own totals.
+        for entry in out.values():
+            entry["contexts"] = {ctx: slot for ctx, slot in entry["contexts"].items() if slot["categories"]}
+    return [out[c] for c, _, _, _ in cycles]
+
+
+def _narrow(*pairs: Any) -> Tuple[str, Tuple[Any, ...]]:
+    # ("context", "menstruation", "category", None) -> " AND context = ?", ("menstruation",)
+    clauses, args = [], []
+    for col, val in zip(pairs[::2], pairs[1::2]):
+        if val:
+            clauses.append(f" AND {col} IN (?, '')" if col == "category" else f" AND {col} = ?")
+            args.append(val)
+    return "".join(clauses), tuple(args)
+
+
+def patients_needing_rebuild(conn: sqlite3.Connection) -> List[str]:
+    """Patients whose newest entry isn't folded into rollup_state (e.g. history written before rollups existed)."""
+    rows = conn.execute(
+        "SELECT e.patient FROM (SELECT patient, MAX(id) AS last_id FROM entries GROUP BY patient) e"
+        " LEFT JOIN rollup_state s ON s.patient = e.patient"
+        " WHERE s.patient IS NULL OR s.last_entry_id < e.last_id").fetchall()
+    return [r[0] for r in rows]
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m backend.rollups")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rb = sub.add_parser("rebuild", help="recompute rollups from the raw history in one pass")
+    tl = sub.add_parser("timeline", help="print a patient's per-cycle timeline as JSON")
+    for p in (rb, tl):
+        p.add_argument("--db", default=os.getenv("HISTORY_DB", ""), help="history database (default: $HISTORY_DB)")
+        p.add_argument("--patient", required=p is tl)
+    rb.add_argument("--gap-days", type=float, default=CYCLE_GAP_DAYS)
+    tl.add_argument("--context")
+    tl.add_argument("--category")
+    args = ap.parse_args(argv)
+    if not args.db:
+        ap.error("no database: pass --db or set HISTORY_DB")
+    conn = connect(args.db, timeout=30.0)
+    conn.isolation_level = None  # rebuild() manages its own transaction
+    if args.cmd == "rebuild":
+        print(json.dumps(rebuild(conn, args.patient, args.gap_days)))
+    else:
+        ensure_schema(conn)
+        print(json.dumps(timeline(conn, args.patient, args.context, args.category), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
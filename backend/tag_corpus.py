@@ -0,0 +1,399 @@
+# tag_corpus.py — stream a research corpus (CSV / JSONL) through tag_pain_description
+#
+#   python -m backend.tag_corpus posts.jsonl -o tags.jsonl --workers 8
+#   cat survey.csv | python -m backend.tag_corpus - --input-format csv --text-field answer > tags.jsonl
+#   python -m backend.tag_corpus posts.jsonl -o tags.col.jsonl --format columnar --checkpoint run.ckpt --resume
+#
+# Input is read lazily and at most `--workers * 2` chunks are in flight, so memory stays
+# bounded by the chunk size, the row-group size and the dedupe window — not the corpus.
+
+from __future__ import annotations
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+from collections import OrderedDict, deque
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .tagger_logic import tag_pain_result, get_snapshot, METAPHOR_TYPES, TRIGGERS, LIFE_IMPACT, CONTEXTS
+except ImportError:
+    from tagger_logic import tag_pain_result, get_snapshot, METAPHOR_TYPES, TRIGGERS, LIFE_IMPACT, CONTEXTS  # type: ignore
+
+COLUMNAR_FORMAT = "emp-columnar"
+COLUMNAR_VERSION = 2
+CHECKPOINT_VERSION = 2
+
+# (matched_by_context, triggers_detected, life_impact_detected) or {"error": msg}
+Tagged = Any
+
+
+# -----------------------
+# Input
+# -----------------------
+
+
+def _detect_input_format(path: str) -> str:
+    return "csv" if path.lower().endswith((".csv", ".tsv")) else "jsonl"
+
+
+def iter_records(fh, fmt: str, text_field: str, id_field: Optional[str]) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """Yield (id, text, error) per input record, lazily. Ids default to the 0-based record number."""
+    if fmt == "csv":
+        for n, row in enumerate(csv.DictReader(fh)):
+            rid = (row.get(id_field) if id_field else None) or str(n)
+            text = row.get(text_field)
+            yield (rid, text, None) if text is not None else (rid, None, f"missing '{text_field}' column")
+        return
+    n = 0
+    for line in fh:
+        if not line.strip():
+            continue
+        rid = str(n)
+        n += 1
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            yield rid, None, f"invalid JSON: {e}"
+            continue
+        if isinstance(obj, str):
+            yield rid, obj, None
+        elif isinstance(obj, dict):
+            if id_field and obj.get(id_field) is not None:
+                rid = str(obj[id_field])
+            text = obj.get(text_field)
+            yield (rid, text, None) if isinstance(text, str) else (rid, None, f"missing '{text_field}' field")
+        else:
+            yield rid, None, "record must be a string or an object"
+
+
+# -----------------------
+# Tagging (runs in the worker processes)
+# -----------------------
+
+
+def _tag_one(text: str) -> Tagged:
+    # The compact TagResult skips entailment lookups and dict building we don't write out.
+    try:
+        res = tag_pain_result(text)
+    except Exception as e:
+        return {"error": str(e)}
+    by_context = {ctx: list(res.categories(ctx)) for ctx in CONTEXTS if res.mask(ctx)}
+    return (by_context, list(res.triggers), list(res.life_impact))
+
+
+def _tag_chunk(texts: List[str]) -> List[Tagged]:
+    return [_tag_one(t) for t in texts]
+
+
+class _Deduper:
+    """Bounded LRU of text hash -> (first id, tagged result once known)."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._lru: "OrderedDict[bytes, List[Any]]" = OrderedDict()
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def first_seen(self, key: bytes, rid: str) -> Optional[str]:
+        """Return the id of an earlier identical input, or remember this one."""
+        if self.window <= 0:
+            return None
+        hit = self._lru.get(key)
+        if hit is not None:
+            self._lru.move_to_end(key)
+            return hit[0]
+        self._lru[key] = [rid, None]
+        if len(self._lru) > self.window:
+            self._lru.popitem(last=False)
+        return None
+
+    def store(self, key: bytes, tagged: Tagged) -> None:
+        hit = self._lru.get(key)
+        if hit is not None:
+            hit[1] = tagged
+
+    def lookup(self, key: bytes) -> Optional[Tagged]:
+        hit = self._lru.get(key)
+        return hit[1] if hit is not None else None
+
+
+def tag_stream(records: Iterable[Tuple[str, Optional[str], Optional[str]]], workers: int = 1,
+               chunk_size: int = 256, dedupe_window: int = 100_000) -> Iterator[Dict[str, Any]]:
+    """
+    Tag records in input order. Each output row has "id" plus the tag columns, or
+    "error"; rows whose text was already seen carry "duplicate_of" (tags copied).
+    """
+    dedupe = _Deduper(dedupe_window)
+    pool = Pool(workers) if workers > 1 else None
+    inflight: deque = deque()
+    max_inflight = max(1, workers) * 2
+
+    def submit(chunk):
+        texts = [e[1] for e in chunk if e[1] is not None and e[3] is None]
+        inflight.append((chunk, pool.apply_async(_tag_chunk, (texts,)) if pool else _tag_chunk(texts)))
+
+    def collect():
+        chunk, pending = inflight.popleft()
+        tagged = iter(pending.get() if pool else pending)
+        for rid, text, error, dup_of, key in chunk:
+            if error is not None:
+                yield {"id": rid, "error": error}
+                continue
+            if dup_of is None:
+                result = next(tagged)
+                dedupe.store(key, result)
+            else:
+                result = dedupe.lookup(key)
+                if result is None:  # original fell out of the window before it was written
+                    result = _tag_one(text)
+            yield _row(rid, result, dup_of)
+
+    try:
+        it = iter(records)
+        while True:
+            chunk = []
+            for rid, text, error in itertools.islice(it, chunk_size):
+                key = dup_of = None
+                if error is None:
+                    key = _Deduper.digest(text)
+                    dup_of = dedupe.first_seen(key, rid)
+                chunk.append((rid, text, error, dup_of, key))
+            if not chunk:
+                break
+            submit(chunk)
+            while len(inflight) >= max_inflight:
+                yield from collect()
+        while inflight:
+            yield from collect()
+    finally:
+        if pool:
+            pool.terminate()
+
+
+def _row(rid: str, result: Tagged, dup_of: Optional[str]) -> Dict[str, Any]:
+    if isinstance(result, dict):
+        return {"id": rid, "error": result["error"]}
+    by_ctx, triggers, life = result
+    row = {
+        "id": rid,
+        "matched_metaphors": sorted({c for cats in by_ctx.values() for c in cats}),
+        "matched_by_context": by_ctx,
+        "triggers_detected": triggers,
+        "life_impact_detected": life,
+    }
+    if dup_of is not None:
+        row["duplicate_of"] = dup_of
+    return row
+
+
+# -----------------------
+# Output
+# -----------------------
+
+
+def _dump_line(obj: Any) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class JsonlWriter:
+    """One JSON object per row (writes bytes so checkpoints can record exact offsets)."""
+
+    def __init__(self, fh):
+        self.fh = fh
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self.fh.write(_dump_line(row))
+
+    def flush(self) -> None:
+        self.fh.flush()
+
+
+class ColumnarWriter:
+    """
+    Row groups as JSON lines, after one header line with the dictionaries.
+    Hits are (context, category) codes laid out CSR-style: row i owns
+    context/category[hit_offsets[i]:hit_offsets[i + 1]]; same for triggers/life impact.
+    A value missing from the header dictionaries gets the next code, and the group that
+    first uses it lists it under "dictionary_additions". `dictionaries` (from a checkpoint)
+    continues an existing file's codes instead of the current taxonomy's.
+    """
+
+    def __init__(self, fh, write_header: bool = True, dictionaries: Optional[Dict[str, List[str]]] = None):
+        self.fh = fh
+        self.dicts = {k: list(v) for k, v in dictionaries.items()} if dictionaries else {
+            "context": list(CONTEXTS),
+            "category": list(METAPHOR_TYPES),
+            "trigger": list(TRIGGERS),
+            "life_impact": list(LIFE_IMPACT),
+        }
+        self._codes = {k: {v: i for i, v in enumerate(vals)} for k, vals in self.dicts.items()}
+        if write_header:
+            fh.write(_dump_line({"format": COLUMNAR_FORMAT, "version": COLUMNAR_VERSION,
+                                 "dictionaries": self.dicts}))
+        self._reset()
+
+    def _reset(self) -> None:
+        self.group: Dict[str, List[Any]] = {
+            "id": [], "duplicate_of": [], "error": [],
+            "hit_offsets": [0], "context": [], "category": [],
+            "trigger_offsets": [0], "trigger": [],
+            "life_impact_offsets": [0], "life_impact": [],
+        }
+        self._additions: Dict[str, List[str]] = {}
+
+    def _code(self, dim: str, value: str) -> int:
+        codes = self._codes[dim]
+        if value not in codes:  # e.g. a category added since the header was written
+            codes[value] = len(self.dicts[dim])
+            self.dicts[dim].append(value)
+            self._additions.setdefault(dim, []).append(value)
+        return codes[value]
+
+    def write(self, row: Dict[str, Any]) -> None:
+        g = self.group
+        g["id"].append(row["id"])
+        g["duplicate_of"].append(row.get("duplicate_of"))
+        g["error"].append(row.get("error"))
+        for ctx, cats in (row.get("matched_by_context") or {}).items():
+            for cat in cats:
+                g["context"].append(self._code("context", ctx))
+                g["category"].append(self._code("category", cat))
+        g["hit_offsets"].append(len(g["context"]))
+        for dim, field in (("trigger", "triggers_detected"), ("life_impact", "life_impact_detected")):
+            g[dim].extend(self._code(dim, v) for v in row.get(field, []))
+            g[dim + "_offsets"].append(len(g[dim]))
+
+    def flush(self) -> None:
+        if self.group["id"]:
+            group = {"rows": len(self.group["id"]), **self.group}
+            if self._additions:
+                group["dictionary_additions"] = self._additions
+            self.fh.write(_dump_line(group))
+            self._reset()
+        self.fh.flush()
+
+
+WRITERS = {"jsonl": JsonlWriter, "columnar": ColumnarWriter}
+
+
+# -----------------------
+# Checkpointing
+# -----------------------
+
+
+def _load_checkpoint(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as fh:
+        state = json.load(fh)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise SystemExit(f"Unsupported checkpoint version in {path}")
+    return state
+
+
+def _save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(state, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+# -----------------------
+# CLI
+# -----------------------
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m backend.tag_corpus",
+                                 description="Tag a CSV/JSONL corpus with the pain-metaphor taxonomy.")
+    ap.add_argument("input", help="input file, or - for stdin")
+    ap.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    ap.add_argument("--input-format", choices=("csv", "jsonl"), help="default: from the file extension")
+    ap.add_argument("--format", choices=sorted(WRITERS), default="jsonl", help="output format")
+    ap.add_argument("--text-field", default="description", help="field/column holding the text")
+    ap.add_argument("--id-field", help="field/column holding a record id (default: record number)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--chunk-size", type=int, default=256, help="records per dispatched task")
+    ap.add_argument("--row-group", type=int, default=5000,
+                    help="rows per columnar row group; also the checkpoint interval")
+    ap.add_argument("--dedupe-window", type=int, default=100_000,
+                    help="remember this many distinct inputs for exact-duplicate detection (0 = off)")
+    ap.add_argument("--checkpoint", help="checkpoint file, updated after every row group")
+    ap.add_argument("--resume", action="store_true",
+                    help="continue from --checkpoint (the dedupe window starts empty)")
+    args = ap.parse_args(argv)
+
+    if args.checkpoint and args.output == "-":
+        ap.error("--checkpoint needs --output to be a file")
+    if args.resume and not args.checkpoint:
+        ap.error("--resume needs --checkpoint")
+
+    state = {"version": CHECKPOINT_VERSION, "input": args.input, "format": args.format,
+             "taxonomy_hash": get_snapshot().source_hash, "dictionaries": None,
+             "records_done": 0, "output_bytes": 0}
+    resuming = bool(args.resume and os.path.exists(args.checkpoint))
+    if resuming:
+        saved = _load_checkpoint(args.checkpoint)
+        if saved.get("format") != args.format:
+            ap.error(f"checkpoint was written with --format {saved.get('format')}")
+        if saved.get("taxonomy_hash") != state["taxonomy_hash"]:
+            # Rows before and after the checkpoint would be tagged by different taxonomies.
+            ap.error("the taxonomy changed since the checkpoint was written; start over without --resume")
+        state.update(saved)
+
+    fmt = args.input_format or _detect_input_format(args.input)
+    fin = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    if args.output == "-":
+        fout = sys.stdout.buffer
+    else:
+        fout = open(args.output, "r+b" if resuming else "wb")
+        if resuming:
+            fout.seek(state["output_bytes"])
+            fout.truncate()
+
+    records = iter_records(fin, fmt, args.text_field, args.id_field)
+    records = itertools.islice(records, state["records_done"], None)
+    if args.format == "columnar":
+        writer = ColumnarWriter(fout, write_header=not resuming,
+                                dictionaries=state["dictionaries"] if resuming else None)
+    else:
+        writer = WRITERS[args.format](fout)
+
+    def commit():
+        writer.flush()
+        if args.checkpoint:
+            state["output_bytes"] = fout.tell()
+            if isinstance(writer, ColumnarWriter):
+                state["dictionaries"] = writer.dicts
+            _save_checkpoint(args.checkpoint, state)
+
+    if args.checkpoint and not resuming:
+        commit()  # covers the columnar header
+    pending = 0
+    try:
+        for row in tag_stream(records, args.workers, max(1, args.chunk_size), args.dedupe_window):
+            writer.write(row)
+            state["records_done"] += 1
+            pending += 1
+            if pending >= args.row_group:
+                commit()
+                pending = 0
+        commit()
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout.buffer:
+            fout.close()
+    print(f"[tag_corpus] {state['records_done']} records tagged.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
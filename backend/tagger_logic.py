@@ -2,9 +2,16 @@
 # Uses Bullo's research-derived taxonomy.
 
 from __future__ import annotations
+import bisect
+import functools
+import hashlib
+import json
+import os
 import re
 import sys
-from typing import Dict, List, Set, Optional, Any
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, List, Set, Optional, Any, Sequence, Tuple
 
 # -----------------------
 # Imports (package-aware)
@@ -38,6 +45,9 @@ except Exception:
         print("[WARN] entailments.get_entailments not found; using empty entailments.", file=sys.stderr)
         _get_entailments = _empty_entailments
 
+# Optional per-stage timing hook, observer(stage, seconds); app.py passes metrics.observe_stage.
+StageObserver = Callable[[str, float], None]
+
 # -----------------------
 # Public knobs (populated from taxonomy)
 # -----------------------
@@ -46,20 +56,23 @@ GRADUATION: List[str] = []
 TRIGGERS: List[str] = []
 LIFE_IMPACT: List[str] = []
 
-# Precompiled patterns holder
-_COMPILED: Dict[str, List[re.Pattern]] = {}
+# Compiled state lives in the current TaxonomySnapshot (_SNAPSHOT, see below).
 
 # -----------------------
 # Normalization
 # -----------------------
 
 
+_PUNCT_RE = re.compile(r"[^\w\s']")
+_SPACES_RE = re.compile(r"\s+")
+
+
 def _normalize(text: Any) -> str:
     """Lowercase; remove punctuation except spaces & apostrophes; collapse whitespace."""
     if not isinstance(text, str):
         text = "" if text is None else str(text)
-    text = re.sub(r"[^\w\s']", " ", text.lower()).strip()
-    return re.sub(r"\s+", " ", text)
+    text = _PUNCT_RE.sub(" ", text.lower()).strip()
+    return _SPACES_RE.sub(" ", text)
 
 
 # -----------------------
@@ -115,6 +128,23 @@ def _irregular_word_variants(word: str) -> List[str]:
 # -----------------------
 
 
+def _expression_parts(expr: str) -> List[str]:
+    """Split a multi-word expression on spaces/hyphens (empty list for single tokens)."""
+    if not re.search(r"[ \-]", expr):
+        return []
+    return [p for p in re.split(r"[ \-]+", expr) if p]
+
+
+def _single_token_variants(word: str) -> Set[str]:
+    """Roots/irregulars that a single-token expression expands to (before suffixes)."""
+    irregulars = set(_irregular_word_variants(word))
+    root = re.sub(r"(?:ing|ed|es|s)$", "", word)
+    variants = {word, root} | irregulars
+    if len(root) >= 2 and root[-1] == root[-2]:
+        variants.add(root[:-1])
+    return variants
+
+
 def _compile_expression(expr: str) -> re.Pattern:
     r"""
     Build a forgiving regex from a taxonomy expression:
@@ -128,20 +158,13 @@ def _compile_expression(expr: str) -> re.Pattern:
 
     # If expression contains space OR hyphen, treat both as separators
     if re.search(r"[ \-]", expr):
-        parts = [re.escape(p) for p in re.split(r"[ \-]+", expr) if p]
+        parts = [re.escape(p) for p in _expression_parts(expr)]
         pattern = r"\b" + r"(?:[-\s]+)".join(parts) + r"\b"
         return re.compile(pattern, re.I)
 
     # Single-token case
-    word = expr
-    irregulars = set(_irregular_word_variants(word))
-    root = re.sub(r"(?:ing|ed|es|s)$", "", word)
-    variants = {word, root} | irregulars
-    if len(root) >= 2 and root[-1] == root[-2]:
-        variants.add(root[:-1])
-
     alts = []
-    for v in variants:
+    for v in _single_token_variants(expr):
         if v.endswith("ves"):
             alts.append(re.escape(v))
         elif len(v) >= 3:
@@ -152,47 +175,740 @@ def _compile_expression(expr: str) -> re.Pattern:
     pattern = r"\b(?:%s)\b" % "|".join(alts)
     return re.compile(pattern, re.I)
 
+_TOKEN_RE = re.compile(r"\w+")
+_GAP_RE = re.compile(r"[-\s]+")
+
+
+def _expression_token_forms(expr: str) -> Optional[List[Tuple[str, ...]]]:
+    """
+    Every token sequence that `_compile_expression(expr)` accepts, or None when the
+    expression can't be represented as whole \\w+ tokens (the engine then keeps its regex).
+    """
+    expr = (expr or "").strip().lower()
+    if not expr:
+        return []
+    if re.search(r"[ \-]", expr):
+        parts = tuple(_expression_parts(expr))
+        if not parts or not all(_is_plain_token(p) for p in parts):
+            return None
+        return [parts]
+    forms: Set[str] = set()
+    for v in _single_token_variants(expr):
+        if v.endswith("ves") or len(v) < 3:
+            forms.add(v)
+        else:
+            forms.update(v + suf for suf in ("", "ing", "ed", "es", "s"))
+    if not all(_is_plain_token(f) for f in forms):
+        return None
+    return [(f,) for f in sorted(forms)]
+
+
+def _mention_token_forms(item: str) -> Optional[List[Tuple[str, ...]]]:
+    """
+    _expression_token_forms for a trigger or life-impact clue; the last word of a
+    multi-word item is inflected like a single-token expression ("bowel movements").
+    """
+    forms = _expression_token_forms(item)
+    if not forms or len(forms[0]) == 1:
+        return forms
+    lasts = _expression_token_forms(forms[0][-1])
+    if not lasts:
+        return forms
+    return [forms[0][:-1] + last for last in lasts]
+
+
+def _is_plain_token(tok: str) -> bool:
+    # ASCII-only so a dict lookup agrees with re.I case folding
+    return bool(tok) and tok.isascii() and _TOKEN_RE.fullmatch(tok) is not None
+
+# -----------------------
+# Matcher engine (single scan over the normalized text)
+# -----------------------
+
+
+Hit = Tuple[int, int, str]  # (start, end, category)
+Mention = Tuple[int, int, str, str]  # (start, end, kind, taxonomy item)
+
+# Graduation modifiers are either about how strong the pain is or how it behaves over
+# time; taxonomy terms not listed here count as intensity.
+_TEMPORAL_MODIFIERS = frozenset({
+    "constant", "intermittent", "sudden", "gradual", "worse at night",
+    "comes and goes", "flare", "flare-up",
+})
+MODIFIER_KINDS = ("intensity", "temporality")
+
+
+def _graduation_kind(term: str) -> str:
+    return "temporality" if term.strip().lower() in _TEMPORAL_MODIFIERS else "intensity"
+
+
+class _PhraseMatcher:
+    """
+    Token-level multi-pattern matcher built once per taxonomy.
+
+    Every expression is expanded into the exact token sequences its regex from
+    `_compile_expression` accepts (plurals, -ing/-ed, irregulars, Brit/Amer), so a
+    single pass over the \\w+ tokens of the text finds all categories with offsets.
+    Expressions that can't be expanded that way stay as regexes ("residual").
+    Built from the lexicon layout of `build_lexicon` (prebuilt or on the fly).
+    Graduation modifiers (`modifiers`: (kind, term) pairs) are expanded the same way
+    and share the token lookups; `scan_graded` returns them next to the hits.
+    """
+
+    __slots__ = ("_single", "_phrases", "_residual", "_reference", "_modifier_reference")
+
+    def __init__(self, lexicon: Dict[str, Any],
+                 reference: Callable[[], Dict[str, List[re.Pattern]]],
+                 modifiers: Sequence[Tuple[str, str]] = (),
+                 modifier_reference: Callable[[], List[Tuple[re.Pattern, Any]]] = list):
+        cats = lexicon["categories"]
+        # Table values are category names, or (kind, term) for a graduation modifier.
+        single: Dict[str, List[Any]] = {tok: [cats[i] for i in idxs]
+                                         for tok, idxs in lexicon["single"].items()}
+        phrases: Dict[str, List[Tuple[Tuple[str, ...], Any]]] = {}
+        for form, idx in lexicon["phrases"]:
+            phrases.setdefault(form[0], []).append((tuple(form[1:]), cats[idx]))
+        residual = [(_compile_expression(expr), cats[idx])
+                    for expr, idx in lexicon["residual"]]
+        for kind, term in modifiers:
+            forms = _expression_token_forms(term)
+            if forms is None:
+                residual.append((_compile_expression(term), (kind, term)))
+            for form in forms or ():
+                if len(form) == 1:
+                    single.setdefault(form[0], []).append((kind, term))
+                else:
+                    phrases.setdefault(form[0], []).append((tuple(form[1:]), (kind, term)))
+        self._single = {k: tuple(v) for k, v in single.items()}
+        self._phrases = {k: tuple(v) for k, v in phrases.items()}
+        self._residual = residual
+        self._reference = reference
+        self._modifier_reference = modifier_reference
+
+    def vocabulary(self, modifiers: bool = False) -> FrozenSet[str]:
+        """Every token of the metaphor expression forms (or of the graduation modifier forms)."""
+        words = {tok for tok, entries in self._single.items()
+                 if any((type(e) is str) is not modifiers for e in entries)}
+        for first, entries in self._phrases.items():
+            for rest, entry in entries:
+                if (type(entry) is str) is not modifiers:
+                    words.add(first)
+                    words.update(rest)
+        return frozenset(words)
+
+    def scan(self, text_norm: str) -> List[Hit]:
+        """All (start, end, category) hits, ordered by start offset."""
+        return self.scan_graded(text_norm)[0]
+
+    def scan_graded(self, text_norm: str) -> Tuple[List[Hit], List[Mention]]:
+        """Metaphor hits plus (start, end, kind, term) graduation modifiers, both ordered by offset."""
+        found: List[Tuple[int, int, Any]] = []
+        if not text_norm.isascii():
+            # Unicode case folding (e.g. long s) is only exact through the regexes.
+            found.extend(_scan_reference(text_norm, self._reference()))
+            patterns = self._modifier_reference()
+        else:
+            text = text_norm.lower()
+            toks = [(m.start(), m.end(), m.group()) for m in _TOKEN_RE.finditer(text)]
+            single, phrases = self._single, self._phrases
+            n = len(toks)
+            for i, (start, end, tok) in enumerate(toks):
+                for mtype in single.get(tok, ()):
+                    found.append((start, end, mtype))
+                for rest, mtype in phrases.get(tok, ()):
+                    j = i
+                    for part in rest:
+                        j += 1
+                        if j >= n or toks[j][2] != part or \
+                                not _GAP_RE.fullmatch(text, toks[j - 1][1], toks[j][0]):
+                            break
+                    else:
+                        found.append((start, toks[j][1], mtype))
+            patterns = self._residual
+        for pat, mtype in patterns:
+            found.extend((m.start(), m.end(), mtype)
+                         for m in pat.finditer(text_norm))
+        hits = [h for h in found if type(h[2]) is str]
+        if len(hits) == len(found):
+            hits.sort()
+            return hits, []
+        mods = [(start, end, kind, term) for start, end, (kind, term) in
+                (f for f in found if type(f[2]) is not str)]
+        hits.sort()
+        mods.sort()
+        return hits, mods
+
+    def categories(self, text_norm: str) -> Set[str]:
+        return {mtype for _, _, mtype in self.scan(text_norm)}
+
+
+class _MentionScanner:
+    """
+    Word-boundary matcher for the taxonomy's flat lists (triggers, life-impact clues),
+    all found in one pass over the words of a _normalize()d text. A single-word item gets
+    the same inflections as a metaphor expression ("periods", "rested"), and so does the
+    last word of a phrase ("bowel movements"); items never match inside another word
+    ("rest" in "interest"). Only presence is reported; graduation
+    modifiers, which need offsets, are matched by _PhraseMatcher instead.
+    """
+
+    __slots__ = ("_firsts", "_phrases", "_residual")
+
+    def __init__(self, items: Sequence[Tuple[str, str]]):
+        phrases: Dict[str, List[Tuple[str, str, str]]] = {}  # first word -> (" other words", kind, item)
+        residual = []
+        for kind, item in items:
+            forms = _mention_token_forms(item)
+            if forms is None:
+                residual.append((_compile_expression(item), kind, item))
+                continue
+            for form in forms:
+                tail = "".join(" " + part for part in form[1:])
+                phrases.setdefault(form[0], []).append((tail, kind, item))
+        self._phrases = {k: tuple(v) for k, v in phrases.items()}
+        self._firsts = frozenset(phrases)
+        self._residual = residual
+
+    def vocabulary(self) -> FrozenSet[str]:
+        return self._firsts | {w for entries in self._phrases.values() for tail, _, _ in entries
+                               for w in tail.split()}
+
+    def find(self, text_norm: str) -> Set[Tuple[str, str]]:
+        """{(kind, item)} mentioned in `text_norm`."""
+        # _normalize leaves only \w runs, single spaces and apostrophes, so these are
+        # the text's \w+ tokens.
+        words = text_norm.replace("'", " ").split()
+        found: Set[Tuple[str, str]] = set()
+        padded = None
+        for first in self._firsts.intersection(words):
+            for tail, kind, item in self._phrases[first]:
+                if not tail:
+                    found.add((kind, item))
+                    continue
+                if padded is None:
+                    padded = " " + " ".join(words) + " "
+                if " " + first + tail + " " in padded:
+                    found.add((kind, item))
+        for pat, kind, item in self._residual:
+            if pat.search(text_norm):
+                found.add((kind, item))
+        return found
+
 # -----------------------
-# Compile from taxonomy
+# Typo tolerance (optional; EMP_FUZZY=1)
+# Words the exact matcher left unexplained ("burnning", "squeezeing") are looked up in a
+# symmetric-delete index (SymSpell) over the engine's vocabulary: every word form is
+# stored under each string obtained by deleting up to EMP_FUZZY_MAX_DISTANCE letters, so
+# a lookup only generates the typed word's own deletes (a few dozen dict probes whatever
+# the taxonomy size) and verifies the few candidates with a bounded edit distance.
 # -----------------------
+_FUZZY = os.getenv("EMP_FUZZY", "0").lower() in ("1", "true", "on", "yes")
+_FUZZY_MAX_DISTANCE = max(1, min(2, int(os.getenv("EMP_FUZZY_MAX_DISTANCE", "2"))))
+_FUZZY_MIN_LENGTH = max(3, int(os.getenv("EMP_FUZZY_MIN_LENGTH", "5")))
+# Shorter words get one inserted or deleted letter at most ("burnning", "stabbin"):
+# a swapped or substituted letter in a short word is too often another real word
+# ("crash", "looked", "share" are one letter away from "crush", "locked", "shape").
+_FUZZY_LONG_WORD = 9
+# Optional newline-separated word list (e.g. /usr/share/dict/words): words in it are
+# correctly spelled by definition and never corrected.
+_FUZZY_WORDLIST = os.getenv("EMP_FUZZY_WORDLIST", "")
+
+Correction = Tuple[str, str, int, Tuple[str, ...]]  # (typed word, corrected word, edit distance, categories)
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    """`word` and every string obtained by deleting up to `depth` characters from it."""
+    found = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        found |= frontier
+    return found
 
 
-def _compile_from_taxonomy(tax: Dict[str, Any]) -> None:
-    global METAPHOR_TYPES, GRADUATION, TRIGGERS, LIFE_IMPACT, _COMPILED
-    METAPHOR_TYPES = dict(tax.get("metaphor_types", {}) or {})
-    GRADUATION = list(tax.get("graduation_modifiers", []) or [])
-    TRIGGERS = list(tax.get("triggers", []) or [])
-    LIFE_IMPACT = list(tax.get("life_impact_clues", []) or [])
-    _COMPILED = {
-        mtype: [_compile_expression(e)
-                for e in (data or {}).get("expressions", [])]
-        for mtype, data in METAPHOR_TYPES.items()
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count 1), or limit + 1 once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return min(prev[-1], limit + 1)
+
+
+@functools.lru_cache(maxsize=1)
+def _fuzzy_wordlist(path: str) -> FrozenSet[str]:
+    if not path:
+        return frozenset()
+    try:
+        with open(path, encoding="utf-8", errors="replace") as fh:
+            return frozenset(line.strip().lower() for line in fh if line.strip())
+    except OSError as e:
+        print(f"[WARN] EMP_FUZZY_WORDLIST unreadable ({e}); continuing without it.", file=sys.stderr)
+        return frozenset()
+
+
+class _FuzzyIndex:
+    """
+    Spelling correction of single words against the matcher's vocabulary. Only
+    alphabetic words of at least `min_length` letters are indexed or corrected, a
+    correction keeps the first letter, and words in `known` (graduation modifier,
+    trigger and life-impact words, an optional word list) or in the vocabulary itself
+    are never corrected.
+    """
+
+    __slots__ = ("_index", "_known", "_max_distance", "_min_length", "_max_length", "_memo")
+
+    _MEMO_MAX = 8192  # distinct words remembered (found or not) before the memo is reset
+
+    def __init__(self, vocabulary: FrozenSet[str], known: FrozenSet[str] = frozenset(),
+                 max_distance: int = 2, min_length: int = 5):
+        index: Dict[str, Set[str]] = {}
+        for word in vocabulary:
+            if len(word) >= min_length and word.isalpha():
+                for variant in _deletes(word, max_distance):
+                    index.setdefault(variant, set()).add(word)
+        self._index = {k: tuple(sorted(v)) for k, v in index.items()}
+        self._known = vocabulary | known
+        self._max_distance = max_distance
+        self._min_length = min_length
+        # Nothing longer can be within max_distance of an indexed word.
+        self._max_length = max((len(w) for w in index), default=0) + max_distance
+        self._memo: Dict[str, Optional[Tuple[str, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, word: str) -> Optional[Tuple[str, int]]:
+        """(closest vocabulary word, edit distance) for a misspelt `word`, or None."""
+        if not self._min_length <= len(word) <= self._max_length or word in self._known \
+                or not word.isalpha():
+            return None
+        try:
+            return self._memo[word]
+        except KeyError:
+            pass
+        if len(self._memo) >= self._MEMO_MAX:
+            self._memo = {}
+        found = self._memo[word] = self._search(word)
+        return found
+
+    def _search(self, word: str) -> Optional[Tuple[str, int]]:
+        limit = self._max_distance if len(word) >= _FUZZY_LONG_WORD else 1
+        best: Optional[Tuple[int, str]] = None
+        seen: Set[str] = set()
+        for variant in _deletes(word, limit):
+            for candidate in self._index.get(variant, ()):
+                if candidate in seen or candidate[0] != word[0] or \
+                        (len(candidate) == len(word) and len(word) < _FUZZY_LONG_WORD):
+                    continue
+                seen.add(candidate)
+                d = _edit_distance(word, candidate, limit)
+                if d <= limit and (best is None or (d, candidate) < best):
+                    best = (d, candidate)
+        return (best[1], best[0]) if best else None
+
+    def correct(self, text_norm: str, hits: List[Hit], mentions: List[Mention]
+                ) -> Tuple[str, List[Tuple[int, int, str, str, int]]]:
+        """
+        `text_norm` with each word outside the `hits`/`mentions` spans replaced by its
+        correction, plus (start, end, typed, corrected, distance) per replacement, with
+        offsets into the corrected text.
+        """
+        spans = sorted([(h[0], h[1]) for h in hits] + [(m[0], m[1]) for m in mentions])
+        parts: List[str] = []
+        fixes: List[Tuple[int, int, str, str, int]] = []
+        pos = shift = 0
+        i = reach = 0  # spans[:i] start before the current word; reach = their furthest end
+        for m in _TOKEN_RE.finditer(text_norm):
+            start, end = m.span()
+            while i < len(spans) and spans[i][0] < end:
+                reach = max(reach, spans[i][1])
+                i += 1
+            if reach > start:
+                continue
+            found = self.lookup(m.group())
+            if found is None:
+                continue
+            term, distance = found
+            parts.append(text_norm[pos:start])
+            parts.append(term)
+            pos = end
+            fixes.append((start + shift, start + shift + len(term), m.group(), term, distance))
+            shift += len(term) - (end - start)
+        if not fixes:
+            return text_norm, fixes
+        parts.append(text_norm[pos:])
+        return "".join(parts), fixes
+
+# -----------------------
+# Prebuilt lexicon (written by `python -m backend.normalize_taxonomy build`)
+# -----------------------
+LEXICON_FORMAT = "emp-lexicon"
+# Bump whenever the expansion rules above (_expression_token_forms & helpers) change,
+# so artifacts built with the old rules are treated as stale.
+LEXICON_VERSION = 1
+_LEXICON_PATH = os.getenv("EMP_LEXICON_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "lexicon.json")
+_USE_LEXICON = os.getenv("EMP_LEXICON", "1").lower() not in ("0", "false", "off", "no")
+
+
+def taxonomy_hash(tax: Dict[str, Any]) -> str:
+    """Content hash a lexicon artifact must carry to be used for `tax`."""
+    blob = json.dumps(tax, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{LEXICON_FORMAT}/{LEXICON_VERSION}\n{blob}".encode("utf-8")).hexdigest()
+
+
+def build_lexicon(tax: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand every taxonomy expression into the token forms the matcher engine looks up."""
+    metaphor_types = dict(tax.get("metaphor_types", {}) or {})
+    single: Dict[str, List[int]] = {}
+    phrases: List[List[Any]] = []
+    residual: List[List[Any]] = []
+    for idx, (mtype, data) in enumerate(metaphor_types.items()):
+        for expr in (data or {}).get("expressions", []):
+            forms = _expression_token_forms(expr)
+            if forms is None:
+                residual.append([expr, idx])
+                continue
+            for form in forms:
+                if len(form) > 1:
+                    phrases.append([list(form), idx])
+                elif idx not in single.setdefault(form[0], []):
+                    single[form[0]].append(idx)
+    return {
+        "format": LEXICON_FORMAT,
+        "version": LEXICON_VERSION,
+        "source_hash": taxonomy_hash(tax),
+        "categories": list(metaphor_types),
+        "single": dict(sorted(single.items())),
+        "phrases": phrases,
+        "residual": residual,
     }
 
 
-def reload_taxonomy(new_taxonomy: Dict[str, Any]) -> None:
-    """If you swap taxonomy at runtime, call this to recompile patterns."""
+def _load_lexicon(path: str, expected_hash: str) -> Optional[Dict[str, Any]]:
+    """The artifact at `path` if it exists and matches `expected_hash`; else None (compile instead)."""
+    if not _USE_LEXICON:
+        return None
+    try:
+        with open(path, "rb") as fh:
+            data = json.loads(fh.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("format") != LEXICON_FORMAT \
+            or data.get("version") != LEXICON_VERSION or data.get("source_hash") != expected_hash:
+        return None
+    return data
+
+
+# -----------------------
+# Compile from taxonomy (immutable snapshots, swapped atomically)
+# -----------------------
+
+
+class TaxonomySnapshot:
+    """
+    Everything compiled from one taxonomy, plus a version number that is stamped into
+    every tag_pain_description result. Read-only once published: the matcher engine and
+    the reference regexes are built at most once (lazily, or up front via `warm()`).
+    Readers grab `_SNAPSHOT` once per call, so a reload never mixes old and new state.
+    A locale pack (backend/locales) compiles into its own snapshot, with the pack's
+    context patterns and patient-summary rephrasings; the default snapshot uses the
+    module's built-in English ones.
+    """
+
+    __slots__ = ("version", "taxonomy", "metaphor_types", "graduation", "triggers",
+                 "life_impact", "source_hash", "categories", "category_bits", "locale",
+                 "rephrasings", "_names_by_mask", "_matcher", "_mentions", "_fuzzy", "_compiled",
+                 "_modifier_patterns", "_context_any", "_context_memo", "_chunk_memo", "_lock")
+
+    def __init__(self, tax: Dict[str, Any], version: int, locale: str = "en",
+                 context_patterns: Optional[Dict[str, List[str]]] = None,
+                 rephrasings: Optional[Dict[str, str]] = None):
+        self.version = version
+        self.locale = locale
+        # Hashable so summaries can be memoized on it; None = CLINICAL_REPHRASINGS.
+        self.rephrasings: Optional[Tuple[Tuple[str, str], ...]] = \
+            tuple(sorted(rephrasings.items())) if rephrasings else None
+        # None = the built-in _CONTEXT_PATTERNS_RAW (and their shared memo).
+        self._context_any: Optional[Dict[str, re.Pattern]] = None
+        self._context_memo: Optional[Callable[[str], Tuple[str, ...]]] = None
+        if context_patterns is not None:
+            self._context_any = _compile_context_patterns(context_patterns)
+            self._context_memo = functools.lru_cache(maxsize=4096)(self._match_contexts)
+        # Per snapshot, not a module-level cache keyed on it: a replaced snapshot or an
+        # evicted locale pack takes its memo with it instead of staying reachable.
+        self._chunk_memo: Callable[[str], "ChunkAnalysis"] = \
+            functools.lru_cache(maxsize=4096)(self._analyse_chunk)
+        self.taxonomy = tax
+        self.metaphor_types: Dict[str, Dict[str, Any]] = dict(tax.get("metaphor_types", {}) or {})
+        self.graduation: Tuple[str, ...] = tuple(tax.get("graduation_modifiers", []) or [])
+        self.triggers: Tuple[str, ...] = tuple(tax.get("triggers", []) or [])
+        self.life_impact: Tuple[str, ...] = tuple(tax.get("life_impact_clues", []) or [])
+        self.source_hash = taxonomy_hash(tax)
+        # Category IDs: bit i <-> categories[i], in sorted order, so decoding a mask
+        # bit by bit yields names already sorted.
+        self.categories: Tuple[str, ...] = tuple(sorted(self.metaphor_types))
+        self.category_bits: Dict[str, int] = {c: 1 << i for i, c in enumerate(self.categories)}
+        self._names_by_mask: Dict[int, Tuple[str, ...]] = {0: ()}
+        self._matcher: Optional[_PhraseMatcher] = None
+        self._mentions: Optional[_MentionScanner] = None
+        self._fuzzy: Optional[_FuzzyIndex] = None
+        self._compiled: Optional[Dict[str, List[re.Pattern]]] = None
+        self._modifier_patterns: Optional[List[Tuple[re.Pattern, Tuple[str, str]]]] = None
+        self._lock = threading.Lock()
+
+    def compiled(self) -> Dict[str, List[re.Pattern]]:
+        """Per-expression regexes (reference backend / non-ASCII fallback)."""
+        if self._compiled is None:
+            with self._lock:
+                if self._compiled is None:
+                    self._compiled = {
+                        mtype: [_compile_expression(e)
+                                for e in (data or {}).get("expressions", [])]
+                        for mtype, data in self.metaphor_types.items()
+                    }
+        return self._compiled
+
+    def matcher(self) -> _PhraseMatcher:
+        if self._matcher is None:
+            with self._lock:
+                if self._matcher is None:
+                    lexicon = _load_lexicon(_LEXICON_PATH, self.source_hash) \
+                        or build_lexicon(self.taxonomy)
+                    self._matcher = _PhraseMatcher(lexicon, self.compiled, self.graded_terms(),
+                                                   self.modifier_patterns)
+        return self._matcher
+
+    def graded_terms(self) -> List[Tuple[str, str]]:
+        """Graduation modifiers as (kind, term), kind in MODIFIER_KINDS."""
+        return [(_graduation_kind(g), g) for g in self.graduation]
+
+    def modifier_patterns(self) -> List[Tuple[re.Pattern, Tuple[str, str]]]:
+        """Per-modifier regexes (reference backend / non-ASCII fallback)."""
+        if self._modifier_patterns is None:
+            with self._lock:
+                if self._modifier_patterns is None:
+                    self._modifier_patterns = [(_compile_expression(term), (kind, term))
+                                               for kind, term in self.graded_terms()]
+        return self._modifier_patterns
+
+    def mentions(self) -> _MentionScanner:
+        if self._mentions is None:
+            with self._lock:
+                if self._mentions is None:
+                    items = [("trigger", t) for t in self.triggers]
+                    items += [("life_impact", c) for c in self.life_impact]
+                    self._mentions = _MentionScanner(items)
+        return self._mentions
+
+    def _match_contexts(self, sent: str) -> Tuple[str, ...]:
+        low = sent.lower()
+        return tuple(ctx for ctx, pat in self._context_any.items() if pat.search(low))
+
+    def sentence_contexts(self, sent: str) -> Tuple[str, ...]:
+        """Contexts (in CONTEXTS order) whose patterns occur in `sent`."""
+        if self._context_memo is None:
+            return _sentence_contexts(sent)
+        if len(sent) > _SENTENCE_CACHE_MAX_LEN:
+            return self._match_contexts(sent)
+        return self._context_memo(sent)
+
+    def _analyse_chunk(self, chunk: str) -> "ChunkAnalysis":
+        return _chunk_analysis_uncached(chunk, self)
+
+    def chunk_analysis(self, chunk: str) -> "ChunkAnalysis":
+        """_chunk_analysis_uncached(chunk, self), memoized for chunks up to _SENTENCE_CACHE_MAX_LEN."""
+        if len(chunk) > _SENTENCE_CACHE_MAX_LEN:
+            return _chunk_analysis_uncached(chunk, self)
+        return self._chunk_memo(chunk)
+
+    def clear_memos(self) -> None:
+        self._chunk_memo.cache_clear()
+        if self._context_memo is not None:
+            self._context_memo.cache_clear()
+
+    def context_patterns(self) -> Dict[str, re.Pattern]:
+        """One compiled alternation per context."""
+        return _CONTEXT_ANY if self._context_any is None else self._context_any
+
+    def fuzzy(self) -> Optional[_FuzzyIndex]:
+        """Spelling-correction index over the matcher's vocabulary; None unless EMP_FUZZY is on."""
+        if not _FUZZY:
+            return None
+        if self._fuzzy is None:
+            matcher = self.matcher()
+            vocabulary = matcher.vocabulary()
+            known = matcher.vocabulary(modifiers=True) | self.mentions().vocabulary() \
+                | _fuzzy_wordlist(_FUZZY_WORDLIST)
+            with self._lock:
+                if self._fuzzy is None:
+                    self._fuzzy = _FuzzyIndex(vocabulary, known, _FUZZY_MAX_DISTANCE, _FUZZY_MIN_LENGTH)
+        return self._fuzzy
+
+    def mask_of(self, names) -> int:
+        bits = self.category_bits
+        mask = 0
+        for name in names:
+            mask |= bits[name]
+        return mask
+
+    def names_of(self, mask: int) -> Tuple[str, ...]:
+        """Sorted category names of a mask (memoized; there are few distinct masks)."""
+        names = self._names_by_mask.get(mask)
+        if names is None:
+            names = tuple(c for i, c in enumerate(self.categories) if mask >> i & 1)
+            self._names_by_mask[mask] = names
+        return names
+
+    def warm(self) -> "TaxonomySnapshot":
+        """Build what the active matcher backend needs, so the first request after a swap is fast."""
+        if _MATCHER_BACKEND == "reference":
+            self.compiled()
+            self.modifier_patterns()
+        else:
+            self.matcher()
+        self.mentions()
+        self.fuzzy()
+        return self
+
+
+_SNAPSHOT: TaxonomySnapshot
+_RELOAD_LOCK = threading.Lock()
+
+
+def _compile_from_taxonomy(tax: Dict[str, Any], version: int = 1) -> TaxonomySnapshot:
+    return TaxonomySnapshot(tax, version)
+
+
+def _install_snapshot(snap: TaxonomySnapshot) -> None:
+    global _SNAPSHOT, METAPHOR_TYPES, GRADUATION, TRIGGERS, LIFE_IMPACT
+    _SNAPSHOT = snap  # the one atomic swap readers depend on
+    # Legacy module-level knobs, kept in sync for external callers.
+    METAPHOR_TYPES = dict(snap.metaphor_types)
+    GRADUATION = list(snap.graduation)
+    TRIGGERS = list(snap.triggers)
+    LIFE_IMPACT = list(snap.life_impact)
+
+
+def get_snapshot() -> TaxonomySnapshot:
+    """The taxonomy snapshot currently in service."""
+    return _SNAPSHOT
+
+
+def _get_compiled() -> Dict[str, List[re.Pattern]]:
+    return _SNAPSHOT.compiled()
+
+
+_RELOAD_LISTENERS: List[Callable[[], None]] = []
+
+
+def on_taxonomy_reload(callback: Callable[[], None]) -> Callable[[], None]:
+    """Register `callback()` to run after every reload_taxonomy (e.g. to drop result caches)."""
+    _RELOAD_LISTENERS.append(callback)
+    return callback
+
+
+def reload_taxonomy(new_taxonomy: Dict[str, Any]) -> TaxonomySnapshot:
+    """
+    If you swap taxonomy at runtime, call this to recompile patterns. The new snapshot is
+    compiled and warmed before it replaces the old one; in-flight requests finish on the
+    snapshot they started with. Safe to call from a background thread.
+    """
     if not isinstance(new_taxonomy, dict) or "metaphor_types" not in new_taxonomy:
         raise ValueError("new_taxonomy must be a dict with 'metaphor_types'.")
-    _compile_from_taxonomy(new_taxonomy)
+    with _RELOAD_LOCK:
+        snap = _compile_from_taxonomy(new_taxonomy, _SNAPSHOT.version + 1).warm()
+        _install_snapshot(snap)
+    for callback in list(_RELOAD_LISTENERS):
+        callback()
+    return snap
 
 
-_compile_from_taxonomy(_TAXONOMY)
+_install_snapshot(_compile_from_taxonomy(_TAXONOMY))
 
 # -----------------------
 # Matching
 # -----------------------
 
+# "engine" = single-pass _PhraseMatcher; "reference" = the per-pattern regex loop.
+MATCHER_BACKENDS = ("engine", "reference")
+_MATCHER_BACKEND = os.getenv("EMP_MATCHER_BACKEND", "engine")
+if _MATCHER_BACKEND not in MATCHER_BACKENDS:
+    print(f"[WARN] unknown EMP_MATCHER_BACKEND={_MATCHER_BACKEND!r}; using 'engine'.", file=sys.stderr)
+    _MATCHER_BACKEND = "engine"
+
+
+def _scan_reference(text_norm: str, compiled: Optional[Dict[str, List[re.Pattern]]] = None) -> List[Hit]:
+    hits: List[Hit] = []
+    for mtype, pats in (_get_compiled() if compiled is None else compiled).items():
+        for pat in pats:
+            hits.extend((m.start(), m.end(), mtype)
+                        for m in pat.finditer(text_norm))
+    hits.sort()
+    return hits
 
-def _match_metaphors_in(text_norm: str) -> Set[str]:
+
+def _match_metaphors_reference(text_norm: str, snap: Optional[TaxonomySnapshot] = None) -> Set[str]:
     found: Set[str] = set()
-    for mtype, pats in _COMPILED.items():
+    for mtype, pats in (snap or _SNAPSHOT).compiled().items():
         for pat in pats:
             if pat.search(text_norm):
                 found.add(mtype)
                 break
     return found
 
+
+def _scan_metaphors(text_norm: str, backend: Optional[str] = None,
+                    snap: Optional[TaxonomySnapshot] = None) -> List[Hit]:
+    """Every metaphor hit in `text_norm` as (start, end, category), ordered by offset."""
+    snap = snap or _SNAPSHOT
+    if (backend or _MATCHER_BACKEND) == "reference":
+        return _scan_reference(text_norm, snap.compiled())
+    return snap.matcher().scan(text_norm)
+
+
+def _match_metaphors_in(text_norm: str, backend: Optional[str] = None,
+                        snap: Optional[TaxonomySnapshot] = None) -> Set[str]:
+    snap = snap or _SNAPSHOT
+    if (backend or _MATCHER_BACKEND) == "reference":
+        return _match_metaphors_reference(text_norm, snap)
+    return snap.matcher().categories(text_norm)
+
+
+def compare_matcher_backends(texts: List[str], repeat: int = 3) -> Dict[str, Any]:
+    """
+    Run both matcher backends over `texts` (normalized first), report any texts whose
+    categories differ and the best-of-`repeat` wall time of each backend.
+    """
+    norms = [_normalize(t) for t in texts]
+    mismatches = []
+    for raw, norm in zip(texts, norms):
+        ref = _match_metaphors_in(norm, "reference")
+        eng = _match_metaphors_in(norm, "engine")
+        if ref != eng:
+            mismatches.append({"text": raw, "reference": sorted(ref), "engine": sorted(eng)})
+    timings: Dict[str, float] = {}
+    for backend in MATCHER_BACKENDS:
+        best = float("inf")
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            for norm in norms:
+                _match_metaphors_in(norm, backend)
+            best = min(best, time.perf_counter() - t0)
+        timings[backend] = best
+    return {"texts": len(texts), "mismatches": mismatches, "seconds": timings}
+
 # -----------------------
 # Debias predator vs violent_action
 # -----------------------
@@ -239,42 +955,167 @@ _CONTEXT_PATTERNS_RAW = {
 }
 _CONTEXTS = {ctx: [re.compile(p, re.I) for p in pats]
              for ctx, pats in _CONTEXT_PATTERNS_RAW.items()}
+CONTEXTS: List[str] = list(_CONTEXTS)
+
+
+def _compile_context_patterns(patterns: Dict[str, List[str]]) -> Dict[str, re.Pattern]:
+    """One alternation per context, in CONTEXTS order (unknown contexts raise ValueError)."""
+    unknown = sorted(set(patterns) - set(CONTEXTS))
+    if unknown:
+        raise ValueError(f"Unknown context(s) {', '.join(unknown)}; use {', '.join(CONTEXTS)}.")
+    return {ctx: re.compile("|".join(f"(?:{p})" for p in patterns[ctx]), re.I)
+            for ctx in CONTEXTS if patterns.get(ctx)}
+
+
+# One alternation per context: any(p.search(s) for p in pats) in a single search.
+_CONTEXT_ANY = _compile_context_patterns(_CONTEXT_PATTERNS_RAW)
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?;])\s+|\n+')
+
+
+def _split_sentences(raw: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(raw) if s.strip()]
 
 
 def _find_spans(text: str) -> Dict[str, List[str]]:
     raw = (text or "").strip()
     if not raw:
         return {k: [] for k in _CONTEXTS.keys()} | {"baseline": [""]}
-    sentences = re.split(r'(?<=[.!?;])\s+|\n+', raw)
-    sentences = [s.strip() for s in sentences if s.strip()]
     spans = {k: [] for k in _CONTEXTS.keys()}
-    for sent in sentences:
-        low = sent.lower()
-        for ctx, pats in _CONTEXTS.items():
-            if any(p.search(low) for p in pats):
-                spans[ctx].append(sent)
+    for sent in _split_sentences(raw):
+        for ctx in _sentence_contexts(sent):
+            spans[ctx].append(sent)
     if not any(spans.values()):
         spans["baseline"] = [raw]
     return spans
 
+
 # -----------------------
-# List mentions (triggers/life impact)
+# Per-sentence analysis (shared by tagging and summaries)
+# Each distinct sentence is lowercased/normalized/matched once, whatever the number of
+# contexts it falls in; results are memoized so summaries and repeat inputs reuse them.
 # -----------------------
+_SENTENCE_CACHE_MAX_LEN = 2000  # longer "sentences" are analysed but not memoized
+
+
+@functools.lru_cache(maxsize=4096)
+def _sentence_contexts_cached(sent: str) -> Tuple[str, ...]:
+    low = sent.lower()
+    return tuple(ctx for ctx, pat in _CONTEXT_ANY.items() if pat.search(low))
+
+
+def _sentence_contexts(sent: str) -> Tuple[str, ...]:
+    """Contexts (in CONTEXTS order) whose patterns occur in `sent`."""
+    if len(sent) > _SENTENCE_CACHE_MAX_LEN:
+        return _sentence_contexts_cached.__wrapped__(sent)
+    return _sentence_contexts_cached(sent)
+
+
+Modifier = Tuple[str, str, str]  # (category, "intensity" | "temporality", term)
+ChunkAnalysis = Tuple[int, Tuple[Modifier, ...], Tuple[Correction, ...]]  # (category bitmask, modifiers, corrections)
+
+
+def _scan_graded(norm: str, snap: TaxonomySnapshot) -> Tuple[List[Hit], List[Mention]]:
+    if _MATCHER_BACKEND == "reference":
+        hits = _scan_reference(norm, snap.compiled())
+        mods = sorted((m.start(), m.end(), kind, term) for pat, (kind, term) in snap.modifier_patterns()
+                      for m in pat.finditer(norm))
+        return hits, mods
+    return snap.matcher().scan_graded(norm)
+
+
+def _chunk_analysis_uncached(chunk: str, snap: TaxonomySnapshot) -> ChunkAnalysis:
+    norm = _normalize(chunk)
+    hits, mods = _scan_graded(norm, snap)
+    fuzzy = snap.fuzzy()
+    fixes: List[Tuple[int, int, str, str, int]] = []
+    if fuzzy is not None:
+        # Only words neither matched nor part of a modifier are corrected, so the
+        # exact hits survive the rescan of the corrected text unchanged.
+        fixed, fixes = fuzzy.correct(norm, hits, mods)
+        if fixes:
+            hits, mods = _scan_graded(fixed, snap)
+    cats = _debias_predator_vs_violent(chunk, {mtype for _, _, mtype in hits})
+    return (snap.mask_of(cats), _attach_modifiers(mods, hits, cats) if mods else (),
+            _used_corrections(fixes, hits, mods, cats) if fixes else ())
+
+
+def _chunk_analysis(chunk: str, snap: TaxonomySnapshot) -> ChunkAnalysis:
+    """
+    Debiased metaphor categories of one chunk as a snapshot bitmask, plus the graduation
+    modifiers attached to its hits and any spelling corrections that contributed (see
+    _FuzzyIndex); memoized per snapshot.
+    """
+    return snap.chunk_analysis(chunk)
+
+
+def _used_corrections(fixes: List[Tuple[int, int, str, str, int]], hits: List[Hit],
+                      mods: List[Mention], cats: Set[str]) -> Tuple[Correction, ...]:
+    """Corrections that produced a kept hit (with its categories) or a modifier attached to one."""
+    starts = [f[0] for f in fixes]  # ascending; a correction is a whole word inside any span it touches
+    found: Dict[int, Set[str]] = {}
+    spans = [(s, e, c) for s, e, c in hits if c in cats]
+    if spans:
+        spans += [(s, e, None) for s, e, _, _ in mods]
+    for s, e, category in spans:
+        j = bisect.bisect_left(starts, s)
+        while j < len(starts) and starts[j] < e:
+            cats_found = found.setdefault(j, set())
+            if category is not None:
+                cats_found.add(category)
+            j += 1
+    return tuple(sorted({(fixes[j][2], fixes[j][3], fixes[j][4], tuple(sorted(c)))
+                         for j, c in found.items()}))
+
+
+def _attach_modifiers(mods: List[Mention], hits: List[Hit], cats: Set[str]) -> Tuple[Modifier, ...]:
+    """
+    Attach each graduation modifier to the nearest metaphor hit (character gap; on a tie
+    the hit after it, as in "severe stabbing") among the categories kept.
+    """
+    hits = [h for h in hits if h[2] in cats]
+    if not hits:
+        return ()
+    found = set()
+    for start, end, kind, term in mods:
+        if len(mods) > 1 and any(s <= start and end <= e and (s, e) != (start, end) for s, e, _, _ in mods):
+            continue  # "flare" inside "flare-up" is the same modifier, not a second one
+        if len(hits) == 1:
+            nearest = hits[0]
+        else:
+            nearest = min(hits, key=lambda h: (max(h[0] - end, start - h[1], 0), h[0] < start))
+        found.add((nearest[2], kind, term))
+    return tuple(sorted(found))
 
 
-def _detect_list_mentions(text_norm: str, items: List[str]) -> List[str]:
-    hits = []
-    for item in items:
-        tok = (item or "").strip().lower()
-        if tok and tok in text_norm:
-            hits.append(item)
-    return sorted(set(hits))
+def _mentioned_contexts(text: str, snap: Optional[TaxonomySnapshot] = None) -> Set[str]:
+    """Contexts whose patterns occur anywhere in `text` (reuses the per-sentence memo)."""
+    snap = snap or _SNAPSHOT
+    raw = (text or "").strip()
+    found = {ctx for sent in _split_sentences(raw) for ctx in snap.sentence_contexts(sent)}
+    if "\n" in raw:
+        # Patterns with \s can span a line break, which the sentence split cuts.
+        low = raw.lower()
+        found |= {ctx for ctx, pat in snap.context_patterns().items() if ctx not in found and pat.search(low)}
+    return found
 
 # -----------------------
 # Signals summary
 # -----------------------
 
 
+_AFFECTIVE_HINTS = (
+    "fear", "anxiety", "threat", "loss of control", "powerless", "powerlessness",
+    "hopeless", "worry", "violation", "invasion", "anticipat", "sentience",
+    "identity", "dissociation", "detachment", "stress", "hypervigilance",
+)
+_SENSORY_HINTS = (
+    "inflammation", "irritation", "temperature", "heat", "hot", "burn", "searing",
+    "piercing", "sharp", "localized", "pressure", "tight", "tightening", "constriction",
+    "crush", "heavy", "heaviness", "shock", "zapping", "tingling", "electr", "spasm",
+    "nerve", "neuropath", "tearing", "pulling", "weight", "drag",
+)
+
+
 def _summarize_signals(entailments: dict) -> str:
     items: List[str] = []
     if isinstance(entailments, dict):
@@ -284,25 +1125,20 @@ def _summarize_signals(entailments: dict) -> str:
                 items.extend(vals.get("affective", []) or [])
             elif isinstance(vals, list):
                 items.extend(vals)
-    AFFECTIVE_HINTS = (
-        "fear", "anxiety", "threat", "loss of control", "powerless", "powerlessness",
-        "hopeless", "worry", "violation", "invasion", "anticipat", "sentience",
-        "identity", "dissociation", "detachment", "stress", "hypervigilance",
-    )
-    SENSORY_HINTS = (
-        "inflammation", "irritation", "temperature", "heat", "hot", "burn", "searing",
-        "piercing", "sharp", "localized", "pressure", "tight", "tightening", "constriction",
-        "crush", "heavy", "heaviness", "shock", "zapping", "tingling", "electr", "spasm",
-        "nerve", "neuropath", "tearing", "pulling", "weight", "drag",
-    )
+    # The output only depends on the set of phrases.
+    return _render_signals(frozenset(str(p) for p in items))
+
+
+@functools.lru_cache(maxsize=4096)
+def _render_signals(phrases: FrozenSet[str]) -> str:
     sens, emo = set(), set()
-    for p in items:
-        s = str(p).strip()
+    for p in phrases:
+        s = p.strip()
         if not s:
             continue
         low = s.lower()
-        is_aff = any(k in low for k in AFFECTIVE_HINTS)
-        is_sens = any(k in low for k in SENSORY_HINTS)
+        is_aff = any(k in low for k in _AFFECTIVE_HINTS)
+        is_sens = any(k in low for k in _SENSORY_HINTS)
         if is_aff and not is_sens:
             emo.add(s)
         elif is_sens and not is_aff:
@@ -331,48 +1167,170 @@ def _summarize_signals(entailments: dict) -> str:
 # -----------------------
 
 
-def tag_pain_description(description: Any, name: Optional[str] = None, duration: Optional[str] = None) -> Dict[str, Any]:
+class TagResult:
+    """
+    Compact tagging result: one category bitmask per context (CONTEXTS order), with
+    bits assigned by the snapshot that produced it (`snapshot.categories`). Entailments
+    are looked up by category only when `to_dict()` builds the public dict shape, so
+    large batches can keep results small and combine them with integer ops.
+    `modifiers` holds, per context, the (category, kind, term) graduation modifiers
+    attached to that context's metaphor hits, and `corrections` the misspelt words the
+    optional fuzzy layer corrected into a match (see _FuzzyIndex). In-process only: the snapshot reference is not picklable.
+    """
+
+    __slots__ = ("snapshot", "context_masks", "input", "name", "duration", "triggers", "life_impact",
+                 "modifiers", "corrections")
+
+    def __init__(self, snapshot: TaxonomySnapshot, context_masks: Tuple[int, ...], input: str,
+                 name: Optional[str], duration: Optional[str],
+                 triggers: Tuple[str, ...], life_impact: Tuple[str, ...],
+                 modifiers: Tuple[Tuple[Modifier, ...], ...] = (),
+                 corrections: Tuple[Correction, ...] = ()):
+        self.snapshot = snapshot
+        self.context_masks = context_masks
+        self.input = input
+        self.name = name
+        self.duration = duration
+        self.triggers = triggers
+        self.life_impact = life_impact
+        self.modifiers = modifiers or ((),) * len(context_masks)
+        self.corrections = corrections
+
+    @property
+    def matched_mask(self) -> int:
+        mask = 0
+        for m in self.context_masks:
+            mask |= m
+        return mask
+
+    def mask(self, context: Optional[str] = None) -> int:
+        """Category bitmask of one context, or of all contexts combined."""
+        if context is None:
+            return self.matched_mask
+        return self.context_masks[_CONTEXT_INDEX[context]]
+
+    def categories(self, context: Optional[str] = None) -> Tuple[str, ...]:
+        return self.snapshot.names_of(self.mask(context))
+
+    def modifiers_by_context(self) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+        """{context: {category: {"intensity": [...], "temporality": [...]}}}, non-empty entries only."""
+        out: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+        for ctx, mods in zip(CONTEXTS, self.modifiers):
+            for category, kind, term in mods:
+                kinds = out.setdefault(ctx, {}).setdefault(category, {k: [] for k in MODIFIER_KINDS})
+                kinds[kind].append(term)
+        return out
+
+    def to_dict(self, observer: Optional[StageObserver] = None) -> Dict[str, Any]:
+        """The tag_pain_description dict shape (fresh dicts/lists on every call)."""
+        names_of = self.snapshot.names_of
+        matched_by_context = {ctx: list(names_of(m)) for ctx, m in zip(CONTEXTS, self.context_masks) if m}
+        matched = names_of(self.matched_mask)
+        t0 = time.perf_counter()
+        entailments = {mtype: _get_entailments(mtype) for mtype in matched}
+        if observer is not None:
+            observer("entailment_lookup", time.perf_counter() - t0)
+        return {
+            "matched_metaphors": {m: True for m in matched},
+            "matched_by_context": matched_by_context,
+            "entailments": entailments,
+            "user_info": {"name": self.name, "duration": self.duration},
+            "input": self.input,
+            "extras": {
+                "triggers_detected": list(self.triggers),
+                "life_impact_detected": list(self.life_impact),
+                "modifiers_by_context": self.modifiers_by_context(),
+                "spelling_corrections": [
+                    {"typed": typed, "term": term, "distance": distance, "categories": list(cats)}
+                    for typed, term, distance, cats in self.corrections],
+            },
+            "taxonomy_version": self.snapshot.version,
+            "locale": self.snapshot.locale,
+        }
+
+
+_CONTEXT_INDEX: Dict[str, int] = {ctx: i for i, ctx in enumerate(CONTEXTS)}
+
+
+def tag_pain_result(description: Any, name: Optional[str] = None, duration: Optional[str] = None,
+                    sentence_cache: Optional[Dict[str, Any]] = None,
+                    snapshot: Optional[TaxonomySnapshot] = None,
+                    observer: Optional[StageObserver] = None) -> TagResult:
+    """
+    tag_pain_description without building the dict; see TagResult.
+    sentence_cache: optional caller-owned dict (e.g. a live editing session) holding
+    per-sentence results, so re-tagging an edited text only matches changed sentences.
+    snapshot: a locale pack's snapshot; defaults to the current (English) taxonomy.
+    observer: called with the span_finding and metaphor_matching durations.
+    """
+    snap = snapshot or _SNAPSHOT  # one consistent taxonomy for the whole call
     raw = (description or "").strip() if isinstance(
         description, str) else _normalize(description)
-    norm = _normalize(raw)
-    spans = _find_spans(raw)
-
-    matched_by_context: Dict[str, List[str]] = {}
-    global_matched: Set[str] = set()
-    entailments: Dict[str, Dict[str, List[str]]] = {}
-
-    for ctx, chunks in spans.items():
-        ctx_found: Set[str] = set()
-        for chunk in chunks:
-            cats = _match_metaphors_in(_normalize(chunk))
-            cats = _debias_predator_vs_violent(chunk, cats)
-            ctx_found |= cats
-        if ctx_found:
-            matched_by_context[ctx] = sorted(ctx_found)
-            global_matched |= ctx_found
-
-    for mtype in sorted(global_matched):
-        entailments[mtype] = _get_entailments(mtype)
-
-    triggers_detected = _detect_list_mentions(
-        norm, TRIGGERS) if TRIGGERS else []
-    life_impact_detected = _detect_list_mentions(
-        norm, LIFE_IMPACT) if LIFE_IMPACT else []
 
-    return {
-        "matched_metaphors": {m: True for m in sorted(global_matched)},
-        "matched_by_context": matched_by_context,
-        "entailments": entailments,
-        "user_info": {
-            "name": name.strip() if isinstance(name, str) and name.strip() else None,
-            "duration": duration.strip() if isinstance(duration, str) and duration.strip() else None,
-        },
-        "input": raw,
-        "extras": {
-            "triggers_detected": triggers_detected,
-            "life_impact_detected": life_impact_detected,
-        },
-    }
+    # Same result as running _find_spans and matching every span, but each distinct
+    # sentence is matched once however many contexts it belongs to. Graduation
+    # modifiers come out of the same match and go wherever the sentence's categories go.
+    masks = [0] * len(CONTEXTS)
+    modifiers: List[Set[Modifier]] = [set() for _ in CONTEXTS]
+    corrections: Set[Correction] = set()
+    any_context = False
+    clock = time.perf_counter
+    t_match = 0.0
+    t0 = clock()
+    for sent in _split_sentences(raw):
+        cached = sentence_cache.get(sent) if sentence_cache is not None else None
+        if cached is not None and cached[0] == snap.version:
+            ctxs, (mask, mods, fixes) = cached[1], cached[2]
+        else:
+            ctxs = snap.sentence_contexts(sent)
+            t2 = clock()
+            mask, mods, fixes = _chunk_analysis(sent, snap) if ctxs else (0, (), ())
+            t_match += clock() - t2
+            if sentence_cache is not None:
+                sentence_cache[sent] = (snap.version, ctxs, (mask, mods, fixes))
+        if ctxs:
+            any_context = True
+            corrections.update(fixes)
+            for ctx in ctxs:
+                i = _CONTEXT_INDEX[ctx]
+                masks[i] |= mask
+                modifiers[i].update(mods)
+    if not any_context:
+        # No context cue anywhere: the whole text counts as baseline.
+        t2 = clock()
+        i = _CONTEXT_INDEX["baseline"]
+        masks[i], mods, fixes = _chunk_analysis(raw, snap)
+        modifiers[i].update(mods)
+        corrections.update(fixes)
+        t_match += clock() - t2
+    # Span finding = splitting + context detection; the loop's own overhead counts there too.
+    if observer is not None:
+        observer("span_finding", clock() - t0 - t_match)
+        observer("metaphor_matching", t_match)
+
+    triggers: Set[str] = set()
+    life_impact: Set[str] = set()
+    for kind, item in snap.mentions().find(_normalize(raw)):
+        if kind == "trigger":
+            triggers.add(item)
+        elif kind == "life_impact":
+            life_impact.add(item)
+
+    return TagResult(
+        snap, tuple(masks), raw,
+        name.strip() if isinstance(name, str) and name.strip() else None,
+        duration.strip() if isinstance(duration, str) and duration.strip() else None,
+        tuple(sorted(triggers)), tuple(sorted(life_impact)),
+        tuple(tuple(sorted(m)) for m in modifiers),
+        tuple(sorted(corrections)),
+    )
+
+
+def tag_pain_description(description: Any, name: Optional[str] = None, duration: Optional[str] = None,
+                         sentence_cache: Optional[Dict[str, Any]] = None,
+                         snapshot: Optional[TaxonomySnapshot] = None,
+                         observer: Optional[StageObserver] = None) -> Dict[str, Any]:
+    return tag_pain_result(description, name, duration, sentence_cache, snapshot, observer).to_dict(observer)
 
 
 CLINICAL_REPHRASINGS: Dict[str, str] = {
@@ -392,71 +1350,99 @@ CLINICAL_REPHRASINGS: Dict[str, str] = {
 }
 
 
-def generate_patient_summary(results: Dict[str, Any]) -> str:
-    if not isinstance(results, dict):
-        return "You're living with pain that holds deep meaning."
-    matched_global = results.get("matched_metaphors", {})
-    matched_ctx = results.get("matched_by_context", {})
-    input_text = (results.get("input") or "")
-    low_input = input_text.lower()
-    name = (results.get("user_info", {}).get("name")) or "You"
-    duration = results.get("user_info", {}).get("duration")
+# -----------------------
+# Summary rendering
+# -----------------------
+# Summaries depend on the match signature (contexts x categories, entailment
+# phrases), which takes few distinct values. Each fragment is memoized by that
+# signature; only the name/duration intro is formatted per call.
+
+_SUMMARY_CONTEXT_ORDER = ("menstruation", "ovulation", "intercourse", "defecation", "baseline")
+_SUMMARY_LABELS = {
+    "menstruation": "**During menstruation**",
+    "ovulation": "**During ovulation**",
+    "intercourse": "**During intercourse**",
+    "defecation": "**When going to the toilet**",
+    "baseline": "**The rest of the month**",
+}
+_PATIENT_PRIORITY = (
+    "heat", "cutting_tools", "constriction_pressure", "electric_force",
+    "weight_burden", "birth_labour", "internal_machinery", "lingering_force",
+    "predator", "entrapment", "transformation_distortion", "violent_action",
+)
 
-    if not matched_global:
-        return f"{name}, you're living with pain that holds deep meaning. No specific metaphor patterns were identified this time."
+ContextSignature = Tuple[Tuple[str, Tuple[Any, ...]], ...]
+
+
+def _context_signature(matched_ctx: Any) -> ContextSignature:
+    if not isinstance(matched_ctx, dict):
+        return ()
+    return tuple((ctx, tuple(cats or ())) for ctx, cats in matched_ctx.items())
 
-    intro = f"{name}, you're living with pain that holds deep meaning."
-    if duration:
-        intro += f" You've been experiencing this for {duration.strip()}."
-    lines = [intro, ""]
-
-    order = ["menstruation", "ovulation",
-             "intercourse", "defecation", "baseline"]
-    labels = {
-        "menstruation": "**During menstruation**",
-        "ovulation": "**During ovulation**",
-        "intercourse": "**During intercourse**",
-        "defecation": "**When going to the toilet**",
-        "baseline": "**The rest of the month**",
-    }
 
-    for ctx in order:
-        cats = matched_ctx.get(ctx, [])
+def _memoized(fn: Callable, *key: Any) -> Any:
+    """fn(*key) through its lru_cache, or directly when the key is unhashable."""
+    try:
+        return fn(*key)
+    except TypeError:
+        return fn.__wrapped__(*key)
+
+
+@functools.lru_cache(maxsize=4096)
+def _render_patient_body(ctx_sig: ContextSignature, mentioned_empty: FrozenSet[str],
+                         rephrasings: Optional[Tuple[Tuple[str, str], ...]] = None) -> str:
+    matched_ctx = dict(ctx_sig)
+    phrases = CLINICAL_REPHRASINGS if rephrasings is None else {**CLINICAL_REPHRASINGS, **dict(rephrasings)}
+    lines: List[str] = []
+    for ctx in _SUMMARY_CONTEXT_ORDER:
+        cats = matched_ctx.get(ctx, ())
         if not cats:
-            for pat in _CONTEXTS.get(ctx, []):
-                if pat.search(low_input):
-                    lines.append(
-                        f"{labels[ctx]}: You mentioned this, and it matters—even if no specific patterns were detected here today.")
-                    break
+            if ctx in mentioned_empty:
+                lines.append(
+                    f"{_SUMMARY_LABELS[ctx]}: You mentioned this, and it matters—even if no specific patterns were detected here today.")
             continue
-
-        PRIORITY = [
-            "heat", "cutting_tools", "constriction_pressure", "electric_force",
-            "weight_burden", "birth_labour", "internal_machinery", "lingering_force",
-            "predator", "entrapment", "transformation_distortion", "violent_action",
-        ]
         chosen = None
-        for key in PRIORITY:
-            if key in cats and key in CLINICAL_REPHRASINGS:
-                chosen = CLINICAL_REPHRASINGS[key]
+        for key in _PATIENT_PRIORITY:
+            if key in cats and key in phrases:
+                chosen = phrases[key]
                 break
         if not chosen:
             human = ", ".join(c.replace("_", " ") for c in cats[:3])
             chosen = f"You describe {human} sensations."
-        lines.append(f"{labels[ctx]}: {chosen}")
-
+        lines.append(f"{_SUMMARY_LABELS[ctx]}: {chosen}")
     return "\n".join(lines)
 
 
-def generate_doctor_summary(results: Dict[str, Any]) -> str:
+def generate_patient_summary(results: Dict[str, Any], snapshot: Optional[TaxonomySnapshot] = None) -> str:
+    """`snapshot`: the locale pack snapshot `results` came from (context patterns, rephrasings)."""
     if not isinstance(results, dict):
-        return "Here is a clinical summary based on your description:\n\n🩺 *Note*: These metaphor-based interpretations are not diagnostic."
+        return "You're living with pain that holds deep meaning."
     matched_global = results.get("matched_metaphors", {})
     matched_ctx = results.get("matched_by_context", {})
+    input_text = (results.get("input") or "")
+    name = (results.get("user_info", {}).get("name")) or "You"
+    duration = results.get("user_info", {}).get("duration")
+
     if not matched_global:
-        return ("Your description contains no specific metaphorical patterns that align with known symptom clusters. "
-                "However, the language used reflects a complex experience of pain that should be discussed with a healthcare provider for further evaluation.")
-    out: List[str] = ["Here is a clinical summary based on your description:\n"]
+        return f"{name}, you're living with pain that holds deep meaning. No specific metaphor patterns were identified this time."
+
+    intro = f"{name}, you're living with pain that holds deep meaning."
+    if duration:
+        intro += f" You've been experiencing this for {duration.strip()}."
+
+    ctx_sig = _context_signature(matched_ctx)
+    present = {ctx for ctx, cats in ctx_sig if cats}
+    mentioned_empty: FrozenSet[str] = frozenset()
+    if any(ctx not in present for ctx in _SUMMARY_CONTEXT_ORDER):
+        mentioned_empty = frozenset(_mentioned_contexts(input_text, snapshot) - present)
+    body = _memoized(_render_patient_body, ctx_sig, mentioned_empty, snapshot and snapshot.rephrasings)
+    return f"{intro}\n\n{body}" if body else f"{intro}\n"
+
+
+@functools.lru_cache(maxsize=4096)
+def _render_doctor_sections(ctx_sig: ContextSignature) -> Tuple[str, ...]:
+    matched_ctx = dict(ctx_sig)
+    out: List[str] = []
 
     if "ovulation" in matched_ctx:
         if any(m in matched_ctx["ovulation"] for m in ("constriction_pressure", "cutting_tools", "violent_action", "electric_force")):
@@ -485,8 +1471,13 @@ def generate_doctor_summary(results: Dict[str, Any]) -> str:
             out.append("**Chronic baseline pain**")
             out.append(
                 "Persistent, lurking/heavy metaphors point to chronic inflammation with anticipatory distress.\n")
+    return tuple(out)
 
-    signals = _summarize_signals(results.get("entailments", {}))
+
+@functools.lru_cache(maxsize=4096)
+def _render_doctor_summary(ctx_sig: ContextSignature, signals: str) -> str:
+    out: List[str] = ["Here is a clinical summary based on your description:\n"]
+    out.extend(_render_doctor_sections(ctx_sig))
     if signals:
         out.extend(
             ["", "**Interpretive signals** (from metaphor entailments):", signals, ""])
@@ -495,6 +1486,32 @@ def generate_doctor_summary(results: Dict[str, Any]) -> str:
     return "\n".join(out)
 
 
+def generate_doctor_summary(results: Dict[str, Any]) -> str:
+    if not isinstance(results, dict):
+        return "Here is a clinical summary based on your description:\n\n🩺 *Note*: These metaphor-based interpretations are not diagnostic."
+    matched_global = results.get("matched_metaphors", {})
+    matched_ctx = results.get("matched_by_context", {})
+    if not matched_global:
+        return ("Your description contains no specific metaphorical patterns that align with known symptom clusters. "
+                "However, the language used reflects a complex experience of pain that should be discussed with a healthcare provider for further evaluation.")
+    signals = _summarize_signals(results.get("entailments", {}))
+    return _memoized(_render_doctor_summary, _context_signature(matched_ctx), signals)
+
+
+@functools.lru_cache(maxsize=4096)
+def _render_entailment_summary(ent_sig: Tuple[Tuple[Any, Tuple[Any, ...], Tuple[Any, ...]], ...]) -> str:
+    lines = [" Clinical interpretations based on metaphor entailments:\n"]
+    for mtype, exp, aff in ent_sig:
+        if exp:
+            lines.append(
+                f"• **{mtype}** – Experiential entailments: {', '.join(exp)}")
+        if aff:
+            lines.append(f"  – Affective entailments: {', '.join(aff)}")
+    lines.append(
+        "\nThese interpretations can support shared understanding between patients and clinicians.")
+    return "\n".join(lines)
+
+
 def generate_entailment_summary(obj: Dict[str, Any]) -> str:
     mapping: Dict[str, Dict[str, List[str]]] = {}
     if isinstance(obj, dict):
@@ -507,18 +1524,9 @@ def generate_entailment_summary(obj: Dict[str, Any]) -> str:
             mapping = obj.get("entailments", {})  # type: ignore
     if not mapping:
         return "No experiential or affective entailments were found."
-    lines = [" Clinical interpretations based on metaphor entailments:\n"]
-    for mtype, vals in mapping.items():
-        exp = vals.get("experiential", []) or []
-        aff = vals.get("affective", []) or []
-        if exp:
-            lines.append(
-                f"• **{mtype}** – Experiential entailments: {', '.join(exp)}")
-        if aff:
-            lines.append(f"  – Affective entailments: {', '.join(aff)}")
-    lines.append(
-        "\nThese interpretations can support shared understanding between patients and clinicians.")
-    return "\n".join(lines)
+    ent_sig = tuple((mtype, tuple(vals.get("experiential", []) or ()), tuple(vals.get("affective", []) or ()))
+                    for mtype, vals in mapping.items())
+    return _memoized(_render_entailment_summary, ent_sig)
 
 
 def generate_doctor_narrative(results: Dict[str, Any]) -> str:
@@ -527,10 +1535,18 @@ def generate_doctor_narrative(results: Dict[str, Any]) -> str:
 
 __all__ = [
     "tag_pain_description",
+    "tag_pain_result",
+    "TagResult",
     "generate_patient_summary",
     "generate_doctor_summary",
     "generate_doctor_narrative",
     "generate_entailment_summary",
     "reload_taxonomy",
-    "METAPHOR_TYPES", "GRADUATION", "TRIGGERS", "LIFE_IMPACT",
+    "on_taxonomy_reload",
+    "get_snapshot",
+    "TaxonomySnapshot",
+    "compare_matcher_backends",
+    "build_lexicon",
+    "taxonomy_hash",
+    "METAPHOR_TYPES", "GRADUATION", "TRIGGERS", "LIFE_IMPACT", "CONTEXTS", "MODIFIER_KINDS",
 ]
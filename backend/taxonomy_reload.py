@@ -0,0 +1,256 @@
+# taxonomy_reload.py — live taxonomy updates without restarting workers
+# Recompiles in a background thread and lets tagger_logic.reload_taxonomy swap the snapshot.
+#
+# A snapshot lives in one process, so a reload posted to /admin/taxonomy/reload is
+# shared through TAXONOMY_PUBLISHED (default <tmp>/emp-<uid>/taxonomy.json, in a 0700
+# directory this user owns; publication is off if that can't be had): the worker that
+# took the POST writes the taxonomy there once it compiled, and every worker's watcher
+# picks it up within TAXONOMY_WATCH_INTERVAL seconds. The master loads it at import, so
+# recycled workers start with it too. A reload from taxonomy.py removes the file. The
+# file records the taxonomy.py it replaced and is ignored (and removed) once taxonomy.py
+# itself has changed, e.g. by a deploy.
+
+from __future__ import annotations
+import importlib
+import json
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    from . import taxonomy as _taxonomy_module
+    from .tagger_logic import get_snapshot, reload_taxonomy, taxonomy_hash
+except ImportError:
+    import taxonomy as _taxonomy_module  # type: ignore
+    from tagger_logic import get_snapshot, reload_taxonomy, taxonomy_hash  # type: ignore
+
+TAXONOMY_FILE = os.path.abspath(_taxonomy_module.__file__)
+
+
+def _private_published_file() -> Optional[str]:
+    """
+    <tmp>/emp-<uid>/taxonomy.json, in a directory only this user can write (anyone who
+    can write the file can change what every worker serves). None, with a warning, if
+    the directory exists but belongs to someone else or is open to other users.
+    """
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    directory = os.path.join(tempfile.gettempdir(), f"emp-{uid if uid is not None else 'app'}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        print(f"[WARN] taxonomy publication disabled: {e}", file=sys.stderr)
+        return None
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or (uid is not None and st.st_uid != uid) or st.st_mode & 0o077:
+        print(f"[WARN] taxonomy publication disabled: {directory} is not a private directory "
+              f"owned by this user; set TAXONOMY_PUBLISHED.", file=sys.stderr)
+        return None
+    return os.path.join(directory, "taxonomy.json")
+
+
+PUBLISHED_FILE: Optional[str] = os.getenv("TAXONOMY_PUBLISHED") or _private_published_file()
+
+_status_lock = threading.Lock()
+_status: Dict[str, Any] = {"reloading": False, "last_error": None, "last_reload_at": None}
+
+
+def load_taxonomy_file() -> Dict[str, Any]:
+    """Re-execute taxonomy.py from disk and return its `taxonomy` dict."""
+    module = importlib.reload(_taxonomy_module)
+    return module.taxonomy
+
+
+# -----------------------
+# Published taxonomy (shared by all worker processes)
+# -----------------------
+def publish(tax: Dict[str, Any], path: Optional[str] = PUBLISHED_FILE) -> None:
+    if path is None:
+        return
+    record = {"base_hash": taxonomy_hash(_taxonomy_module.taxonomy), "taxonomy": tax}
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(record, fh, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def unpublish(path: Optional[str] = PUBLISHED_FILE) -> None:
+    if path is None:
+        return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def read_published(path: Optional[str] = PUBLISHED_FILE) -> Optional[Dict[str, Any]]:
+    """The published taxonomy, or None (no file, unreadable, or published over an older taxonomy.py)."""
+    if path is None:
+        return None
+    try:
+        with open(path, encoding="utf-8") as fh:
+            record = json.load(fh)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[WARN] ignoring published taxonomy {path}: {e}", file=sys.stderr)
+        return None
+    tax = record.get("taxonomy") if isinstance(record, dict) else None
+    if not isinstance(tax, dict) or not isinstance(tax.get("metaphor_types"), dict):
+        print(f"[WARN] ignoring published taxonomy {path}: no 'metaphor_types'.", file=sys.stderr)
+        return None
+    if record.get("base_hash") != taxonomy_hash(_taxonomy_module.taxonomy):
+        print(f"[WARN] taxonomy.py changed since {path} was published; using taxonomy.py.", file=sys.stderr)
+        unpublish(path)
+        return None
+    return tax
+
+
+def load_published(path: Optional[str] = PUBLISHED_FILE) -> bool:
+    """At startup: install the published taxonomy if there is one; True if it was installed."""
+    tax = read_published(path)
+    if tax is None or taxonomy_hash(tax) == get_snapshot().source_hash:
+        return False
+    try:
+        reload_taxonomy(tax)
+    except Exception as e:
+        print(f"[WARN] published taxonomy {path} failed to compile: {e}", file=sys.stderr)
+        return False
+    return True
+
+
+# -----------------------
+# Background reloads
+# -----------------------
+def _reload_worker(new_taxonomy: Optional[Dict[str, Any]], share: bool, only_if_changed: bool) -> None:
+    try:
+        tax = new_taxonomy if new_taxonomy is not None else load_taxonomy_file()
+        if only_if_changed and taxonomy_hash(tax) == get_snapshot().source_hash:
+            return
+        snap = reload_taxonomy(tax)
+        if share:
+            if new_taxonomy is not None:
+                publish(tax)
+            else:
+                unpublish()
+        with _status_lock:
+            _status.update(last_error=None, last_reload_at=time.time())
+        print(f"[INFO] taxonomy reloaded (version {snap.version}).", file=sys.stderr)
+    except Exception as e:
+        with _status_lock:
+            _status["last_error"] = str(e)
+        print(f"[WARN] taxonomy reload failed: {e}", file=sys.stderr)
+    finally:
+        with _status_lock:
+            _status["reloading"] = False
+
+
+def reload_in_background(new_taxonomy: Optional[Dict[str, Any]] = None, share: bool = False,
+                         only_if_changed: bool = False) -> bool:
+    """
+    Start a background recompile (from `new_taxonomy`, or taxonomy.py when None).
+    Returns False if one is already running. Requests keep using the current snapshot
+    until the new one is fully built. `share`: once it compiled, publish it to the
+    other worker processes (or withdraw the published one for a taxonomy.py reload).
+    """
+    with _status_lock:
+        if _status["reloading"]:
+            return False
+        _status["reloading"] = True
+    threading.Thread(target=_reload_worker, args=(new_taxonomy, share, only_if_changed),
+                     name="taxonomy-reload", daemon=True).start()
+    return True
+
+
+def status() -> Dict[str, Any]:
+    snap = get_snapshot()
+    with _status_lock:
+        return {"version": snap.version, "source_hash": snap.source_hash,
+                "published": PUBLISHED_FILE is not None and os.path.exists(PUBLISHED_FILE), **_status}
+
+
+class TaxonomyWatcher(threading.Thread):
+    """
+    Polls the published taxonomy file and, with `watch_source`, taxonomy.py's mtime;
+    reloads in the background when either changes. A published taxonomy takes
+    precedence over edits to taxonomy.py.
+    """
+
+    def __init__(self, path: str = TAXONOMY_FILE, interval: float = 2.0,
+                 published: Optional[str] = PUBLISHED_FILE, watch_source: bool = True):
+        super().__init__(name="taxonomy-watcher", daemon=True)
+        self.path = path
+        self.published = published
+        self.watch_source = watch_source
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._mtime = self._current_mtime(path)
+        self._published_mtime: Optional[float] = -1.0  # never seen: compare on the first poll
+
+    @staticmethod
+    def _current_mtime(path: Optional[str]) -> Optional[float]:
+        if path is None:
+            return None
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _sync_published(self) -> bool:
+        tax = read_published(self.published)
+        if tax is None:
+            # Withdrawn (or never published): back to taxonomy.py unless already on it.
+            return reload_in_background(only_if_changed=True)
+        return reload_in_background(tax, only_if_changed=True)
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            published = self._current_mtime(self.published)
+            if published != self._published_mtime:
+                if self._sync_published():
+                    self._published_mtime = published
+                continue
+            if not self.watch_source or published is not None:
+                continue
+            mtime = self._current_mtime(self.path)
+            if mtime is not None and mtime != self._mtime:
+                if reload_in_background():
+                    self._mtime = mtime
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+_watcher: Optional[TaxonomyWatcher] = None
+
+
+def start_watcher(interval: float = 2.0, watch_source: bool = True) -> TaxonomyWatcher:
+    global _watcher
+    if _watcher is None or not _watcher.is_alive():
+        _watcher = TaxonomyWatcher(interval=interval, watch_source=watch_source)
+        _watcher.start()
+    return _watcher
+
+
+def start_watcher_from_env() -> Optional[TaxonomyWatcher]:
+    """
+    Start the watcher if TAXONOMY_WATCH is set (taxonomy.py and published taxonomies) or
+    ADMIN_TOKEN is (published taxonomies only). Threads don't survive fork(), so a
+    preloaded gunicorn master's watcher has to be started again in every worker.
+    """
+    watch_source = os.getenv("TAXONOMY_WATCH", "").lower() in ("1", "true", "yes", "on")
+    if watch_source or os.getenv("ADMIN_TOKEN"):
+        return start_watcher(float(os.getenv("TAXONOMY_WATCH_INTERVAL", "2")), watch_source)
+    return None
@@ -0,0 +1,172 @@
+# warmup.py — build everything once in a preloaded master, before gunicorn forks workers
+#
+#   gunicorn -c gunicorn.conf.py backend.app:app      (calls warm() + freeze() in when_ready)
+#   python -m backend.warmup run                       (time the warmup, memory before/after)
+#   python -m backend.warmup memory <master pid>       (RSS / shared / private per worker)
+#
+# Workers inherit the master's memory copy-on-write. Anything built lazily (matcher
+# tables, regexes, prerendered pages, Jinja templates) would otherwise be built again
+# in every worker, and the cyclic GC touching inherited objects un-shares their pages.
+# warm() builds it all up front; freeze() moves what exists into the GC's permanent
+# generation so collections in the workers leave it alone.
+
+import argparse
+import gc
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    from . import locales, metrics, wire
+    from .tagger_logic import CONTEXTS, get_snapshot
+except ImportError:
+    import locales  # type: ignore
+    import metrics  # type: ignore
+    import wire  # type: ignore
+    from tagger_logic import CONTEXTS, get_snapshot  # type: ignore
+
+WARMUP_PAGES = ("/", "/taxonomy.json", "/samples", "/evidence")
+
+# Lead-ins that put a sentence in each context (see tagger_logic._CONTEXT_PATTERNS_RAW).
+_CONTEXT_LEADS = {
+    "menstruation": "During my period",
+    "ovulation": "Around ovulation",
+    "intercourse": "During sex",
+    "defecation": "When going to the toilet",
+    "baseline": "Most days",
+}
+
+
+def sample_descriptions(limit: Optional[int] = None) -> List[str]:
+    """
+    A few descriptions built from the live taxonomy: every category, every context,
+    modifiers, triggers and life-impact clues, so each code path runs at least once.
+    """
+    snap = get_snapshot()
+    exprs = [e for spec in snap.metaphor_types.values() for e in (spec or {}).get("expressions", [])[:1]]
+    if not exprs:
+        return []
+    modifiers = list(snap.graduation) or [""]
+    clues = list(snap.life_impact) or [""]
+    out = []
+    for i, ctx in enumerate(CONTEXTS):
+        lead = _CONTEXT_LEADS.get(ctx, ctx)
+        picks = [exprs[(i + k) % len(exprs)] for k in range(0, len(exprs), len(CONTEXTS))]
+        out.append(f"{lead} it is {modifiers[i % len(modifiers)]} {picks[0]}. "
+                   + ". ".join(f"{lead} like {p}" for p in picks[1:])
+                   + f". Overall I feel {clues[i % len(clues)]}.")
+    out.append(" ".join(exprs))  # no context cue: the whole text is baseline
+    return out[:limit] if limit else out
+
+
+def warm(app, analyses: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Compile the taxonomy snapshot and the LOCALE_WARMUP packs, prerender the pages and
+    run sample analyses through the full payload/serialisation path. Warmup traffic is
+    then dropped from the metrics and the result cache, so workers start with clean counters.
+    """
+    t0 = time.perf_counter()
+    get_snapshot().warm()
+    try:
+        from . import app as app_module
+    except ImportError:
+        import app as app_module  # type: ignore
+
+    packs = app_module.LOCALES.warm(locales.warmup_codes())
+    for code, status in packs.items():
+        if status != "ok":
+            print(f"[WARN] LOCALE_WARMUP {code}: {status}", file=sys.stderr)
+
+    client = app.test_client()
+    pages = {path: client.get(path, headers={"Accept-Encoding": "gzip, br"}).status_code
+             for path in WARMUP_PAGES}
+
+    texts = sample_descriptions(analyses)
+    for text in texts:
+        payload = app_module._build_payload(app_module.normalize_triggers(text), "", "")
+        for view in wire.VIEWS:
+            shaped = wire.shape(payload, wire.requested_fields(view))
+            wire.encode(wire.to_ids(shaped, get_snapshot().categories, CONTEXTS, "warmup"))
+
+    app_module.RESULT_CACHE.clear()
+    metrics.REGISTRY.reset()
+    return {"seconds": round(time.perf_counter() - t0, 3), "pages": pages, "analyses": len(texts),
+            "locales": packs}
+
+
+def freeze() -> int:
+    """Collect once, then exempt every surviving object from future collections; returns how many."""
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+# -----------------------
+# Memory report
+# -----------------------
+
+
+def _children(pid: int) -> List[int]:
+    kids: List[int] = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children", encoding="ascii") as fh:
+                kids.extend(int(c) for c in fh.read().split())
+    except OSError:
+        pass
+    return sorted(set(kids))
+
+
+def memory_report(master_pid: int) -> List[Dict[str, Any]]:
+    """One row per process (the master, then its workers) with process_memory() fields."""
+    rows = []
+    for role, pid in [("master", master_pid)] + [("worker", p) for p in _children(master_pid)]:
+        mem = metrics.process_memory(str(pid))
+        if mem:
+            rows.append({"role": role, "pid": pid, **mem})
+    return rows
+
+
+def _print_report(rows: List[Dict[str, Any]]) -> None:
+    mib = 1024 * 1024
+    print(f"{'role':8} {'pid':>8} {'rss MiB':>9} {'pss MiB':>9} {'shared MiB':>11} {'private MiB':>12}")
+    for r in rows:
+        print(f"{r['role']:8} {r['pid']:>8} {r['rss'] / mib:9.1f} {r['pss'] / mib:9.1f} "
+              f"{r['shared'] / mib:11.1f} {r['private'] / mib:12.1f}")
+    if rows:
+        print(f"total PSS {sum(r['pss'] for r in rows) / mib:.1f} MiB over {len(rows)} process(es)")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m backend.warmup")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("run", help="warm up in this process and print timings and memory")
+    mem = sub.add_parser("memory", help="per-process memory of a gunicorn master and its workers")
+    mem.add_argument("pid", type=int, help="gunicorn master pid")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "memory":
+        rows = memory_report(args.pid)
+        if not rows:
+            print(f"No /proc/<pid>/smaps_rollup for pid {args.pid} (Linux only).", file=sys.stderr)
+            return 1
+        _print_report(rows)
+        return 0
+
+    try:
+        from .app import app
+    except ImportError:
+        from app import app  # type: ignore
+    before = metrics.process_memory()
+    report = warm(app)
+    report["frozen_objects"] = freeze()
+    print(report)
+    after = metrics.process_memory()
+    if before and after:
+        print(f"RSS {before['rss'] / 1048576:.1f} -> {after['rss'] / 1048576:.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# wire.py — response shaping and encodings for /analyze.json (and batch rows)
+#   view=minimal|patient|clinician|full   or   fields=patient,matched_by_context,...
+#   encoding=ids       categories/contexts as bitmasks (bit i = /taxonomy.json "categories"[i])
+#   format=msgpack     or Accept: application/msgpack (needs the msgpack package)
+# JSON goes through orjson when it is installed, else the stdlib.
+
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # optional: stdlib json
+    orjson = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # optional: JSON only
+    msgpack = None
+
+
+class ShapeError(ValueError):
+    """Unknown view, field, encoding or format requested by the client."""
+
+
+class UnsupportedFormat(ShapeError):
+    """A known format this server can't produce (optional package missing)."""
+
+
+def _results(p: Dict[str, Any]) -> Dict[str, Any]:
+    return p.get("results") or {}
+
+
+def _extras(p: Dict[str, Any]) -> Dict[str, Any]:
+    return _results(p).get("extras") or {}
+
+
+# Flat field name -> where it lives in the full /analyze.json payload.
+FIELDS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "ok": lambda p: p.get("ok"),
+    "patient": lambda p: p.get("patient"),
+    "doctor": lambda p: p.get("doctor"),
+    "entailments": lambda p: p.get("entailments"),  # the entailment summary text
+    "results": lambda p: p.get("results"),
+    "matched_metaphors": lambda p: _results(p).get("matched_metaphors"),
+    "matched_by_context": lambda p: _results(p).get("matched_by_context"),
+    "entailment_map": lambda p: _results(p).get("entailments"),
+    "triggers_detected": lambda p: _extras(p).get("triggers_detected"),
+    "life_impact_detected": lambda p: _extras(p).get("life_impact_detected"),
+    "modifiers_by_context": lambda p: _extras(p).get("modifiers_by_context"),
+    "spelling_corrections": lambda p: _extras(p).get("spelling_corrections"),
+    "user_info": lambda p: _results(p).get("user_info"),
+    "input": lambda p: _results(p).get("input"),
+    "taxonomy_version": lambda p: _results(p).get("taxonomy_version"),
+    "locale": lambda p: _results(p).get("locale"),
+}
+
+VIEWS: Dict[str, Optional[Tuple[str, ...]]] = {
+    "full": None,  # the payload as-is
+    "minimal": ("ok", "matched_by_context", "triggers_detected", "life_impact_detected", "taxonomy_version"),
+    "patient": ("ok", "patient"),
+    "clinician": ("ok", "doctor", "entailments", "matched_by_context", "modifiers_by_context",
+                  "spelling_corrections", "triggers_detected", "life_impact_detected", "taxonomy_version"),
+}
+
+ENCODINGS = ("names", "ids")
+FORMATS = ("json", "msgpack")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def requested_fields(view: str = "", fields: str = "") -> Optional[Tuple[str, ...]]:
+    """Field list for a view or comma-separated fields (fields wins); None = full payload."""
+    if fields:
+        names = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = [f for f in names if f not in FIELDS]
+        if unknown:
+            raise ShapeError(f"Unknown field(s): {', '.join(unknown)}. Known: {', '.join(FIELDS)}.")
+        return ("ok",) + tuple(f for f in names if f != "ok")
+    view = view or "full"
+    if view not in VIEWS:
+        raise ShapeError(f"Unknown view '{view}'. Use one of: {', '.join(VIEWS)}.")
+    return VIEWS[view]
+
+
+def shape(payload: Dict[str, Any], wanted: Optional[Sequence[str]]) -> Dict[str, Any]:
+    if wanted is None or not payload.get("ok"):
+        return payload
+    return {f: FIELDS[f](payload) for f in wanted}
+
+
+def to_ids(shaped: Dict[str, Any], categories: Sequence[str], contexts: Sequence[str],
+           version: str) -> Dict[str, Any]:
+    """
+    Replace category/context names by integers: matched_by_context -> context_masks
+    (one category bitmask per context, CONTEXTS order), matched_metaphors -> matched_mask,
+    entailment maps and modifiers_by_context keyed by category id, spelling_corrections with a
+    category_mask. `category_ids` names the /taxonomy.json version
+    the ids refer to. Falls back to names if a category is unknown (e.g. the taxonomy
+    was swapped mid-request).
+    """
+    if not shaped.get("ok"):
+        return shaped
+    ids = {c: i for i, c in enumerate(categories)}
+    try:
+        out = _compact(shaped, ids, contexts, "entailment_map")
+        if isinstance(out.get("results"), dict):
+            out["results"] = _compact(out["results"], ids, contexts, "entailments")
+            if isinstance(out["results"].get("extras"), dict):
+                out["results"]["extras"] = _compact(out["results"]["extras"], ids, contexts)
+    except KeyError:
+        return shaped
+    out["category_ids"] = version
+    return out
+
+
+def _compact(d: Dict[str, Any], ids: Dict[str, int], contexts: Sequence[str],
+             entailment_key: Optional[str] = None) -> Dict[str, Any]:
+    out = dict(d)
+    if "matched_by_context" in out:
+        mbc = out.pop("matched_by_context") or {}
+        out["context_masks"] = [_mask(mbc.get(ctx, ()), ids) for ctx in contexts]
+    if "matched_metaphors" in out:
+        out["matched_mask"] = _mask(out.pop("matched_metaphors") or (), ids)
+    if entailment_key and isinstance(out.get(entailment_key), dict):
+        out[entailment_key] = {str(ids[c]): v for c, v in out[entailment_key].items()}
+    if isinstance(out.get("modifiers_by_context"), dict):
+        out["modifiers_by_context"] = {ctx: {str(ids[c]): v for c, v in cats.items()}
+                                       for ctx, cats in out["modifiers_by_context"].items()}
+    if isinstance(out.get("spelling_corrections"), list):
+        out["spelling_corrections"] = [
+            {k: v for k, v in fix.items() if k != "categories"} | {"category_mask": _mask(fix["categories"], ids)}
+            for fix in out["spelling_corrections"]]
+    return out
+
+
+def _mask(names, ids: Dict[str, int]) -> int:
+    mask = 0
+    for name in names:
+        mask |= 1 << ids[name]
+    return mask
+
+
+def negotiate_format(requested: str, accept: str) -> str:
+    fmt = (requested or "").lower()
+    if not fmt:
+        fmt = "msgpack" if any(t in (accept or "").lower() for t in MSGPACK_TYPES) else "json"
+    if fmt not in FORMATS:
+        raise ShapeError(f"Unknown format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    return fmt
+
+
+def encode(obj: Any, fmt: str = "json") -> Tuple[bytes, str]:
+    """(body, mimetype). Raises ShapeError if msgpack is requested but not installed."""
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise UnsupportedFormat("MessagePack is not available on this server; use JSON.")
+        return msgpack.packb(obj, use_bin_type=True), "application/msgpack"
+    return dumps_json(obj), "application/json"
+
+
+def dumps_json(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("ascii")
+
+
+def available_formats() -> List[str]:
+    return [f for f in FORMATS if f != "msgpack" or msgpack is not None]
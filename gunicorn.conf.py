@@ -0,0 +1,53 @@
+# gunicorn.conf.py — preloaded, pre-warmed workers that share the master's memory
+# Loaded automatically when gunicorn starts from the repo root (the Procfile passes it
+# explicitly). Workers and bind still come from WEB_CONCURRENCY, the command line or
+# GUNICORN_CMD_ARGS, which also override the settings below.
+
+import os
+
+# Import backend.app once in the master; workers are forked with it already loaded.
+preload_app = True
+
+# Threaded workers, so admission control (ADMISSION_MAX_INFLIGHT, default 4) sees
+# concurrent analyses and can queue or shed them, while the threads above that limit
+# stay free for pages, /metrics and /healthz. Keep GUNICORN_THREADS above
+# ADMISSION_MAX_INFLIGHT.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before the first worker is forked.
+    inflight = int(os.getenv("ADMISSION_MAX_INFLIGHT", "4"))
+    if inflight and inflight >= server.cfg.threads:
+        server.log.warning("ADMISSION_MAX_INFLIGHT=%d leaves no thread of %d for health checks and pages",
+                           inflight, server.cfg.threads)
+    # backend/lexicon.json is gitignored: build it here (before warmup builds the matcher)
+    # unless the deploy's build step already wrote a current one.
+    from backend import normalize_taxonomy
+    if not normalize_taxonomy.ensure_lexicon():
+        server.log.warning("No current lexicon artifact; the matcher compiles on the fly")
+    if os.getenv("EMP_WARMUP", "1").lower() in ("0", "false", "no", "off"):
+        return
+    from backend import metrics, warmup
+    from backend.app import app
+    report = warmup.warm(app)
+    frozen = warmup.freeze()
+    mem = metrics.process_memory()
+    server.log.info("Warmup done in %ss (%d analyses, pages %s); %d objects frozen; master RSS %.1f MiB",
+                    report["seconds"], report["analyses"], report["pages"], frozen,
+                    mem.get("rss", 0) / 1048576)
+
+
+def post_fork(server, worker):
+    # Threads don't survive fork(): restart the taxonomy watcher in each worker.
+    from backend import taxonomy_reload
+    taxonomy_reload.start_watcher_from_env()
+
+
+def post_worker_init(worker):
+    from backend import metrics
+    mem = metrics.process_memory()
+    if mem:
+        worker.log.info("Worker %s ready: RSS %.1f MiB, %.1f MiB shared with the master",
+                        worker.pid, mem["rss"] / 1048576, mem["shared"] / 1048576)
@@ -0,0 +1,30 @@
+# conftest.py — shared corpora for the test suite
+# Run from the repo root: python -m pytest -q
+
+import random
+
+import pytest
+
+from backend import bench
+from backend.taxonomy import taxonomy
+
+
+def all_expressions():
+    return [e for spec in taxonomy["metaphor_types"].values() for e in spec.get("expressions", [])]
+
+
+def sample_texts():
+    """The bench's seeded short and long corpora plus the /samples page's expressions in a sentence."""
+    rng = random.Random(7)
+    per_category = [e for spec in taxonomy["metaphor_types"].values()
+                    for e in spec.get("expressions", [])[:6]]
+    return (bench.short_corpus(150, rng) + bench.long_corpus(8, rng)
+            + [f"During my period it feels like {e}." for e in per_category])
+
+
+@pytest.fixture
+def clear_memos():
+    """Drop per-sentence and summary memos before and after a test."""
+    bench._clear_caches()
+    yield bench._clear_caches
+    bench._clear_caches()
@@ -0,0 +1,81 @@
+# Admission slots are released once a response is done: at once for buffered bodies,
+# on close for streamed ones.
+
+import threading
+import time
+
+import pytest
+
+from backend import admission
+from backend import app as app_module
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    gate = admission.AdmissionGate(2, max_queue=0, max_wait=0.0)
+    monkeypatch.setattr(app_module, "ADMISSION", gate)
+    return gate
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_buffered_responses_release_their_slot(gate, client):
+    for i in range(10):  # more requests than slots; never closed by the caller
+        resp = client.post("/analyze.json", data={"description": f"It feels like stabbing {i}."})
+        assert resp.status_code == 200
+    assert gate.stats()["inflight"] == 0
+    assert gate.stats()["admitted"] == 10
+
+
+def test_errors_release_their_slot(gate, client):
+    assert client.post("/analyze.json", json={"encoding": "bogus"}).status_code == 400
+    assert gate.stats()["inflight"] == 0
+
+
+def test_streamed_response_holds_slot_until_closed(gate, client):
+    resp = client.post("/analyze/batch", json=[{"description": "burning"}] * 3, buffered=False)
+    assert resp.status_code == 200
+    assert gate.stats()["inflight"] == 1
+    assert len(resp.get_data().splitlines()) == 3
+    resp.close()
+    assert gate.stats()["inflight"] == 0
+
+
+def test_saturated_gate_sheds_with_retry_after(gate, client):
+    held = [gate.acquire(), gate.acquire()]
+    resp = client.post("/analyze.json", data={"description": "burning"})
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert client.get("/healthz").status_code == 200  # never gated
+    for ticket in held:
+        ticket.release()
+    assert client.post("/analyze.json", data={"description": "burning"}).status_code == 200
+
+
+def test_ticket_release_is_idempotent():
+    gate = admission.AdmissionGate(1, max_queue=1, max_wait=5.0)
+    ticket = gate.acquire()
+    ticket.release()
+    ticket.release()
+    assert gate.stats()["inflight"] == 0
+
+
+def test_queued_request_admitted_when_slot_frees():
+    gate = admission.AdmissionGate(1, max_queue=1, max_wait=5.0)
+    first = gate.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(gate.acquire()))
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while gate.stats()["waiting"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    with pytest.raises(admission.Saturated) as exc:
+        gate.acquire()  # the one queue place is taken
+    assert exc.value.reason == "queue_full"
+    first.release()
+    waiter.join(5)
+    assert len(got) == 1 and gate.stats()["inflight"] == 1
+    got[0].release()
@@ -0,0 +1,82 @@
+# The ASGI bridge picks a thread pool per endpoint: gated and heavy routes share the
+# analysis pool, so a backlog of report submits never delays /healthz.
+
+import asyncio
+import threading
+
+import pytest
+
+from backend import app as app_module
+from backend import asgi
+
+
+async def _call(bridge, method, path, body=b""):
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"",
+             "headers": [(b"content-type", b"application/json")]}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()  # no disconnect
+
+    async def send(message):
+        sent.append(message)
+
+    await bridge(scope, receive, send)
+    return sent[0]["status"]
+
+
+def test_pools_follow_endpoints():
+    bridge = asgi.WSGIBridge(app_module.app)
+    assert bridge._pool_for("POST", "/reports") is bridge.executor
+    assert bridge._pool_for("POST", "/analyze.json") is bridge.executor
+    assert bridge._pool_for("GET", "/reports/abc/pdf") is bridge.executor
+    assert bridge._pool_for("GET", "/history") is bridge.executor
+    assert bridge._pool_for("GET", "/reports/abc/events") is bridge.stream_executor
+    for method, path in (("GET", "/healthz"), ("GET", "/metrics"), ("GET", "/"),
+                         ("GET", "/reports/abc"), ("GET", "/nope"), ("GET", "/analyze")):
+        assert bridge._pool_for(method, path) is bridge.priority_executor
+
+
+class _StalledQueue:
+    def __init__(self):
+        self.release = threading.Event()
+        self.entered = threading.Semaphore(0)
+
+    def submit(self, html, kind):
+        self.entered.release()
+        assert self.release.wait(10)
+        raise app_module.reports.QueueFull("full")
+
+
+@pytest.fixture
+def stalled(monkeypatch):
+    queue = _StalledQueue()
+    monkeypatch.setattr(app_module, "ADMISSION", None)
+    monkeypatch.setattr(app_module.reports, "available", lambda: True)
+    monkeypatch.setattr(app_module, "_get_reports", lambda: queue)
+    yield queue
+    queue.release.set()
+
+
+def test_healthz_answers_while_report_submits_queue(stalled):
+    bridge = asgi.WSGIBridge(app_module.app, threads=1, priority_threads=1, stream_threads=1)
+
+    async def scenario():
+        body = b'{"description": "It feels like stabbing.", "kind": "patient"}'
+        submits = [asyncio.ensure_future(_call(bridge, "POST", "/reports", body)) for _ in range(4)]
+        await asyncio.get_running_loop().run_in_executor(None, stalled.entered.acquire)
+        health = await asyncio.wait_for(_call(bridge, "GET", "/healthz"), 5)
+        stalled.release.set()
+        return health, await asyncio.gather(*submits)
+
+    try:
+        health, submitted = asyncio.run(scenario())
+    finally:
+        for pool in (bridge._executor, bridge._priority_executor, bridge._stream_executor):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+    assert health == 200
+    assert submitted == [503] * 4
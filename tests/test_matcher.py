@@ -0,0 +1,38 @@
+# The phrase matcher engine must find exactly the categories the regex reference backend does.
+
+import pytest
+
+from backend import tagger_logic
+from tests.conftest import all_expressions, sample_texts
+
+
+def _mismatches(texts):
+    return tagger_logic.compare_matcher_backends(texts, repeat=1)["mismatches"]
+
+
+def test_every_expression_alone():
+    assert _mismatches(all_expressions()) == []
+
+
+@pytest.mark.parametrize("template", [
+    "It feels like {}.",
+    "During my period it is {} and it won't stop",
+    "{}, {}!",
+    "not really {}-ish",
+])
+def test_every_expression_in_context(template):
+    texts = [template.format(e, e) for e in all_expressions()]
+    assert _mismatches(texts) == []
+
+
+def test_samples():
+    assert _mismatches(sample_texts()) == []
+
+
+def test_tagging_identical_with_reference_backend(monkeypatch, clear_memos):
+    texts = sample_texts()
+    engine = [tagger_logic.tag_pain_description(t) for t in texts]
+    clear_memos()
+    monkeypatch.setattr(tagger_logic, "_MATCHER_BACKEND", "reference")
+    reference = [tagger_logic.tag_pain_description(t) for t in texts]
+    assert engine == reference
@@ -0,0 +1,69 @@
+# Triggers and life-impact clues: the one-pass word scanner must agree with a per-item
+# regex reference and must not lose any whole-word mention the old substring check found.
+
+import re
+
+import pytest
+
+from backend import tagger_logic
+from tests.conftest import sample_texts
+
+ITEMS = [("trigger", i) for i in tagger_logic.TRIGGERS] + \
+    [("life_impact", i) for i in tagger_logic.LIFE_IMPACT]
+
+
+def _reference_pattern(item):
+    # Phrase words separated by spaces or hyphens; the last word (or the only one)
+    # inflected like a metaphor expression.
+    parts = tagger_logic._expression_parts(item.lower())
+    if not parts:
+        return tagger_logic._compile_expression(item)
+    head = r"[-\s]+".join(re.escape(p) for p in parts[:-1])
+    return re.compile(r"\b" + head + r"[-\s]+" + tagger_logic._compile_expression(parts[-1]).pattern, re.I)
+
+
+REFERENCE = [(_reference_pattern(item), kind, item) for kind, item in ITEMS]
+
+
+def _scanner(text):
+    return tagger_logic.get_snapshot().mentions().find(tagger_logic._normalize(text))
+
+
+def _reference(text):
+    norm = tagger_logic._normalize(text)
+    return {(kind, item) for pat, kind, item in REFERENCE if pat.search(norm)}
+
+
+def _texts():
+    texts = list(sample_texts())
+    for _, item in ITEMS:
+        for template in ("It hurts during {}.", "Worse with {}s and after {}ing.", "My {}es, {}ed; {}"):
+            texts.append(template.format(item, item, item))
+    return texts
+
+
+def test_bowel_movements_plural():
+    res = tagger_logic.tag_pain_description("During my period there is pain during bowel movements.")
+    assert "bowel movement" in res["extras"]["triggers_detected"]
+
+
+@pytest.mark.parametrize("text, absent", [
+    ("I have no interest in anything.", "rest"),
+    ("The background noise is unsexy.", "sex"),
+])
+def test_no_match_inside_words(text, absent):
+    assert absent not in {item for _, item in _scanner(text)}
+
+
+def test_scanner_matches_reference():
+    for text in _texts():
+        assert _scanner(text) == _reference(text), text
+
+
+def test_no_whole_word_mention_lost():
+    # The old check was `item in text`; every hit of it that covers whole words is kept.
+    for text in _texts():
+        norm = tagger_logic._normalize(text)
+        whole_words = {(kind, item) for kind, item in ITEMS
+                       if re.search(r"\b" + re.escape(item.lower()) + r"\b", norm)}
+        assert whole_words <= _scanner(text), text
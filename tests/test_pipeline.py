@@ -0,0 +1,68 @@
+# The single-pass pipeline must reproduce the per-span tagger and the sequential trigger
+# normalisation it replaced, and memoized summaries must render the same bytes as fresh ones.
+
+import random
+
+from backend import app as app_module
+from backend import tagger_logic, wire
+from tests.conftest import sample_texts
+
+EDGE_CASES = [
+    "", "   ", "\n\n", "During my period.\nDuring sex — it burns!",
+    "urination - bowel emptying", "Peeing – bowel movements", "pooping—urinating",
+    "stabbing; burning? twisting!", "On my period\nit feels like a knife",
+]
+
+
+def _per_span_matches(text):
+    # What tag_pain_description did before the single-pass pipeline: every span
+    # normalized and matched on its own, context by context.
+    raw = text.strip()
+    out = {}
+    for ctx, chunks in tagger_logic._find_spans(raw).items():
+        found = set()
+        for chunk in chunks:
+            cats = tagger_logic._match_metaphors_in(tagger_logic._normalize(chunk))
+            found |= tagger_logic._debias_predator_vs_violent(chunk, cats)
+        if found:
+            out[ctx] = sorted(found)
+    return out
+
+
+def test_matches_per_span_tagging(clear_memos):
+    for text in sample_texts() + EDGE_CASES:
+        got = tagger_logic.tag_pain_description(text)["matched_by_context"]
+        assert {ctx: sorted(cats) for ctx, cats in got.items()} == _per_span_matches(text), text
+
+
+def test_normalize_triggers_matches_sequential_passes():
+    rng = random.Random(3)
+    words = [w for phrase in app_module.TRIGGERS_UI for w in phrase.split()] + ["-", "–", "—", "and", "/"]
+    texts = sample_texts() + EDGE_CASES + list(app_module.TRIGGERS_UI)
+    texts += [" ".join(rng.choice(words) for _ in range(rng.randint(1, 12))) for _ in range(3000)]
+    for text in texts:
+        assert app_module.normalize_triggers(text) == app_module._normalize_triggers_reference(text), text
+
+
+def test_memoized_payloads_are_byte_identical(clear_memos):
+    texts = sample_texts() + EDGE_CASES
+    warm = [wire.dumps_json(app_module._build_payload(t, "Sam", "2 years")) for t in texts]
+    clear_memos()
+    cold = [wire.dumps_json(app_module._build_payload(t, "Sam", "2 years")) for t in reversed(texts)]
+    assert warm == cold[::-1]
+
+
+def _summaries(results):
+    return (tagger_logic.generate_patient_summary(results),
+            tagger_logic.generate_doctor_summary(results),
+            tagger_logic.generate_entailment_summary(results["entailments"]))
+
+
+def test_memoized_summaries_match_unmemoized(clear_memos):
+    for text in sample_texts()[:60]:
+        results = tagger_logic.tag_pain_description(text, name="Sam")
+        _summaries(results)
+        memoized = _summaries(results)  # served from the render memos
+        clear_memos()
+        assert tagger_logic._render_patient_body.cache_info().currsize == 0
+        assert memoized == _summaries(results), text
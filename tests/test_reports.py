@@ -0,0 +1,119 @@
+# Report jobs: queued -> rendering -> done/failed, shared with other workers through the
+# cache directory. Rendering uses a stand-in for WeasyPrint on a thread pool.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend import reports
+
+
+class FakeWeasyprint:
+    release = threading.Event()
+    rendered = []
+
+    class HTML:
+        def __init__(self, string):
+            self.string = string
+
+        def write_pdf(self, stylesheets, font_config):
+            assert FakeWeasyprint.release.wait(10)
+            if "boom" in self.string:
+                raise RuntimeError("boom")
+            FakeWeasyprint.rendered.append(self.string)
+            return b"%PDF-1.7 " + self.string.encode("utf-8")
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    monkeypatch.delitem(reports._worker, "error", raising=False)
+    for key, value in (("weasyprint", FakeWeasyprint), ("css", None), ("fonts", None)):
+        monkeypatch.setitem(reports._worker, key, value)
+    FakeWeasyprint.release.clear()
+    FakeWeasyprint.rendered = []
+    yield FakeWeasyprint
+    FakeWeasyprint.release.set()
+
+
+def _queue(directory, **kwargs):
+    queue = reports.ReportQueue(reports.PdfCache(str(directory)), **kwargs)
+    queue._pool = ThreadPoolExecutor(1)  # instead of render processes
+    return queue
+
+
+def _wait_for(queue, job, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status != status and time.monotonic() < deadline:
+        queue.wait(job, 0.05)
+    return job.status
+
+
+def test_job_lifecycle(tmp_path, renderer):
+    queue = _queue(tmp_path)
+    job = queue.submit("<p>hello</p>", "patient")
+    status_file = reports.status_path(queue.cache.path(job.id))
+    assert job.status == "queued" and os.path.exists(status_file)
+    assert queue.submit("<p>hello</p>", "patient") is job  # in progress: not queued twice
+
+    renderer.release.set()
+    assert _wait_for(queue, job, "done") == "done"
+    assert queue.get(job.id) is job
+    with open(queue.cache.get(job.id), "rb") as fh:
+        assert fh.read().startswith(b"%PDF")
+    assert not os.path.exists(status_file)
+    assert queue.stats()["pending"] == 0
+
+    again = queue.submit("<p>hello</p>", "patient")  # served from the cache
+    assert again.status == "done" and renderer.rendered == ["<p>hello</p>"]
+
+
+def test_failed_job_is_recorded(tmp_path, renderer):
+    queue = _queue(tmp_path)
+    renderer.release.set()
+    job = queue.submit("<p>boom</p>", "clinician")
+    assert _wait_for(queue, job, "failed") == "failed"
+    assert job.error == "boom"
+    assert queue.cache.get(job.id) is None
+    other = _queue(tmp_path)
+    assert other.get(job.id).to_dict()["status"] == "failed"
+
+
+def test_other_worker_sees_progress(tmp_path, renderer):
+    queue, other = _queue(tmp_path), _queue(tmp_path)
+    job = queue.submit("<p>shared</p>", "patient")
+    seen = other.get(job.id)
+    assert seen is not None and seen.future is None
+    assert seen.status in ("queued", "rendering")
+
+    waited = []
+    waiter = threading.Thread(target=lambda: (other.wait(seen, 5), waited.append(seen.status)))
+    waiter.start()
+    renderer.release.set()
+    waiter.join(10)
+    assert waited == ["done"]
+    assert other.get(job.id).status == "done"
+
+
+def test_queue_full(tmp_path, renderer):
+    queue = _queue(tmp_path, max_pending=1)
+    queue.submit("<p>one</p>", "patient")
+    with pytest.raises(reports.QueueFull):
+        queue.submit("<p>two</p>", "patient")
+
+
+def test_abandoned_job_reported_failed(tmp_path, renderer):
+    queue = _queue(tmp_path)
+    job = queue.submit("<p>abandoned</p>", "patient")
+    other = _queue(tmp_path)
+    stale = time.time() - reports.STALE_JOB_SECONDS - 1
+    os.utime(reports.status_path(queue.cache.path(job.id)), (stale, stale))
+    assert other.get(job.id).status == "failed"
+
+
+def test_unknown_and_malformed_ids(tmp_path):
+    queue = _queue(tmp_path)
+    assert queue.get("0" * 32) is None
+    assert queue.get("../../etc/passwd") is None
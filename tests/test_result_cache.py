@@ -0,0 +1,55 @@
+# Single-flight caching across a clear(): a taxonomy reload during a slow analysis
+# must not hand the pre-reload result to callers that arrive afterwards.
+
+import threading
+
+from backend.result_cache import ResultCache
+
+
+def test_clear_detaches_inflight_computation():
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+    results = {}
+
+    def slow_old():
+        started.set()
+        assert release.wait(10)
+        return "old"
+
+    leader = threading.Thread(target=lambda: results.setdefault("leader", cache.get_or_compute("k", slow_old)))
+    leader.start()
+    assert started.wait(5)
+
+    cache.clear()  # reload while the old computation is running
+    assert cache.get_or_compute("k", lambda: "new") == "new"  # does not wait for the old flight
+
+    release.set()
+    leader.join(5)
+    assert results["leader"] == "old"
+    assert cache.get_or_compute("k", lambda: "recomputed") == "new"
+    stats = cache.stats()
+    assert stats["coalesced"] == 0 and stats["inflight"] == 0
+
+
+def test_followers_join_the_running_flight():
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        assert release.wait(10)
+        return "value"
+
+    threads = [threading.Thread(target=cache.get_or_compute, args=("k", slow)) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    while cache.stats()["coalesced"] < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert calls == [1] and cache.get_or_compute("k", slow) == "value"
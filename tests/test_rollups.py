@@ -0,0 +1,93 @@
+# Rollups kept up to date by the history writer must equal a rebuild from the raw entries.
+
+import random
+
+import pytest
+
+from backend import app as app_module
+from backend import history, rollups
+
+DAY = 86400.0
+TEXTS = [
+    "During my period it is severe and feels like stabbing knives.",
+    "On my period it's a constant crushing weight, worse at night.",
+    "During sex it burns, sudden and sharp like a blade.",
+    "Around ovulation there is a mild dull ache.",
+    "It comes and goes like electric shocks.",
+    "When going to the toilet it feels like something is tearing.",
+    "I feel exhausted and can't work.",
+]
+TABLES = ("rollup_state", "rollup_cycles", "rollup_counts", "rollup_terms")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = history.HistoryStore(str(tmp_path / "history.sqlite3"), flush_interval=0.01)
+    conn = history.connect(store.path)
+    rollups.ensure_schema(conn)
+    conn.close()
+    store.add_write_hook(rollups.apply_entry)
+    yield store
+    store.close()
+
+
+def _record_diary(store, patients=("ana", "bea", "cy"), days=120, seed=5):
+    rng = random.Random(seed)
+    t0 = 1_700_000_000.0
+    for patient in patients:
+        created = t0
+        for _ in range(days):
+            created += rng.uniform(0.2, 3.0) * DAY
+            payload = app_module.analyze_description(rng.choice(TEXTS), name=patient)
+            store.record(payload, patient=patient, created=created)
+        # A late arrival (another worker's batch) that is not a period entry.
+        store.record(app_module.analyze_description(TEXTS[3]), patient=patient, created=t0 + 30 * DAY)
+    assert store.flush()
+
+
+def _dump(conn, patient=None):
+    where, args = ("WHERE patient = ?", (patient,)) if patient else ("", ())
+    return {table: sorted(conn.execute(f"SELECT * FROM {table} {where}", args).fetchall()) for table in TABLES}
+
+
+def _rebuild_conn(path):
+    conn = history.connect(path, timeout=30.0)
+    conn.isolation_level = None
+    return conn
+
+
+def test_incremental_rollups_equal_rebuild(store):
+    _record_diary(store)
+    conn = _rebuild_conn(store.path)
+    incremental = _dump(conn)
+    timelines = {p: rollups.timeline(conn, p) for p in ("ana", "bea", "cy")}
+    assert len(timelines["ana"]) > 2  # several cycles, not everything in cycle 0
+    assert rollups.patients_needing_rebuild(conn) == []
+
+    result = rollups.rebuild(conn)
+    assert result["entries"] == conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    assert _dump(conn) == incremental
+    assert {p: rollups.timeline(conn, p) for p in timelines} == timelines
+    conn.close()
+
+
+def test_rebuild_one_patient_leaves_others(store):
+    _record_diary(store)
+    conn = _rebuild_conn(store.path)
+    before = _dump(conn)
+    conn.execute("DELETE FROM rollup_counts WHERE patient = 'bea'")
+    rollups.rebuild(conn, patient="bea")
+    assert _dump(conn) == before
+    conn.close()
+
+
+def test_history_entries_match_payloads(store):
+    payload = app_module.analyze_description(TEXTS[0], name="ana")
+    store.record(payload, patient="ana", name="ana", created=1_700_000_000.0)
+    assert store.flush()
+    (entry,) = store.query(patient="ana")
+    assert entry["results"] == payload["results"]
+    assert entry["patient_summary"] == payload["patient"]
+    tagged = store.query(patient="ana", context="menstruation",
+                         category=payload["results"]["matched_by_context"]["menstruation"][0])
+    assert [e["id"] for e in tagged] == [entry["id"]]
@@ -0,0 +1,80 @@
+# Responses with ids instead of names must round-trip: decoding them with /taxonomy.json's
+# dictionaries gives the names response.
+
+import json
+
+import pytest
+
+from backend import app as app_module
+from backend import tagger_logic
+from tests.conftest import sample_texts
+
+
+def _names(mask, categories):
+    return [c for i, c in enumerate(categories) if mask >> i & 1]
+
+
+def _decode(d, categories, contexts, entailment_key=None):
+    out = dict(d)
+    if "context_masks" in out:
+        masks = out.pop("context_masks")
+        out["matched_by_context"] = {ctx: _names(m, categories) for ctx, m in zip(contexts, masks) if m}
+    if "matched_mask" in out:
+        names = _names(out.pop("matched_mask"), categories)
+        out["matched_metaphors"] = {c: True for c in names} if entailment_key == "entailments" else names
+    if entailment_key and isinstance(out.get(entailment_key), dict):
+        out[entailment_key] = {categories[int(i)]: v for i, v in out[entailment_key].items()}
+    if isinstance(out.get("modifiers_by_context"), dict):
+        out["modifiers_by_context"] = {ctx: {categories[int(i)]: v for i, v in cats.items()}
+                                       for ctx, cats in out["modifiers_by_context"].items()}
+    if isinstance(out.get("spelling_corrections"), list):
+        out["spelling_corrections"] = [
+            {k: v for k, v in fix.items() if k != "category_mask"}
+            | {"categories": _names(fix["category_mask"], categories)}
+            for fix in out["spelling_corrections"]]
+    return out
+
+
+def decode_ids(body, taxonomy):
+    categories, contexts = taxonomy["categories"], taxonomy["contexts"]
+    assert body.pop("category_ids") == taxonomy["version"]
+    out = _decode(body, categories, contexts, "entailment_map")
+    if isinstance(out.get("results"), dict):
+        out["results"] = _decode(out["results"], categories, contexts, "entailments")
+        if isinstance(out["results"].get("extras"), dict):
+            out["results"]["extras"] = _decode(out["results"]["extras"], categories, contexts)
+    return out
+
+
+@pytest.fixture(scope="module")
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("view", ["full", "minimal", "clinician"])
+def test_ids_round_trip(client, view):
+    taxonomy = client.get("/taxonomy.json").get_json()
+    for text in sample_texts()[120:200]:  # short, long and per-category samples
+        body = {"description": text, "name": "Sam", "view": view}
+        names = client.post("/analyze.json", json=body).get_json()
+        ids = client.post("/analyze.json", json={**body, "encoding": "ids"}).get_json()
+        assert decode_ids(ids, taxonomy) == names, text
+
+
+def test_ids_round_trip_batch(client):
+    taxonomy = client.get("/taxonomy.json").get_json()
+    records = [{"description": t} for t in sample_texts()[:40]]
+    names = client.post("/analyze/batch?view=minimal", json=records).get_data(as_text=True).splitlines()
+    ids = client.post("/analyze/batch?view=minimal&encoding=ids", json=records).get_data(as_text=True).splitlines()
+    for a, b in zip(names, ids):
+        assert decode_ids(json.loads(b), taxonomy) == json.loads(a)
+
+
+def test_ids_round_trip_spelling_corrections(client, monkeypatch, clear_memos):
+    monkeypatch.setattr(tagger_logic, "_FUZZY", True)
+    taxonomy = client.get("/taxonomy.json").get_json()
+    body = {"description": "During my period it feels like stabbingg and burnning.", "view": "clinician"}
+    names = client.post("/analyze.json", json=body).get_json()
+    assert names["spelling_corrections"]
+    ids = client.post("/analyze.json", json={**body, "encoding": "ids"}).get_json()
+    assert decode_ids(ids, taxonomy) == names